@@ -0,0 +1,75 @@
+"""
+逐阶段推理耗时基准：在同一段音频上分别测量 VAD / 流式 ASR / 声纹 / 标点后端。
+
+用法：
+    python benchmarks/bench_stages.py --backend stub
+    python benchmarks/bench_stages.py --backend funasr --wav tests/test.wav
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from asr_service.asr_core.backends import create_backend  # noqa: E402
+from asr_service.asr_core.config import ASR_CHUNK_SIZE, SAMPLE_RATE, VAD_CHUNK_SIZE  # noqa: E402
+
+
+def _load_audio(wav_path, seconds):
+    if wav_path:
+        import scipy.io.wavfile as wavfile
+        _, audio = wavfile.read(wav_path)
+        return audio.astype(np.int16)
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (6000 * np.sin(2 * np.pi * 220 * t) + 300 * rng.standard_normal(len(t))).astype(np.int16)
+
+
+def _timed(fn, calls):
+    start = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(calls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="stub")
+    parser.add_argument("--wav", default=None)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    audio = _load_audio(args.wav, args.seconds)
+    audio_seconds = len(audio) / SAMPLE_RATE
+    vad = create_backend("vad", args.backend)
+    asr = create_backend("asr", args.backend)
+    spk = create_backend("speaker", args.backend)
+    punc = create_backend("punc", args.backend)
+
+    vad_cache = {}
+    vad_calls = [(audio[i:i + VAD_CHUNK_SIZE], vad_cache) for i in range(0, len(audio), VAD_CHUNK_SIZE)]
+    asr_cache = {}
+    asr_calls = [(audio[i:i + ASR_CHUNK_SIZE], asr_cache) for i in range(0, len(audio), ASR_CHUNK_SIZE)]
+    spk_calls = [(audio[i:i + 6 * VAD_CHUNK_SIZE],) for i in range(0, len(audio), 6 * VAD_CHUNK_SIZE)]
+    punc_calls = [("今天我们学习分数的加法和减法请同学们认真听讲",)] * 10
+
+    print(f"backend={args.backend} audio={audio_seconds:.1f}s")
+    print(f"{'stage':<10}{'calls':>8}{'ms/call':>12}{'RTF':>10}")
+    for name, fn, calls in (
+        ("vad", vad.detect, vad_calls),
+        ("asr", asr.decode, asr_calls),
+        ("speaker", spk.embed, spk_calls),
+        ("punc", punc.punctuate, punc_calls),
+    ):
+        elapsed, n = _timed(fn, calls)
+        rtf = elapsed / audio_seconds if name != "punc" else float("nan")
+        print(f"{name:<10}{n:>8}{elapsed * 1000 / n:>12.2f}{rtf:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+识别状态音频缓冲的逐块开销：对比旧的 bytearray/list/deque 缓冲与预分配的 PcmBuffer/PcmRing。
+
+两种实现按同样的节奏处理音频块（预录制、语音开始补入、ASR 600ms 切片、声纹 6 块拼接），
+报告每块耗时与 tracemalloc 记录的每块临时分配峰值。
+
+用法：
+    python benchmarks/bench_state_alloc.py --chunks 5000
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from asr_service.asr_core.config import ASR_CHUNK_SIZE, VAD_CHUNK_SIZE  # noqa: E402
+from asr_service.asr_core.pcm_buffer import PcmBuffer, PcmRing  # noqa: E402
+
+SENTENCE_CHUNKS = 15  # 每句 3 秒语音
+SILENCE_CHUNKS = 5
+
+
+class LegacyBuffers:
+    """改动前 RecognitionState 的缓冲处理方式"""
+
+    def __init__(self):
+        self.asr_buffer = bytearray()
+        self.spk_buffer = []
+        self.pre_buffer = deque(maxlen=3)
+
+    def speech_start(self):
+        for chunk in self.pre_buffer:
+            self.asr_buffer.extend(chunk)
+            self.spk_buffer.append(np.frombuffer(chunk, dtype=np.int16))
+
+    def speech_chunk(self, chunk, identified):
+        self.asr_buffer.extend(chunk)
+        out = None
+        if len(self.asr_buffer) >= ASR_CHUNK_SIZE * 2:
+            chunk_bytes = self.asr_buffer[:ASR_CHUNK_SIZE * 2]
+            self.asr_buffer = self.asr_buffer[ASR_CHUNK_SIZE * 2:]
+            out = np.frombuffer(chunk_bytes, dtype=np.int16)
+        if not identified:
+            self.spk_buffer.append(np.frombuffer(chunk, dtype=np.int16))
+            if len(self.spk_buffer) >= 6:
+                out = np.concatenate(self.spk_buffer)
+        return out
+
+    def after_chunk(self, chunk):
+        self.pre_buffer.append(chunk)
+
+    def speech_end(self):
+        self.asr_buffer = bytearray()
+        self.spk_buffer = []
+
+
+class PreallocatedBuffers:
+    """当前 RecognitionState 的缓冲处理方式"""
+
+    def __init__(self):
+        self.asr_buffer = PcmBuffer(ASR_CHUNK_SIZE * 2 + VAD_CHUNK_SIZE)
+        self.spk_buffer = PcmBuffer(6 * VAD_CHUNK_SIZE)
+        self.pre_buffer = PcmRing(3 * VAD_CHUNK_SIZE)
+
+    def speech_start(self):
+        self.pre_buffer.copy_into(self.asr_buffer, self.spk_buffer)
+
+    def speech_chunk(self, chunk, identified):
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        self.asr_buffer.extend(samples)
+        out = None
+        if len(self.asr_buffer) >= ASR_CHUNK_SIZE:
+            out = self.asr_buffer.view(ASR_CHUNK_SIZE)
+            self.asr_buffer.consume(ASR_CHUNK_SIZE)
+        if not identified:
+            self.spk_buffer.extend(samples)
+            if len(self.spk_buffer) >= 6 * VAD_CHUNK_SIZE:
+                out = self.spk_buffer.view()
+        return out
+
+    def after_chunk(self, chunk):
+        self.pre_buffer.append(np.frombuffer(chunk, dtype=np.int16))
+
+    def speech_end(self):
+        self.asr_buffer.clear()
+        self.spk_buffer.clear()
+
+
+def _run(buffers, chunks, measure_alloc):
+    period = SENTENCE_CHUNKS + SILENCE_CHUNKS
+    peaks = []
+    start = time.perf_counter()
+    for i, chunk in enumerate(chunks):
+        if measure_alloc:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        pos = i % period
+        if pos < SENTENCE_CHUNKS:
+            if pos == 0:
+                buffers.speech_start()
+            buffers.speech_chunk(chunk, identified=pos >= 6)
+        elif pos == SENTENCE_CHUNKS:
+            buffers.speech_end()
+        buffers.after_chunk(chunk)
+        if measure_alloc:
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    return (time.perf_counter() - start) / len(chunks), peaks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunks = [rng.integers(-3000, 3000, VAD_CHUNK_SIZE, dtype=np.int16).tobytes() for _ in range(args.chunks)]
+
+    print(f"{'buffers':<14}{'us/chunk':>10}{'alloc B/chunk':>16}{'p99 B':>10}")
+    for name, cls in (("legacy", LegacyBuffers), ("preallocated", PreallocatedBuffers)):
+        per_chunk, _ = _run(cls(), chunks, measure_alloc=False)
+        tracemalloc.start()
+        _, peaks = _run(cls(), chunks, measure_alloc=True)
+        tracemalloc.stop()
+        print(f"{name:<14}{per_chunk * 1e6:>10.2f}{np.mean(peaks):>16.0f}{np.percentile(peaks, 99):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
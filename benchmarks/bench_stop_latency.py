@@ -0,0 +1,99 @@
+"""
+空闲会话的停止延迟基准：会话已启动但没有音频输入时，从 stop() 到识别线程结束的耗时。
+
+分别测量共享接收端的会话（AsrSessionManager）和独立 socket 的 stream2text_udp，
+使用桩推理后端，目标为 p99 < 10ms。
+
+用法：
+    python benchmarks/bench_stop_latency.py --runs 50
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from asr_service.asr_core import config  # noqa: E402
+
+for _stage in config.INFERENCE_BACKENDS:
+    config.INFERENCE_BACKENDS[_stage] = "stub"
+
+from asr_service import asr_engine  # noqa: E402
+from asr_service.udp_ingest import StopEvent  # noqa: E402
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _bench_manager(runs, idle):
+    manager = asr_engine.AsrSessionManager(udp_address=f"127.0.0.1:{_free_port()}")
+    latencies = []
+    try:
+        for _ in range(runs):
+            session_id = manager.start()
+            time.sleep(idle)
+            t0 = time.perf_counter()
+            session = manager.stop(session_id)
+            session.done.result(timeout=5)
+            latencies.append(time.perf_counter() - t0)
+    finally:
+        manager.close()
+    return latencies
+
+
+def _bench_stream2text(runs, idle):
+    address = f"127.0.0.1:{_free_port()}"
+    latencies = []
+    for _ in range(runs):
+        stop_event = StopEvent()
+        audio = asr_engine.preload_models().fork()
+        worker = threading.Thread(
+            target=asr_engine.stream2text_udp,
+            args=(audio, address),
+            kwargs={"duration": None, "stop_event": stop_event},
+        )
+        worker.start()
+        time.sleep(idle)
+        t0 = time.perf_counter()
+        stop_event.set()
+        worker.join(timeout=5)
+        latencies.append(time.perf_counter() - t0)
+        stop_event.close()
+    return latencies
+
+
+def _report(name, latencies, target_ms):
+    ms = np.array(latencies) * 1000
+    p99 = np.percentile(ms, 99)
+    verdict = "OK" if p99 < target_ms else "SLOW"
+    print(f"{name:<14}{len(ms):>6}{np.median(ms):>10.2f}{p99:>10.2f}{ms.max():>10.2f}  {verdict}")
+    return p99 < target_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=30)
+    parser.add_argument("--idle", type=float, default=0.2, help="停止前会话空闲的秒数")
+    parser.add_argument("--target-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    results = [
+        ("session", _bench_manager(args.runs, args.idle)),
+        ("stream2text", _bench_stream2text(args.runs, args.idle)),
+    ]
+    print(f"{'path':<14}{'runs':>6}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    ok = [_report(name, latencies, args.target_ms) for name, latencies in results]
+    sys.exit(0 if all(ok) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+多工作进程的模型内存与启动耗时：同时启动 N 个进程，各自加载全部模型（RealtimeAssistant），
+在所有进程都加载完成后读取每个进程的 rss / pss / private 与模型加载耗时。
+
+分别在关闭与开启权重内存映射（ASR_MODEL_MMAP=0/1）时各测一轮：rss 包含共享页，两轮相近；
+开启后每个进程的 private 应降到只剩激活与会话状态，pss 约为 private + 权重大小 / N。
+
+用法：
+    python benchmarks/bench_worker_memory.py --backend funasr --workers 4
+    python benchmarks/bench_worker_memory.py --backend stub --workers 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+
+def _worker(backend):
+    """子进程：加载模型，报告后等待父进程关闭 stdin（保持映射，便于同时测量所有进程）"""
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    from asr_service.asr_core.main import RealtimeAssistant
+    from asr_service.profiling import process_memory
+
+    start = time.perf_counter()
+    assistant = RealtimeAssistant(backends=dict.fromkeys(("vad", "asr", "speaker", "punc"), backend))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"startup_seconds": elapsed, "models": assistant.model_stats()}), flush=True)
+    sys.stdin.read()
+    print(json.dumps({"memory": process_memory()}), flush=True)
+
+
+def _round(backend, workers, mmap_enabled, cache_dir):
+    env = dict(os.environ, ASR_MODEL_MMAP="1" if mmap_enabled else "0", ASR_MODEL_MMAP_DIR=cache_dir)
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--backend", backend],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, text=True, cwd=ROOT,
+        )
+        for _ in range(workers)
+    ]
+    rows = []
+    for p in procs:
+        for line in p.stdout:
+            if line.startswith("{"):
+                rows.append(json.loads(line))
+                break
+    # 所有进程都已加载完成，同时测量
+    for p, row in zip(procs, rows):
+        p.stdin.close()
+        for line in p.stdout:
+            if line.startswith("{"):
+                row.update(json.loads(line))
+                break
+        p.wait()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="funasr")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cache-dir", default=os.path.join(ROOT, "model_cache"))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        _worker(args.backend)
+        return
+
+    print(f"backend={args.backend} workers={args.workers}")
+    print(f"{'mmap':<6}{'worker':>7}{'startup s':>11}{'mapped MB':>11}{'rss MB':>9}{'pss MB':>9}{'private MB':>12}")
+    # 第一轮开启映射前先生成一次缓存，避免把写缓存的耗时算进启动耗时
+    _round(args.backend, 1, True, args.cache_dir)
+    for mmap_enabled in (False, True):
+        rows = _round(args.backend, args.workers, mmap_enabled, args.cache_dir)
+        for i, row in enumerate(rows):
+            mem = row["memory"]
+            print(
+                f"{'on' if mmap_enabled else 'off':<6}{i:>7}{row['startup_seconds']:>11.2f}"
+                f"{row['models']['mapped_bytes'] / MB:>11.1f}{mem.get('rss', mem.get('max_rss', 0)) / MB:>9.1f}"
+                f"{mem.get('pss', 0) / MB:>9.1f}{mem.get('private', 0) / MB:>12.1f}"
+            )
+        total_pss = sum(r["memory"].get("pss", 0) for r in rows) / MB
+        print(f"{'on' if mmap_enabled else 'off':<6}{'total':>7}{'':>11}{'':>11}{'':>9}{total_pss:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
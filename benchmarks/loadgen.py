@@ -0,0 +1,254 @@
+"""
+多路 UDP 压测：模拟 N 个机器人并发推流，测量端到端延迟、吞吐与实际 RTF。
+
+每个机器人有自己的 WAV、目标地址与起始偏移，通过 HTTP 接口启动会话（分帧模式，各自的 stream_id）。
+所有数据包由一个发送线程按单调时钟的绝对时间表发送（第 k 个包在 t0 + offset + k*10ms），
+睡眠误差不会累积；报告中给出发包相对时间表的滞后。
+
+延迟标记：发送前按能量把 WAV 切分为语音段，记录每段最后一个语音包的发送时刻；
+轮询会话的部分结果，新句子出现的时刻减去对应标记的发送时刻即为端到端延迟
+（从“音频发出”到“句子可从接口取回”，精度约为轮询间隔）。
+
+用法：
+    # 单节点或路由器（路由器返回的 udp_address 优先）
+    python benchmarks/loadgen.py --server http://127.0.0.1:8014 --wav tests/test.wav --streams 1,4,8
+    # 显式指定每个机器人：WAV[@起始偏移秒[@UDP 地址]]
+    python benchmarks/loadgen.py --server http://127.0.0.1:8014 --robot a.wav@0 --robot b.wav@1.5@10.0.0.3:5555
+"""
+import argparse
+import heapq
+import os
+import socket
+import sys
+import threading
+import time
+import wave
+from dataclasses import dataclass, field
+
+import httpx
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from asr_service.udp_framing import pack_frame  # noqa: E402
+
+SAMPLE_RATE = 16000
+PACKET_MS = 10
+PACKET_SAMPLES = SAMPLE_RATE * PACKET_MS // 1000
+STREAM_ID_BASE = 0x10AD0000
+
+
+def load_wav(path):
+    with wave.open(path, "rb") as wav:
+        if wav.getnchannels() != 1 or wav.getframerate() != SAMPLE_RATE or wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: WAV must be 16kHz mono 16-bit")
+        return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+
+
+def speech_end_markers(pcm, threshold=500.0, min_gap_ms=600):
+    """返回每个语音段最后一个语音包的序号；语音段之间至少间隔 min_gap_ms 的静音"""
+    packets = len(pcm) // PACKET_SAMPLES
+    frames = pcm[:packets * PACKET_SAMPLES].reshape(packets, PACKET_SAMPLES).astype(np.float32)
+    loud = np.sqrt(np.mean(frames ** 2, axis=1)) > threshold
+    markers, last_loud = [], None
+    min_gap = min_gap_ms // PACKET_MS
+    for i, is_loud in enumerate(loud):
+        if is_loud:
+            last_loud = i
+        elif last_loud is not None and i - last_loud >= min_gap:
+            markers.append(last_loud)
+            last_loud = None
+    if last_loud is not None:
+        markers.append(last_loud)
+    return markers
+
+
+@dataclass
+class Robot:
+    name: str
+    pcm: np.ndarray
+    offset: float
+    stream_id: int
+    address: str | None = None  # "host:port"；None 时由 start 响应或节点状态决定
+    target: tuple | None = None
+    session_id: str | None = None
+    markers: list = field(default_factory=list)  # 语音段结束的包序号
+    marker_sent: list = field(default_factory=list)  # 对应的发送时刻（monotonic）
+    sentences: list = field(default_factory=list)  # 新句子被观察到的时刻（monotonic）
+    rtf: float | None = None
+
+    @property
+    def packets(self):
+        return len(self.pcm) // PACKET_SAMPLES
+
+
+def build_pcm(wav_pcm, loops, gap_seconds, tail_seconds):
+    """WAV 重复 loops 次，之间与末尾补静音（末尾静音让 VAD 在停止前结束最后一句）"""
+    gap = np.zeros(int(SAMPLE_RATE * gap_seconds), dtype=np.int16)
+    parts = []
+    for _ in range(loops):
+        parts += [wav_pcm, gap]
+    parts.append(np.zeros(int(SAMPLE_RATE * tail_seconds), dtype=np.int16))
+    return np.concatenate(parts)
+
+
+class PacedSender(threading.Thread):
+    """按单调时钟的绝对时间表发送所有机器人的数据包，记录发包滞后与标记发送时刻"""
+
+    def __init__(self, robots):
+        super().__init__(daemon=True, name="loadgen-sender")
+        self.robots = robots
+        self.lateness = []
+
+    def run(self):
+        period = PACKET_MS / 1000
+        socks = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in self.robots]
+        marker_sets = [set(r.markers) for r in self.robots]
+        t0 = time.monotonic() + 0.05
+        heap = [(t0 + r.offset, i, 0) for i, r in enumerate(self.robots) if r.target is not None]
+        heapq.heapify(heap)
+        try:
+            while heap:
+                deadline, i, k = heapq.heappop(heap)
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                robot = self.robots[i]
+                payload = robot.pcm[k * PACKET_SAMPLES:(k + 1) * PACKET_SAMPLES].tobytes()
+                socks[i].sendto(pack_frame(k, k * PACKET_SAMPLES, payload, stream_id=robot.stream_id), robot.target)
+                now = time.monotonic()
+                self.lateness.append(now - deadline)
+                if k in marker_sets[i]:
+                    robot.marker_sent.append(now)
+                if k + 1 < robot.packets:
+                    # 以 t0 为基准计算下一个包的时刻，而不是在上一次发送时间上累加
+                    heapq.heappush(heap, (t0 + robot.offset + (k + 1) * period, i, k + 1))
+        finally:
+            for sock in socks:
+                sock.close()
+
+
+def _udp_target(start_payload, status, override):
+    address = override or start_payload.get("udp_address") or (status.get("ingest") or {}).get("address")
+    if not address:
+        # 路由器的 /asr/status 没有 ingest；节点未上报 UDP 地址时路由器的 /asr/start 也不会给出
+        raise SystemExit(f"session {start_payload.get('session_id')}: server did not report a UDP address, pass --udp host:port")
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def _latencies(robot):
+    """句子与语音段标记按时间顺序配对：每个新句子对应其出现之前最后一个尚未配对的标记"""
+    result, m = [], 0
+    for seen in robot.sentences:
+        matched = None
+        while m < len(robot.marker_sent) and robot.marker_sent[m] <= seen:
+            matched = robot.marker_sent[m]
+            m += 1
+        if matched is not None:
+            result.append(seen - matched)
+    return result
+
+
+def run_round(client, robots, args):
+    status = client.get("/asr/status").json()
+    started = []
+    for robot in robots:
+        resp = client.post("/asr/start", json={"framing": "framed", "stream_id": robot.stream_id})
+        if resp.status_code != 200:
+            print(f"  {robot.name}: start rejected ({resp.status_code}) {resp.text}", file=sys.stderr)
+            continue
+        payload = resp.json()
+        robot.session_id = payload["session_id"]
+        robot.target = _udp_target(payload, status, robot.address or args.udp)
+        started.append(robot)
+
+    sender = PacedSender(started)
+    wall_start = time.monotonic()
+    sender.start()
+
+    # 轮询部分结果，记录每个新句子出现的时刻
+    counts = {r.session_id: 0 for r in started}
+    while sender.is_alive():
+        for robot in started:
+            resp = client.get(f"/asr/sessions/{robot.session_id}/result")
+            now = time.monotonic()
+            text = resp.json().get("text", "") if resp.status_code in (200, 202) else ""
+            n = len([line for line in text.split("\n") if line.strip()])
+            robot.sentences += [now] * (n - counts[robot.session_id])
+            counts[robot.session_id] = max(n, counts[robot.session_id])
+        time.sleep(args.poll_interval)
+    wall = time.monotonic() - wall_start
+
+    sessions = {s["session_id"]: s for s in client.get("/asr/status").json()["sessions"]}
+    for robot in started:
+        robot.rtf = ((sessions.get(robot.session_id) or {}).get("load") or {}).get("rtf")
+        resp = client.post("/asr/stop", json={"session_id": robot.session_id, "wait": 30})
+        now = time.monotonic()
+        n = len([line for line in resp.json().get("text", "").split("\n") if line.strip()])
+        robot.sentences += [now] * (n - counts[robot.session_id])
+
+    latencies = [lat for r in started for lat in _latencies(r)]
+    rtfs = [r.rtf for r in started if r.rtf is not None]
+    audio_seconds = sum(r.packets for r in started) * PACKET_MS / 1000
+    return {
+        "streams": len(robots),
+        "started": len(started),
+        "audio_s": audio_seconds,
+        "throughput": audio_seconds / wall if wall > 0 else 0.0,
+        "late_p99_ms": np.percentile(sender.lateness, 99) * 1000 if sender.lateness else float("nan"),
+        "rtf": float(np.mean(rtfs)) if rtfs else float("nan"),
+        "sentences": sum(len(r.sentences) for r in started),
+        "latency": latencies,
+    }
+
+
+def _robots_for(n, args, wavs):
+    robots = []
+    specs = args.robot or [f"{w}@{i * args.stagger}" for i, w in enumerate(args.wav)]
+    for i in range(n):
+        path, *rest = specs[i % len(specs)].split("@")
+        # 重复使用同一规格时按轮数顺延起始偏移
+        offset = (float(rest[0]) if rest else 0.0) + (i // len(specs)) * args.stagger * len(specs)
+        address = rest[1] if len(rest) > 1 else None
+        pcm = build_pcm(wavs[path], args.loops, args.gap, args.tail)
+        robot = Robot(f"robot{i}", pcm, offset, STREAM_ID_BASE + i, address=address)
+        robot.markers = speech_end_markers(pcm)
+        robots.append(robot)
+    return robots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", default="http://127.0.0.1:8014", help="ASR 节点或路由器的 HTTP 地址")
+    parser.add_argument("--wav", action="append", default=None, help="WAV 文件，可多次指定，机器人依次轮换使用")
+    parser.add_argument("--robot", action="append", default=None, help="WAV[@起始偏移秒[@UDP 地址]]，可多次指定")
+    parser.add_argument("--streams", default="1,2,4,8", help="依次测试的并发机器人数")
+    parser.add_argument("--udp", default=None, help="覆盖 UDP 目标地址（默认取 start 响应或节点上报的接收地址）")
+    parser.add_argument("--loops", type=int, default=3, help="每个机器人重复播放 WAV 的次数")
+    parser.add_argument("--gap", type=float, default=1.0, help="两次播放之间的静音秒数")
+    parser.add_argument("--tail", type=float, default=1.5, help="末尾静音秒数")
+    parser.add_argument("--stagger", type=float, default=0.37, help="未指定偏移时相邻机器人的起始间隔秒数")
+    parser.add_argument("--poll-interval", type=float, default=0.02)
+    args = parser.parse_args()
+    if not args.wav and not args.robot:
+        args.wav = ["tests/test.wav"]
+
+    paths = {spec.split("@")[0] for spec in (args.robot or args.wav)}
+    wavs = {path: load_wav(path) for path in paths}
+
+    print(f"{'streams':>8}{'started':>8}{'audio s':>9}{'x rt':>7}{'late p99':>10}{'rtf':>7}"
+          f"{'sent.':>7}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}")
+    with httpx.Client(base_url=args.server, timeout=60) as client:
+        for n in [int(x) for x in args.streams.split(",")]:
+            row = run_round(client, _robots_for(n, args, wavs), args)
+            lat = np.array(row["latency"]) * 1000
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99]) if len(lat) else (float("nan"),) * 3
+            print(f"{row['streams']:>8}{row['started']:>8}{row['audio_s']:>9.1f}{row['throughput']:>7.2f}"
+                  f"{row['late_p99_ms']:>8.2f}ms{row['rtf']:>7.3f}{row['sentences']:>7}"
+                  f"{p50:>8.0f}{p95:>8.0f}{p99:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
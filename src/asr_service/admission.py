@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+from .asr_core.config import (
+    ADMISSION_RETRY_AFTER, CPU_BUDGET, DEFAULT_SESSION_COST, MAX_SESSIONS,
+)
+
+
+class AdmissionRejected(Exception):
+    """新会话被拒绝；retry_after 为建议客户端等待的秒数"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    按实测的每会话推理开销决定是否接纳新会话。
+
+    会话开销为其 RTF（推理秒数 / 音频秒数），实时流下约等于占用的核数。
+    尚未积累足够音频的会话以及待接纳的新会话，使用已结束会话 RTF 的指数滑动平均作为估计，
+    没有历史数据时为 default_cost。调用方负责加锁。
+
+    stage_capacity 为各阶段模型可同时执行的调用数（如加锁串行的 FunASR 模型为 1）：
+    所有会话共用这些模型，某阶段的开销之和超过其容量时，多出的核也无济于事，同样拒绝。
+    阶段开销的估计同样取已结束会话的滑动平均，没有历史数据时只按 CPU 预算判断。
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = MAX_SESSIONS,
+        cpu_budget: float = CPU_BUDGET,
+        default_cost: float = DEFAULT_SESSION_COST,
+        retry_after: int = ADMISSION_RETRY_AFTER,
+        smoothing: float = 0.2,
+        stage_capacity: Dict[str, int] | None = None,
+    ):
+        self.max_sessions = max_sessions
+        self.cpu_budget = cpu_budget
+        self.default_cost = default_cost
+        self.retry_after = retry_after
+        self.smoothing = smoothing
+        self.stage_capacity = dict(stage_capacity or {})
+        self._estimate: float | None = None
+        self._stage_estimates: Dict[str, float] = {}
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def estimated_cost(self) -> float:
+        return self._estimate if self._estimate is not None else self.default_cost
+
+    def observe(self, cost: float | None, stage_costs: Dict[str, float] | None = None) -> None:
+        """记录一个已结束会话的实测开销与各阶段开销"""
+        if cost is None:
+            return
+        if self._estimate is None:
+            self._estimate = cost
+        else:
+            self._estimate += self.smoothing * (cost - self._estimate)
+        for stage, value in (stage_costs or {}).items():
+            previous = self._stage_estimates.get(stage)
+            self._stage_estimates[stage] = value if previous is None else previous + self.smoothing * (value - previous)
+
+    def _stage_load(self, stage_costs: List[Dict[str, float] | None], sessions: int) -> Dict[str, dict]:
+        stages = {}
+        for stage, capacity in self.stage_capacity.items():
+            estimate = self._stage_estimates.get(stage, 0.0)
+            known = [c for c in stage_costs if c is not None]
+            load = sum(c.get(stage, 0.0) for c in known) + estimate * (sessions - len(known))
+            stages[stage] = {"load": round(load, 3), "capacity": capacity, "estimated_session_cost": round(estimate, 3)}
+        return stages
+
+    def load(self, costs: List[float | None], stage_costs: List[Dict[str, float] | None] | None = None) -> dict:
+        """costs 为各活动会话的实测开销（None 表示尚无实测值），stage_costs 为对应的各阶段开销"""
+        estimate = self.estimated_cost
+        cpu_load = sum(c if c is not None else estimate for c in costs)
+        stages = self._stage_load(stage_costs if stage_costs is not None else [None] * len(costs), len(costs))
+        stages_fit = all(s["load"] + s["estimated_session_cost"] <= s["capacity"] for s in stages.values())
+        return {
+            "sessions": len(costs),
+            "max_sessions": self.max_sessions,
+            "cpu_budget": self.cpu_budget,
+            "cpu_load": round(cpu_load, 3),
+            "utilization": round(cpu_load / self.cpu_budget, 3) if self.cpu_budget > 0 else None,
+            "estimated_session_cost": round(estimate, 3),
+            "stages": stages,
+            "accepting": len(costs) < self.max_sessions and cpu_load + estimate <= self.cpu_budget and stages_fit,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+    def admit(self, costs: List[float | None], stage_costs: List[Dict[str, float] | None] | None = None) -> None:
+        """接纳一个新会话，超出并发上限、CPU 预算或某阶段模型容量时抛出 AdmissionRejected"""
+        load = self.load(costs, stage_costs)
+        if load["sessions"] >= self.max_sessions:
+            self.rejected += 1
+            raise AdmissionRejected(f"已达到并发会话上限 {self.max_sessions}", self.retry_after)
+        if load["cpu_load"] + load["estimated_session_cost"] > self.cpu_budget:
+            self.rejected += 1
+            raise AdmissionRejected(
+                f"推理负载 {load['cpu_load']:.2f} 核，再接纳一个会话将超出预算 {self.cpu_budget:.2f} 核",
+                self.retry_after,
+            )
+        for stage, s in load["stages"].items():
+            if s["load"] + s["estimated_session_cost"] > s["capacity"]:
+                self.rejected += 1
+                raise AdmissionRejected(
+                    f"{stage} 模型负载 {s['load']:.2f}，再接纳一个会话将超出其并发容量 {s['capacity']}",
+                    self.retry_after,
+                )
+        self.admitted += 1
@@ -1 +1 @@
-﻿
+﻿# 核心识别模块，内部使用包内相对导入（from .config import ...）
@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from math import gcd
+
+import numpy as np
+
+from .config import SAMPLE_RATE, CHANNELS
+
+ENCODING_PCM16 = "pcm_s16le"
+ENCODING_MULAW = "mulaw"
+ENCODING_ALAW = "alaw"
+SUPPORTED_ENCODINGS = (ENCODING_PCM16, ENCODING_MULAW, ENCODING_ALAW)
+
+
+def _build_mulaw_table():
+    u = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    magnitude = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return np.where(u & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+def _build_alaw_table():
+    a = np.arange(256, dtype=np.int32) ^ 0x55
+    exponent = (a >> 4) & 0x07
+    mantissa = a & 0x0F
+    magnitude = np.where(
+        exponent == 0,
+        (mantissa << 4) + 8,
+        ((mantissa << 4) + 0x108) << np.maximum(exponent - 1, 0),
+    )
+    return np.where(a & 0x80, magnitude, -magnitude).astype(np.int16)
+
+
+# G.711 查找表：每个字节直接映射为 16bit 线性 PCM
+MULAW_TABLE = _build_mulaw_table()
+ALAW_TABLE = _build_alaw_table()
+
+
+@dataclass(frozen=True)
+class InputFormat:
+    """会话输入音频格式"""
+    encoding: str = ENCODING_PCM16
+    sample_rate: int = SAMPLE_RATE
+    channels: int = CHANNELS
+
+    def __post_init__(self):
+        if self.encoding not in SUPPORTED_ENCODINGS:
+            raise ValueError(f"不支持的编码: {self.encoding}")
+        if self.sample_rate <= 0 or self.channels <= 0:
+            raise ValueError("采样率和声道数必须为正数")
+
+    @property
+    def bytes_per_sample(self):
+        return 2 if self.encoding == ENCODING_PCM16 else 1
+
+    @property
+    def frame_bytes(self):
+        return self.bytes_per_sample * self.channels
+
+    @property
+    def silence_frame(self):
+        """一个采样帧的静音编码（G.711 的零值不是 0x00）"""
+        silence = {ENCODING_PCM16: b"\x00\x00", ENCODING_MULAW: b"\xff", ENCODING_ALAW: b"\xd5"}
+        return silence[self.encoding] * self.channels
+
+    @property
+    def is_native(self):
+        """是否已是识别链路使用的 16kHz/16bit/单声道 PCM"""
+        return (self.encoding == ENCODING_PCM16 and self.sample_rate == SAMPLE_RATE
+                and self.channels == CHANNELS)
+
+
+class PolyphaseResampler:
+    """
+    有理数倍率的多相 FIR 重采样器（流式）。
+    滤波器历史与相位在块之间保留，因此任意切块的输出与整段一次性处理一致。
+    """
+
+    def __init__(self, in_rate, out_rate, taps_per_phase=16):
+        from scipy.signal import firwin
+
+        g = gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.taps_per_phase = taps_per_phase
+        numtaps = taps_per_phase * self.up
+        cutoff = 1.0 / max(self.up, self.down)
+        h = firwin(numtaps, cutoff, window=("kaiser", 5.0)) * self.up
+        # phases[p, k] = h[p + k * up]
+        self._phases = h.reshape(taps_per_phase, self.up).T.astype(np.float32)
+        self._history = np.zeros(taps_per_phase - 1, dtype=np.float32)
+        self._t_next = 0  # 下一个输出样点在上采样域中的位置（相对当前块起点）
+
+    def process(self, samples):
+        """输入一块 float32 采样，返回重采样后的 float32 采样"""
+        n_in = len(samples)
+        k = self.taps_per_phase
+        buf = np.concatenate((self._history, samples))
+        limit = n_in * self.up
+        if self._t_next >= limit:
+            out = np.empty(0, dtype=np.float32)
+            t_last = self._t_next - self.down
+        else:
+            t = np.arange(self._t_next, limit, self.down)
+            i = t // self.up
+            p = t % self.up
+            idx = (k - 1) + i[:, None] - np.arange(k)[None, :]
+            out = np.einsum("nk,nk->n", buf[idx], self._phases[p])
+            t_last = int(t[-1])
+        self._t_next = t_last + self.down - limit
+        self._history = buf[len(buf) - (k - 1):]
+        return out
+
+
+class InputDecoder:
+    """
+    将任意输入格式的字节流转换为 16kHz/16bit/单声道 PCM。
+    G.711 查表解码 → 声道下混 → 多相重采样，全部为向量化 NumPy 运算；
+    跨数据包的不完整帧会保留到下一次调用。
+    """
+
+    def __init__(self, fmt: InputFormat):
+        self.format = fmt
+        self._pending = b""
+        self._resampler = None
+        if fmt.sample_rate != SAMPLE_RATE:
+            self._resampler = PolyphaseResampler(fmt.sample_rate, SAMPLE_RATE)
+
+    def feed(self, data):
+        """输入原始字节，返回可直接送入 VAD/ASR 的 16bit PCM 字节"""
+        fmt = self.format
+        if fmt.is_native:
+            return data  # 原生格式直接透传，不做任何拷贝
+
+        if self._pending:
+            data = self._pending + data
+        usable = len(data) - len(data) % fmt.frame_bytes
+        self._pending = data[usable:]
+        if usable == 0:
+            return b""
+        raw = np.frombuffer(data, dtype=np.uint8 if fmt.bytes_per_sample == 1 else np.int16, count=usable // fmt.bytes_per_sample)
+
+        if fmt.encoding == ENCODING_MULAW:
+            pcm = MULAW_TABLE[raw]
+        elif fmt.encoding == ENCODING_ALAW:
+            pcm = ALAW_TABLE[raw]
+        else:
+            pcm = raw
+
+        if fmt.channels > 1:
+            samples = pcm.reshape(-1, fmt.channels).mean(axis=1, dtype=np.float32)
+        elif self._resampler is not None:
+            samples = pcm.astype(np.float32)
+        else:
+            return pcm.tobytes()
+
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        return np.clip(np.rint(samples), -32768, 32767).astype(np.int16).tobytes()
+
+
+def resample_pcm16(audio_data, in_rate, out_rate=SAMPLE_RATE):
+    """一次性重采样整段 int16 音频"""
+    if in_rate == out_rate:
+        return audio_data
+    resampler = PolyphaseResampler(in_rate, out_rate)
+    samples = resampler.process(audio_data.astype(np.float32))
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
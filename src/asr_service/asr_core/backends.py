@@ -0,0 +1,372 @@
+"""
+推理后端接口与注册表。
+
+RealtimeAssistant 只通过以下四类接口调用模型，不再依赖 FunASR 的返回结构：
+  - VadBackend.detect            流式语音活动检测
+  - StreamingAsrBackend.decode   流式语音识别
+  - SpeakerEmbeddingBackend.embed 声纹特征提取（声明 feature_options 的实现另可直接接受会话声纹前端的 fbank）
+  - PunctuationBackend.punctuate 标点恢复
+
+每个阶段的实现通过 register_backend 注册，按 config.INFERENCE_BACKENDS 选择。
+实现可声明 concurrency：同一模型可同时执行的调用数（FunASR 模型加锁串行为 1，未声明表示不限），准入控制据此计算各阶段容量。
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .config import (
+    FUNASR_MODELS, MODEL_MMAP_DIR, MODEL_MMAP_ENABLED, SAMPLE_RATE, SPEAKER_FBANK_FRONTEND, VAD_CHUNK_DURATION_MS,
+)
+from .frontend import FbankOptions
+from .model_cache import cache_path, mmap_weights, record_load, weights_fingerprint
+from .utils import save_temp_wav
+
+STAGES = ("vad", "asr", "speaker", "punc")
+
+_REGISTRY = {stage: {} for stage in STAGES}
+
+
+def register_backend(stage, name):
+    """类装饰器：把实现注册到指定阶段"""
+    if stage not in _REGISTRY:
+        raise ValueError(f"未知的推理阶段: {stage}")
+
+    def decorator(cls):
+        _REGISTRY[stage][name] = cls
+        return cls
+    return decorator
+
+
+_LOCK_WAIT = threading.local()
+
+
+def lock_wait_seconds():
+    """本线程累计在模型锁上等待的秒数；调用方用前后差值把等待从推理耗时中扣除"""
+    return getattr(_LOCK_WAIT, "seconds", 0.0)
+
+
+class TimedLock:
+    """模型锁：记录本线程获取锁前等待的时长（见 lock_wait_seconds）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        start = time.perf_counter()
+        self._lock.acquire()
+        _LOCK_WAIT.seconds = lock_wait_seconds() + (time.perf_counter() - start)
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def backend_concurrency(backend):
+    """后端可同时执行的调用数；None 表示不限"""
+    return getattr(backend, "concurrency", None)
+
+
+def available_backends(stage):
+    return sorted(_REGISTRY[stage])
+
+
+def create_backend(stage, name, **options):
+    try:
+        cls = _REGISTRY[stage][name]
+    except KeyError:
+        raise ValueError(f"阶段 {stage} 没有名为 {name} 的后端，可选: {available_backends(stage)}")
+    return cls(**options)
+
+
+class VadBackend(ABC):
+    @abstractmethod
+    def detect(self, audio, cache, is_final=False):
+        """
+        处理一块 int16 音频，返回本块中检测到的语音段边界列表 [[beg_ms, end_ms], ...]。
+        语音开始时 end_ms 为 -1，语音结束时 beg_ms 为 -1（与 FunASR 流式 VAD 一致）。
+        cache 为会话级状态字典，由调用方持有。
+        """
+
+
+class StreamingAsrBackend(ABC):
+    device = None  # 流式缓存中张量所在的设备；恢复会话检查点时张量会移到此设备
+
+    @abstractmethod
+    def decode(self, audio, cache, is_final=False, chunk_size=(0, 10, 5),
+               encoder_chunk_look_back=4, decoder_chunk_look_back=1):
+        """流式识别一块 int16 音频，返回本次新增（或累计）的文本"""
+
+
+class SpeakerEmbeddingBackend(ABC):
+    # 非 None 时，会话的声纹前端按此参数增量计算 fbank，识别时调用 embed_features 而不是 embed
+    feature_options = None
+
+    @abstractmethod
+    def embed(self, audio):
+        """提取声纹特征；audio 为 int16 数组或 wav 文件路径，返回一维 numpy 向量，失败返回 None"""
+
+    def embed_features(self, features, audio):
+        """从 fbank 特征（帧数 × 梅尔频带数，按 feature_options 计算）提取声纹；audio 为同一区间的波形，默认按波形提取"""
+        return self.embed(audio)
+
+
+class PunctuationBackend(ABC):
+    @abstractmethod
+    def punctuate(self, text):
+        """为文本添加标点，返回新文本"""
+
+
+# ---------------------------------------------------------------------------
+# FunASR 实现
+# ---------------------------------------------------------------------------
+
+class _FunAsrModel:
+    """
+    加载 FunASR AutoModel 并对 generate 加锁。
+    AutoModel.generate 会修改模型自身的 kwargs，多个会话共享同一模型时需要串行调用（concurrency = 1）。
+    锁为 TimedLock：等待锁的时间不计入推理耗时，会话 RTF 反映模型本身的开销而不是锁竞争。
+    MODEL_MMAP_ENABLED 时 CPU 模型的权重改为内存映射（见 model_cache.py），多个进程共享。
+    """
+
+    def __init__(self, stage, **overrides):
+        from funasr import AutoModel
+
+        spec = dict(FUNASR_MODELS[stage])
+        spec.update(overrides)
+        spec.setdefault("disable_update", True)
+        self.model = AutoModel(**spec)
+        self.device = getattr(self.model, "kwargs", {}).get("device")
+        self.mapped_bytes = 0
+        if MODEL_MMAP_ENABLED and str(self.device or "cpu") == "cpu":
+            try:
+                # FunASR 把实际加载的权重文件记在 kwargs["init_param"]；缓存键包含其指纹，权重更新后不会沿用旧缓存
+                source = weights_fingerprint(self.model.kwargs.get("init_param"), self.model.model)
+                self.mapped_bytes = mmap_weights(self.model.model, cache_path(stage, spec, MODEL_MMAP_DIR, source))
+            except Exception as e:
+                print(f"⚠️ {stage} 模型权重内存映射失败，继续使用堆上的权重: {e}")
+        record_load(stage, mapped_bytes=self.mapped_bytes)
+        self._lock = TimedLock()
+
+    def generate(self, *args, **kwargs):
+        with self._lock:
+            return self.model.generate(*args, **kwargs)
+
+    def forward(self, features):
+        """跳过 FunASR 的前端，直接把特征张量送入网络"""
+        import torch
+
+        with self._lock, torch.no_grad():
+            return self.model.model(features.to(self.device or "cpu"))
+
+
+@register_backend("vad", "funasr")
+class FunAsrVad(VadBackend):
+    concurrency = 1
+
+    def __init__(self, **overrides):
+        self._model = _FunAsrModel("vad", **overrides)
+
+    def detect(self, audio, cache, is_final=False):
+        res = self._model.generate(
+            input=audio,
+            cache=cache,
+            is_final=is_final,
+            chunk_size=VAD_CHUNK_DURATION_MS,
+            disable_pbar=True,
+        )
+        return res[0]['value'] if res else []
+
+
+@register_backend("asr", "funasr")
+class FunAsrStreamingAsr(StreamingAsrBackend):
+    concurrency = 1
+
+    def __init__(self, **overrides):
+        self._model = _FunAsrModel("asr", **overrides)
+        self.device = self._model.device
+
+    def decode(self, audio, cache, is_final=False, chunk_size=(0, 10, 5),
+               encoder_chunk_look_back=4, decoder_chunk_look_back=1):
+        res = self._model.generate(
+            input=audio,
+            cache=cache,
+            is_final=is_final,
+            chunk_size=list(chunk_size),
+            encoder_chunk_look_back=encoder_chunk_look_back,
+            decoder_chunk_look_back=decoder_chunk_look_back,
+            disable_pbar=True,
+        )
+        return res[0]['text'] if res else ""
+
+
+@register_backend("speaker", "funasr")
+class FunAsrSpeakerEmbedding(SpeakerEmbeddingBackend):
+    # CAM++ 的输入为 80 维 Kaldi fbank（povey 窗，波形幅值归一到 [-1, 1)），按句做均值归一化
+    CAMPP_FBANK = FbankOptions(num_mel_bins=80, window_type="povey")
+    concurrency = 1
+
+    def __init__(self, **overrides):
+        self._model = _FunAsrModel("speaker", **overrides)
+        if SPEAKER_FBANK_FRONTEND:
+            self.feature_options = self.CAMPP_FBANK
+
+    def embed_features(self, features, audio):
+        import torch
+
+        features = features - features.mean(axis=0, keepdims=True)
+        emb = self._model.forward(torch.from_numpy(np.ascontiguousarray(features, dtype=np.float32))[None])
+        return emb.cpu().numpy().reshape(-1)
+
+    def embed(self, audio):
+        if isinstance(audio, str):
+            return self._embed_file(os.path.abspath(audio))
+        # 使用文件路径而不是numpy数组，避免维度问题；每次调用使用独立的临时文件
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            save_temp_wav(np.asarray(audio), SAMPLE_RATE, path)
+            return self._embed_file(path)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _embed_file(self, path):
+        res = self._model.generate(input=path, disable_pbar=True)
+        if not res or 'spk_embedding' not in res[0]:
+            return None
+        emb = res[0]['spk_embedding']
+        # 修复CUDA张量转换问题：将设备上的张量移至CPU
+        if hasattr(emb, 'cpu'):
+            emb = emb.cpu().numpy()
+        return np.asarray(emb).reshape(-1)
+
+
+@register_backend("punc", "funasr")
+class FunAsrPunctuation(PunctuationBackend):
+    concurrency = 1
+
+    def __init__(self, **overrides):
+        self._model = _FunAsrModel("punc", **overrides)
+
+    def punctuate(self, text):
+        res = self._model.generate(text, disable_pbar=True)
+        if res and 'text' in res[0]:
+            return res[0]['text']
+        return text
+
+
+# ---------------------------------------------------------------------------
+# 确定性 CPU 桩实现：不加载模型，结果只由输入音频决定，可模拟固定推理耗时
+# ---------------------------------------------------------------------------
+
+def _burn_cpu(ms):
+    """占用当前线程 ms 毫秒的 CPU，用于模拟推理开销"""
+    if ms <= 0:
+        return
+    deadline = time.perf_counter() + ms / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+@register_backend("vad", "stub")
+class StubVad(VadBackend):
+    """基于能量阈值的 VAD，语音结束前保留 hangover_ms 的拖尾"""
+
+    def __init__(self, threshold=500.0, hangover_ms=400, cpu_ms=0):
+        self.threshold = threshold
+        self.hangover_ms = hangover_ms
+        self.cpu_ms = cpu_ms
+
+    def detect(self, audio, cache, is_final=False):
+        _burn_cpu(self.cpu_ms)
+        audio = np.asarray(audio, dtype=np.float32)
+        # 与 FunASR 流式 VAD 一样，较长的输入按 VAD_CHUNK_DURATION_MS 逐块判断
+        step = SAMPLE_RATE * VAD_CHUNK_DURATION_MS // 1000
+        segments = []
+        for start in range(0, len(audio), step) if len(audio) else (0,):
+            last = start + step >= len(audio)
+            segments += self._detect_chunk(audio[start:start + step], cache, is_final and last)
+        return segments
+
+    def _detect_chunk(self, audio, cache, is_final):
+        chunk_ms = len(audio) * 1000 // SAMPLE_RATE
+        now_ms = cache.get("offset_ms", 0)
+        cache["offset_ms"] = now_ms + chunk_ms
+        loud = len(audio) > 0 and float(np.sqrt(np.mean(audio * audio))) > self.threshold
+        segments = []
+        if loud:
+            cache["silence_ms"] = 0
+            if not cache.get("speaking"):
+                cache["speaking"] = True
+                segments.append([now_ms, -1])
+        elif cache.get("speaking"):
+            cache["silence_ms"] = cache.get("silence_ms", 0) + chunk_ms
+            if cache["silence_ms"] >= self.hangover_ms or is_final:
+                cache["speaking"] = False
+                segments.append([-1, now_ms + chunk_ms])
+        return segments
+
+
+@register_backend("asr", "stub")
+class StubStreamingAsr(StreamingAsrBackend):
+    """每个流式块（默认 600ms）输出一个由音频内容哈希决定的汉字；较长的输入按块逐个输出"""
+
+    CHARSET = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+
+    def __init__(self, cpu_ms=0):
+        self.cpu_ms = cpu_ms
+
+    def decode(self, audio, cache, is_final=False, chunk_size=(0, 10, 5),
+               encoder_chunk_look_back=4, decoder_chunk_look_back=1):
+        _burn_cpu(self.cpu_ms)
+        audio = np.ascontiguousarray(audio, dtype=np.int16)
+        if len(audio) == 0:
+            return ""
+        stride = chunk_size[1] * SAMPLE_RATE * 60 // 1000
+        return "".join(self._char(audio[i:i + stride]) for i in range(0, len(audio), stride))
+
+    def _char(self, audio):
+        digest = hashlib.blake2b(audio.tobytes(), digest_size=4).digest()
+        return self.CHARSET[int.from_bytes(digest, "little") % len(self.CHARSET)]
+
+
+@register_backend("speaker", "stub")
+class StubSpeakerEmbedding(SpeakerEmbeddingBackend):
+    """对数频带能量作为声纹特征：同一段音频总是得到同一个向量"""
+
+    def __init__(self, dim=192, cpu_ms=0):
+        self.dim = dim
+        self.cpu_ms = cpu_ms
+
+    def embed(self, audio):
+        _burn_cpu(self.cpu_ms)
+        if isinstance(audio, str):
+            import scipy.io.wavfile as wavfile
+            _, audio = wavfile.read(audio)
+        audio = np.asarray(audio, dtype=np.float32)
+        if audio.ndim > 1:
+            audio = audio.mean(axis=1)
+        if len(audio) == 0:
+            return None
+        spectrum = np.abs(np.fft.rfft(audio))
+        bands = np.array_split(spectrum, self.dim)
+        emb = np.log1p(np.array([b.mean() if len(b) else 0.0 for b in bands]))
+        return emb - emb.mean()
+
+
+@register_backend("punc", "stub")
+class StubPunctuation(PunctuationBackend):
+    def __init__(self, cpu_ms=0):
+        self.cpu_ms = cpu_ms
+
+    def punctuate(self, text):
+        _burn_cpu(self.cpu_ms)
+        text = text.strip()
+        if text and not text.endswith(("。", "！", "？", ".", "!", "?")):
+            text += "。"
+        return text
@@ -0,0 +1,198 @@
+import enum
+import importlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from .config import CHECKPOINT_ALLOWED_CLASSES
+
+# 会话检查点格式：单个 .npz 文件（np.load 时 allow_pickle=False）
+#   __meta__  JSON（UTF-8 字节），描述对象树；数组与张量以 "a<序号>" 引用同文件中的数组
+# 支持 None/bool/int/float/str、list/tuple/dict（任意可序列化的键）、numpy 数组与标量、torch 张量，
+# 以及 CHECKPOINT_ALLOWED_CLASSES 中类的实例与枚举（FunASR 流式 VAD 的缓存中含有此类对象）。
+# 不使用 pickle，检查点可以在节点之间传输而不会执行任意代码。
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointError(ValueError):
+    pass
+
+
+def _is_tensor(obj):
+    return type(obj).__module__ == "torch" and type(obj).__name__ == "Tensor"
+
+
+def _class_path(cls):
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _allowed(cls):
+    return _class_path(cls) in CHECKPOINT_ALLOWED_CLASSES
+
+
+def _load_class(path, enum_only=False):
+    """按白名单加载类：只能是该模块中直接定义的类，不经过属性链或被导入的其它模块"""
+    if not isinstance(path, str) or path not in CHECKPOINT_ALLOWED_CLASSES:
+        raise CheckpointError(f"检查点中包含不允许的类型: {path}")
+    module_name, _, name = path.partition(":")
+    try:
+        cls = getattr(importlib.import_module(module_name), name, None)
+    except ImportError as e:
+        raise CheckpointError(f"无法加载检查点中的类型 {path}: {e}")
+    if not isinstance(cls, type) or cls.__module__ != module_name or cls.__qualname__ != name:
+        raise CheckpointError(f"检查点中包含不允许的类型: {path}")
+    if issubclass(cls, enum.Enum) != enum_only:
+        raise CheckpointError(f"检查点中的类型与节点不符: {path}")
+    return cls
+
+
+def dumps(obj):
+    """把对象树序列化为 npz 字节串"""
+    arrays = {}
+
+    def _array_ref(array):
+        key = f"a{len(arrays)}"
+        arrays[key] = array
+        return key
+
+    def pack(o):
+        if o is None or isinstance(o, (bool, int, float, str)) and not isinstance(o, enum.Enum):
+            return o
+        if isinstance(o, np.generic):
+            return pack(o.item())
+        if isinstance(o, np.ndarray):
+            return {"__nd__": _array_ref(np.ascontiguousarray(o))}
+        if _is_tensor(o):
+            return {"__tensor__": _array_ref(o.detach().cpu().numpy())}
+        if isinstance(o, dict):
+            return {"__dict__": [[pack(k), pack(v)] for k, v in o.items()]}
+        if isinstance(o, tuple):
+            return {"__tuple__": [pack(v) for v in o]}
+        if isinstance(o, list):
+            return [pack(v) for v in o]
+        if isinstance(o, enum.Enum) and _allowed(type(o)):
+            return {"__enum__": _class_path(type(o)), "value": pack(o.value)}
+        if hasattr(o, "__dict__") and _allowed(type(o)):
+            return {"__obj__": _class_path(type(o)), "state": pack(vars(o))}
+        raise CheckpointError(f"无法写入检查点的类型: {type(o).__module__}.{type(o).__qualname__}")
+
+    meta = json.dumps({"version": CHECKPOINT_VERSION, "root": pack(obj)}, ensure_ascii=False)
+    buf = io.BytesIO()
+    np.savez(buf, __meta__=np.frombuffer(meta.encode("utf-8"), dtype=np.uint8), **arrays)
+    return buf.getvalue()
+
+
+def _open(data):
+    try:
+        npz = np.load(io.BytesIO(data), allow_pickle=False)
+        meta = json.loads(bytes(npz["__meta__"]).decode("utf-8"))
+    except Exception as e:
+        raise CheckpointError(f"无效的检查点: {e}")
+    if meta.get("version") != CHECKPOINT_VERSION:
+        raise CheckpointError(f"不支持的检查点版本: {meta.get('version')}")
+    return npz, meta
+
+
+def loads(data, device=None):
+    """反序列化 dumps 的结果；张量恢复到 device（默认 CPU）"""
+    npz, meta = _open(data)
+
+    def unpack(o):
+        if isinstance(o, list):
+            return [unpack(v) for v in o]
+        if not isinstance(o, dict):
+            return o
+        if "__nd__" in o:
+            return npz[o["__nd__"]]
+        if "__tensor__" in o:
+            import torch
+            tensor = torch.from_numpy(npz[o["__tensor__"]])
+            return tensor.to(device) if device is not None else tensor
+        if "__dict__" in o:
+            return {_hashable(unpack(k)): unpack(v) for k, v in o["__dict__"]}
+        if "__tuple__" in o:
+            return tuple(unpack(v) for v in o["__tuple__"])
+        if "__enum__" in o:
+            return _load_class(o["__enum__"], enum_only=True)(unpack(o["value"]))
+        if "__obj__" in o:
+            cls = _load_class(o["__obj__"])
+            state = unpack(o["state"])
+            if not isinstance(state, dict) or not all(isinstance(k, str) for k in state):
+                raise CheckpointError(f"无效的对象状态: {o['__obj__']}")
+            instance = cls.__new__(cls)
+            instance.__dict__.update(state)
+            return instance
+        raise CheckpointError(f"无效的检查点节点: {sorted(o)}")
+
+    return unpack(meta["root"])
+
+
+def validate(data):
+    """只检查格式与版本，不还原对象（不需要 torch）；无效时抛出 CheckpointError"""
+    _open(data)
+
+
+def _hashable(key):
+    return tuple(key) if isinstance(key, list) else key
+
+
+class CheckpointStore:
+    """
+    本地检查点目录：每个会话一个 <session_id>.ckpt 文件，先写临时文件再原子替换。
+    目录可以放在共享存储上，使会话能在其它节点恢复。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, session_id):
+        if not session_id or os.sep in session_id or session_id.startswith("."):
+            raise ValueError(f"无效的会话 ID: {session_id!r}")
+        return os.path.join(self.directory, f"{session_id}.ckpt")
+
+    def save(self, session_id, data):
+        path = self.path(session_id)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def load(self, session_id):
+        """返回检查点字节串；不存在时抛出 KeyError"""
+        try:
+            with open(self.path(session_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(session_id)
+
+    def delete(self, session_id):
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".ckpt"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append({
+                "session_id": name[:-len(".ckpt")],
+                "bytes": stat.st_size,
+                "saved_at": stat.st_mtime,
+                "age_seconds": round(time.time() - stat.st_mtime, 1),
+            })
+        return entries
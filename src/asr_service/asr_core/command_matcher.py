@@ -0,0 +1,124 @@
+from collections import deque
+
+
+class CommandMatcher:
+    """
+    Aho–Corasick 多模式匹配器。
+
+    自动机只在构建时编译一次，之后匹配耗时与文本长度成线性关系，
+    与关键词数量无关。entries 的顺序即优先级（越靠前优先级越高）。
+    """
+
+    def __init__(self, entries):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for priority, (keyword, payload) in enumerate(entries):
+            if not keyword:
+                continue
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[node][ch] = nxt
+                node = nxt
+            self._out[node] += ((priority, keyword, payload),)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def scan(self, text, node=0):
+        """
+        从自动机状态 node 开始扫描 text。
+        Returns: (结束状态, [(结束位置, 优先级, 关键词, payload), ...])
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for priority, keyword, payload in out[node]:
+                matches.append((pos, priority, keyword, payload))
+        return node, matches
+
+    def best(self, text):
+        """返回 text 中优先级最高的匹配 (关键词, payload)，无匹配时返回 None"""
+        _, matches = self.scan(text)
+        if not matches:
+            return None
+        _, _, keyword, payload = min(matches, key=lambda m: m[1])
+        return keyword, payload
+
+    def cursor(self):
+        return MatchCursor(self)
+
+
+class MatchCursor:
+    """增量匹配游标：依次喂入流式识别的文本增量，跨增量边界的关键词同样能被识别"""
+
+    def __init__(self, matcher):
+        self._matcher = matcher
+        self._node = 0
+        self.consumed = 0
+
+    def feed(self, delta):
+        """喂入文本增量，返回本次新出现的匹配 [(关键词, payload), ...]（按出现顺序）"""
+        if not delta:
+            return []
+        self._node, matches = self._matcher.scan(delta, self._node)
+        self.consumed += len(delta)
+        return [(keyword, payload) for _, _, keyword, payload in matches]
+
+    def reset(self):
+        self._node = 0
+        self.consumed = 0
+
+    def get_state(self):
+        """游标位置（用于会话检查点；只在同一份指令配置构建的匹配器之间有效）"""
+        return {"node": self._node, "consumed": self.consumed}
+
+    def set_state(self, state):
+        self._node = state["node"]
+        self.consumed = state["consumed"]
+
+
+def build_command_matcher(definitions):
+    """
+    从 COMMAND_DEFINITIONS 构建匹配器。
+    精确关键词优先于 fuzzy_keywords，同类按定义顺序，与逐个子串查找的结果一致。
+    """
+    entries = []
+    for source, field in (("exact", "keywords"), ("fuzzy", "fuzzy_keywords")):
+        for cmd in definitions:
+            if not cmd or "id" not in cmd:
+                continue
+            for kw in cmd.get(field, []):
+                entries.append((kw, (cmd, source)))
+    return CommandMatcher(entries)
+
+
+def command_match_dict(keyword, payload):
+    """将匹配结果转换为 detect_command 的返回格式"""
+    cmd, source = payload
+    return {
+        "id": cmd.get("id"),
+        "type": cmd.get("type"),
+        "roles": cmd.get("roles", []),
+        "keyword": keyword,
+        "source": source,
+    }
@@ -1,4 +1,4 @@
-import pyaudio
+import os
 
 # Audio Configuration
 # VAD 使用 200ms 切片，ASR 使用 600ms 切片
@@ -7,7 +7,7 @@ ASR_CHUNK_DURATION_MS = 600
 
 SAMPLE_RATE = 16000
 CHANNELS = 1
-FORMAT = pyaudio.paInt16
+FORMAT = 8  # pyaudio.paInt16，避免导入配置时加载 PortAudio
 
 # 计算对应的采样点数
 VAD_CHUNK_SIZE = int(SAMPLE_RATE * VAD_CHUNK_DURATION_MS / 1000)
@@ -16,10 +16,43 @@ ASR_CHUNK_SIZE = int(SAMPLE_RATE * ASR_CHUNK_DURATION_MS / 1000)
 # 兼容旧代码，默认 CHUNK_SIZE 指向 VAD 的大小（因为我们是按 VAD 粒度读取的）
 CHUNK_SIZE = VAD_CHUNK_SIZE 
 
+# Inference Backends
+# 每个阶段（vad/asr/speaker/punc）可独立选择推理后端，见 backends.py 中的注册表。
+# "funasr" 为默认实现；"stub" 为确定性的 CPU 桩实现，用于压测与单元测试。
+# 环境变量 ASR_INFERENCE_BACKEND 可统一覆盖所有阶段。
+INFERENCE_BACKEND = os.environ.get("ASR_INFERENCE_BACKEND", "funasr")
+INFERENCE_BACKENDS = {
+    "vad": INFERENCE_BACKEND,
+    "asr": INFERENCE_BACKEND,
+    "speaker": INFERENCE_BACKEND,
+    "punc": INFERENCE_BACKEND,
+}
+
+# FunASR 模型（本地目录可替换为 MODEL_DIR + "speech_..."）
+FUNASR_MODELS = {
+    "asr": {"model": "paraformer-zh-streaming", "model_revision": "v2.0.4"},
+    "vad": {"model": "fsmn-vad", "model_revision": "v2.0.4"},
+    "speaker": {"model": "cam++", "model_revision": "v2.0.2"},
+    "punc": {"model": "ct-punc", "model_revision": "v2.0.4"},
+}
+
+# 模型权重内存映射：加载后把 CPU 模型的权重另存到 MODEL_MMAP_DIR 并以 mmap 方式读回，
+# 同一主机上的多个工作进程共享页缓存中的同一份权重，而不是各自在堆上保留一份
+MODEL_MMAP_ENABLED = os.environ.get("ASR_MODEL_MMAP", "1") == "1"
+MODEL_MMAP_DIR = os.environ.get("ASR_MODEL_MMAP_DIR", "./model_cache")
+
 # Speaker Configuration
 # 激进调整：降低到 0.32，优先保证老师能被认出来
 SIMILARITY_THRESHOLD = 0.45
+# 学生声纹库容量控制：长时间会话中保持每次识别的开销稳定
+MAX_STUDENTS = 32  # 学生簇上限，超过后淘汰最久未匹配的学生
+STUDENT_MERGE_THRESHOLD = 0.75  # 两个学生簇相似度超过此值时合并为一个
+STUDENT_MIN_EVIDENCE = 2  # 未匹配片段需累计出现的次数，达到后才创建新学生
+MAX_PENDING_CANDIDATES = 8  # 候选（证据不足）片段池上限
 REGISTERED_DB_PATH = "./src/asr_service/asr_core/teacher_db/teacher_db.pkl"
+# 声纹前端：开启后 CAM++ 直接使用会话内增量计算的 fbank（frontend.py），不再经 FunASR 自带的特征提取。
+# 老师声纹库由 FunASR 路径建立，需先在装有 torchaudio 的环境中通过 tests/test_frontend.py 的对照测试再开启
+SPEAKER_FBANK_FRONTEND = os.environ.get("ASR_SPEAKER_FBANK_FRONTEND", "0") == "1"
 # 如果此文件存在，将优先使用此文件进行注册，而不是录音
 # TEACHER_WAV_PATH = "realtime_meeting_assistant/teacher_audio/teacher_reg.wav"
 TEACHER_WAV_PATH = "./src/asr_service/asr_core/teacher_audio/teacher_register.wav"
@@ -27,6 +60,79 @@ TEACHER_WAV_PATH = "./src/asr_service/asr_core/teacher_audio/teacher_register.wa
 # File Paths
 TEMP_WAV_PATH = "temp_chunk.wav"
 
+# 会话音频抓取（用于复现与性能分析），文件为固定大小的环形缓冲
+TAP_DIR = "./taps"
+TAP_CAPACITY_BYTES = 64 * 1024 * 1024  # 约 35 分钟 16kHz/16bit 单声道 PCM
+# 会话流水线计时（Chrome Trace），环形缓冲最多保留的事件数
+TRACE_CAPACITY_EVENTS = 200_000
+
+# 会话检查点：定期保存流式缓存、未完成的句子、学生声纹库与已有结果，可按会话 ID 恢复
+CHECKPOINT_DIR = os.environ.get("ASR_CHECKPOINT_DIR", "./checkpoints")
+CHECKPOINT_INTERVAL_SECONDS = 10.0
+# 检查点中允许出现的自定义类（FunASR 流式 VAD 缓存中的状态对象与枚举），按 "模块:类名" 精确匹配
+_FSMN_VAD_MODULE = "funasr.models.fsmn_vad_streaming.model"
+CHECKPOINT_ALLOWED_CLASSES = frozenset(f"{_FSMN_VAD_MODULE}:{name}" for name in (
+    "Stats", "WindowDetector", "E2EVadSpeechBufWithDoa", "E2EVadFrameProb", "VADXOptions",
+    "VadStateMachine", "FrameState", "AudioChangeState", "VadDetectMode",
+))
+
+# 空闲会话挂起：连续 IDLE_SUSPEND_SECONDS 秒音频中 VAD 未检测到语音时释放 VAD/ASR 流式缓存，
+# 之后只对音频块做能量检测（RMS 超过 IDLE_WAKE_RMS 时恢复）；恢复后 IDLE_WAKE_GRACE_SECONDS 内
+# VAD 仍未检测到语音则重新挂起
+IDLE_SUSPEND_SECONDS = float(os.environ.get("ASR_IDLE_SUSPEND_SECONDS", "30"))
+IDLE_WAKE_RMS = 200.0
+IDLE_WAKE_GRACE_SECONDS = 2.0
+
+# 负载卸除：会话处理滞后于音频时钟时逐级降级，滞后恢复后逐级撤销
+#   1 推迟标点（句子先以原文保存，恢复后补标点）  2 沿用上一句的说话人，不做声纹识别
+#   3 ASR 切换为大块配置（下一句开始生效）          4 积压音频合并为一批，VAD/ASR 各调用一次
+LOAD_SHEDDING_ENABLED = os.environ.get("ASR_LOAD_SHEDDING", "1") == "1"
+SHED_LAG_SECONDS = (1.0, 2.0, 4.0, 6.0)  # 进入第 1~4 级的滞后（秒）
+SHED_RECOVER_RATIO = 0.5  # 滞后低于当前级阈值的此比例时降一级
+SHED_HOLD_SECONDS = 2.0  # 每次调整级别后至少保持的时间，避免在阈值附近反复切换
+SHED_ASR_CHUNK_SIZE = [0, 20, 10]  # 第 3 级起的 ASR 流式配置：1200ms 块（默认 [0, 10, 5] 为 600ms）
+SHED_BATCH_CHUNKS = 10  # 第 4 级每批最多合并的 VAD 块数（2 秒）
+
+# Webhook：定稿的句子推送给下游（对话管理、课程归档），逗号分隔的 URL；/asr/start 可为单个会话追加地址
+# 同一地址的句子在时间窗内合并为一次 POST；发送失败的批次写入磁盘队列（每个地址一个子目录），按指数退避重试
+WEBHOOK_URLS = os.environ.get("ASR_WEBHOOK_URLS", "")
+WEBHOOK_BATCH_WINDOW_SECONDS = 0.2
+WEBHOOK_BATCH_MAX_SENTENCES = 50
+WEBHOOK_TIMEOUT_SECONDS = 5.0
+WEBHOOK_MAX_CONNECTIONS = 8  # 所有地址共用的 keep-alive 连接池大小
+WEBHOOK_RETRY_INITIAL_SECONDS = 0.5
+WEBHOOK_RETRY_MAX_SECONDS = 30.0
+WEBHOOK_QUEUE_DIR = os.environ.get("ASR_WEBHOOK_QUEUE_DIR", "./webhook_queue")
+WEBHOOK_QUEUE_MAX_BATCHES = 1000  # 每个地址磁盘队列的批次上限，超出后丢弃最旧的批次
+
+# Admission Control
+# 新会话准入：并发会话上限与推理 CPU 预算（单位为核，即每秒墙钟时间可用的推理秒数）。
+# 会话开销按实测 RTF（推理耗时 / 音频时长）计，音频不足 ADMISSION_MIN_AUDIO_SECONDS 时使用估计值。
+MAX_SESSIONS = int(os.environ.get("ASR_MAX_SESSIONS", "8"))
+CPU_BUDGET = float(os.environ.get("ASR_CPU_BUDGET", os.cpu_count() or 1))
+DEFAULT_SESSION_COST = 0.5  # 没有任何实测数据时对单个会话开销的估计
+ADMISSION_MIN_AUDIO_SECONDS = 5.0
+ADMISSION_RETRY_AFTER = 5  # 拒绝时 Retry-After 的秒数
+
+# UDP 音频接收地址（组播或单播 "ip:port"）；同一主机运行多个节点时需各自指定端口
+UDP_ADDRESS = os.environ.get("ASR_UDP_ADDRESS", "239.168.123.161:5555")
+
+# 本机接入：与服务同机的采集进程可用 /asr/start 的 transport="unix"（SOCK_SEQPACKET）或 "shm"（共享内存环形缓冲）
+# 代替 UDP，会话的 socket 文件为 LOCAL_INGEST_DIR/<session_id>.sock
+LOCAL_INGEST_DIR = os.environ.get("ASR_LOCAL_INGEST_DIR", "/tmp/asr_ingest")
+LOCAL_SHM_RING_BYTES = 1 << 20  # 每个生产者连接的环形缓冲大小（约 32 秒 16kHz/16bit 单声道 PCM）
+
+# Router
+# 路由模式（uvicorn src.asr_service.router:app）：后端 ASR 节点，逗号分隔，每项为 "http://host:port"，
+# 或 "http://host:port=udp_host:udp_port" 显式指定告知机器人的 UDP 地址（默认取节点上报的接收端口）
+ROUTER_NODES = os.environ.get("ASR_ROUTER_NODES", "")
+ROUTER_HEALTH_INTERVAL_SECONDS = 2.0
+ROUTER_MAX_FAILURES = 3  # 连续健康检查失败达到此次数后节点下线，不再分配新会话
+ROUTER_REQUEST_TIMEOUT_SECONDS = 10.0  # 转发请求的超时（stop/result 的 wait 秒数另计）
+
+# 诊断：/admin/profile 下的 CPU 采样与内存快照接口，默认关闭（关闭时接口返回 404，不产生任何开销）
+PROFILING_ENABLED = os.environ.get("ASR_ENABLE_PROFILING", "0") == "1"
+
 # Commands
 # 扩充指令库，包含常见的口语表达
 
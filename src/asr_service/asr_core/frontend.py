@@ -0,0 +1,167 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from .config import SAMPLE_RATE
+
+_LOG_FLOOR = np.finfo(np.float32).eps
+
+
+@dataclass(frozen=True)
+class FbankOptions:
+    """Kaldi 兼容的 fbank 参数（与 torchaudio.compliance.kaldi.fbank 的默认值一致）"""
+
+    num_mel_bins: int = 80
+    frame_length_ms: float = 25.0
+    frame_shift_ms: float = 10.0
+    window_type: str = "povey"  # "povey" | "hamming"
+    preemphasis: float = 0.97
+    low_freq: float = 20.0
+    high_freq: float = 0.0  # <= 0 表示相对奈奎斯特频率的偏移
+    sample_rate: int = SAMPLE_RATE
+
+    @property
+    def window_size(self):
+        return int(self.sample_rate * self.frame_length_ms / 1000)
+
+    @property
+    def window_shift(self):
+        return int(self.sample_rate * self.frame_shift_ms / 1000)
+
+    @property
+    def padded_window_size(self):
+        return 1 << (self.window_size - 1).bit_length()
+
+
+def _mel(freq):
+    return 1127.0 * np.log(1.0 + np.asarray(freq, dtype=np.float64) / 700.0)
+
+
+def mel_banks(opts):
+    """三角梅尔滤波器组，形状 (num_mel_bins, padded_window_size // 2 + 1)"""
+    nyquist = opts.sample_rate / 2
+    high_freq = opts.high_freq if opts.high_freq > 0 else nyquist + opts.high_freq
+    num_fft_bins = opts.padded_window_size // 2
+    mel_low, mel_high = _mel(opts.low_freq), _mel(high_freq)
+    delta = (mel_high - mel_low) / (opts.num_mel_bins + 1)
+    left = mel_low + np.arange(opts.num_mel_bins)[:, None] * delta
+    center, right = left + delta, left + 2 * delta
+    mel = _mel(np.arange(num_fft_bins) * opts.sample_rate / opts.padded_window_size)[None, :]
+    banks = np.maximum(0.0, np.minimum((mel - left) / (center - left), (right - mel) / (right - center)))
+    # 奈奎斯特频点不参与任何滤波器
+    return np.pad(banks, ((0, 0), (0, 1))).astype(np.float32)
+
+
+def _window(opts):
+    n = np.arange(opts.window_size)
+    hann = 0.5 - 0.5 * np.cos(2 * np.pi * n / (opts.window_size - 1))
+    if opts.window_type == "povey":
+        return (hann ** 0.85).astype(np.float32)
+    if opts.window_type == "hamming":
+        return (0.54 - 0.46 * np.cos(2 * np.pi * n / (opts.window_size - 1))).astype(np.float32)
+    raise ValueError(f"不支持的窗函数: {opts.window_type}")
+
+
+class Fbank:
+    """对已分帧的音频计算 log-mel fbank；窗函数与滤波器组只在构造时计算一次"""
+
+    def __init__(self, opts=FbankOptions()):
+        self.opts = opts
+        self._window = _window(opts)
+        self._banks_t = mel_banks(opts).T.copy()
+
+    def frames(self, samples, num_frames):
+        """samples 为 float32 波形，返回前 num_frames 帧（snip_edges）"""
+        size, shift = self.opts.window_size, self.opts.window_shift
+        strided = np.lib.stride_tricks.as_strided(
+            samples, shape=(num_frames, size), strides=(shift * samples.strides[0], samples.strides[0]),
+        )
+        frames = strided - strided.mean(axis=1, keepdims=True)
+        emphasized = np.empty_like(frames)
+        emphasized[:, 1:] = frames[:, 1:] - self.opts.preemphasis * frames[:, :-1]
+        emphasized[:, 0] = frames[:, 0] * (1.0 - self.opts.preemphasis)
+        spectrum = np.fft.rfft(emphasized * self._window, n=self.opts.padded_window_size)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        return np.log(np.maximum(power @ self._banks_t, _LOG_FLOOR))
+
+    def __call__(self, samples):
+        """对整段波形计算 fbank，形状 (帧数, num_mel_bins)"""
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        size, shift = self.opts.window_size, self.opts.window_shift
+        num_frames = 0 if len(samples) < size else 1 + (len(samples) - size) // shift
+        return self.frames(samples, num_frames)
+
+
+def pcm_to_float(audio):
+    """int16 PCM 转为 [-1, 1) 的 float32 波形"""
+    return np.asarray(audio, dtype=np.float32) * (1.0 / 32768.0)
+
+
+class StreamingFbank:
+    """
+    会话级增量前端（目前只供声纹识别使用，VAD 与 ASR 的 FunASR 模型按波形自行计算特征）：
+    每个音频块只转换一次为浮点并增量计算 fbank，跨块边界的帧用上一块留下的采样补齐，
+    不重复计算。最近的 history_frames 帧保存在预分配的环形缓冲中，消费者按采样区间取用。
+
+    帧 k 覆盖的采样区间为 [k*shift, k*shift + window)（从 reset 起计），
+    与对同一区间的波形整段计算 fbank 得到的帧完全相同。
+    """
+
+    def __init__(self, opts=FbankOptions(), history_frames=256):
+        self.fbank = Fbank(opts)
+        self._ring = np.zeros((history_frames, opts.num_mel_bins), dtype=np.float32)
+        self._pending = np.zeros(opts.window_size + opts.window_shift, dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        self.samples = 0  # 已接收的采样数
+        self.num_frames = 0  # 已计算的帧数
+        self._pending_len = 0  # 尚未凑满下一帧的采样（从第 num_frames 帧的起点开始）
+
+    @property
+    def opts(self):
+        return self.fbank.opts
+
+    def accept(self, pcm):
+        """接收一块 int16 音频，计算新增的完整帧"""
+        size, shift = self.opts.window_size, self.opts.window_shift
+        samples = pcm_to_float(pcm)
+        buf = np.concatenate((self._pending[:self._pending_len], samples))
+        self.samples += len(samples)
+        count = 0 if len(buf) < size else 1 + (len(buf) - size) // shift
+        if count:
+            self._store(self.fbank.frames(buf, count))
+        rest = buf[count * shift:]
+        if len(rest) > len(self._pending):
+            self._pending = np.zeros(len(rest), dtype=np.float32)
+        self._pending[:len(rest)] = rest
+        self._pending_len = len(rest)
+
+    def _store(self, frames):
+        cap = len(self._ring)
+        if len(frames) >= cap:
+            # 只保留最后 cap 帧，全局帧号 g 存放在 g % cap
+            first_kept = self.num_frames + len(frames) - cap
+            self._ring[:] = np.roll(frames[-cap:], first_kept % cap, axis=0)
+        else:
+            pos = self.num_frames % cap
+            first = min(len(frames), cap - pos)
+            self._ring[pos:pos + first] = frames[:first]
+            self._ring[:len(frames) - first] = frames[first:]
+        self.num_frames += len(frames)
+
+    def features(self, num_samples):
+        """
+        最近 num_samples 个采样对应的 fbank 帧（等同于对这段波形整段计算），
+        区间起点未与帧移对齐或帧已不在缓冲中时返回 None，调用方应回退到波形输入。
+        """
+        size, shift = self.opts.window_size, self.opts.window_shift
+        start = self.samples - num_samples
+        if start < 0 or start % shift or num_samples < size:
+            return None
+        first = start // shift
+        last = first + (num_samples - size) // shift  # 含
+        if last >= self.num_frames or first < self.num_frames - len(self._ring):
+            return None
+        idx = np.arange(first, last + 1) % len(self._ring)
+        return self._ring[idx]
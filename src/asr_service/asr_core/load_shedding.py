@@ -0,0 +1,92 @@
+import time
+from collections import deque
+
+from .config import SHED_HOLD_SECONDS, SHED_LAG_SECONDS, SHED_RECOVER_RATIO
+
+# 各级降级措施（级别 = 下标，每一级包含之前所有级别的措施）
+SHED_STAGES = ("normal", "defer_punctuation", "reuse_speaker", "large_asr_chunks", "batch_catchup")
+LEVEL_DEFER_PUNCTUATION = 1
+LEVEL_REUSE_SPEAKER = 2
+LEVEL_LARGE_CHUNKS = 3
+LEVEL_BATCH_CATCHUP = 4
+
+# 音频源阻塞超过此时长即认为积压已处理完（音频块是刚到达的）
+CAUGHT_UP_WAIT_SECONDS = 0.005
+
+
+class LoadShedder:
+    """
+    按音频时钟测量会话的处理滞后，并据此选择降级级别。
+
+    音频时钟：第 k 块音频的结束位置为 pos_k（秒），它的“应到达时刻”为 anchor + pos_k。
+    anchor 取 min(收到时刻 - pos)，处理跟得上时即为真实的流起点；若读取音频块时音频源阻塞过
+    （积压已清空，块是刚到的），则以该块重新对齐，发送端暂停造成的空档不会被误算为滞后。
+    滞后 = 块处理完成的时刻 - (anchor + pos_k)。
+
+    超过 SHED_LAG_SECONDS[i] 时直接升到第 i+1 级；滞后降到当前级阈值的 SHED_RECOVER_RATIO 以下、
+    且距上次调整已过 SHED_HOLD_SECONDS 时降一级。每次调整记录为一条事件。
+    """
+
+    def __init__(self, thresholds=SHED_LAG_SECONDS, recover_ratio=SHED_RECOVER_RATIO,
+                 hold_seconds=SHED_HOLD_SECONDS, max_events=256):
+        self.thresholds = tuple(thresholds)
+        self.recover_ratio = recover_ratio
+        self.hold_seconds = hold_seconds
+        self.level = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self.events = deque(maxlen=max_events)
+        self.escalations = 0
+        self._anchor = None
+        self._changed_at = None
+
+    @property
+    def stage(self):
+        return SHED_STAGES[self.level]
+
+    def arrived(self, audio_end, received_at, waited):
+        """收到一块音频：audio_end 为其结束位置（秒），waited 为读取时在音频源上阻塞的时长"""
+        offset = received_at - audio_end
+        if self._anchor is None or waited >= CAUGHT_UP_WAIT_SECONDS or offset < self._anchor:
+            self._anchor = offset
+
+    def processed(self, audio_end, now=None):
+        """处理完截至 audio_end 的音频：更新滞后并调整级别，级别变化时返回事件，否则返回 None"""
+        now = time.monotonic() if now is None else now
+        if self._anchor is None:
+            return None
+        self.lag = max(0.0, now - self._anchor - audio_end)
+        self.max_lag = max(self.max_lag, self.lag)
+        target = self.level
+        while target < len(self.thresholds) and self.lag >= self.thresholds[target]:
+            target += 1
+        if target == self.level and self.level > 0:
+            held = self._changed_at is None or now - self._changed_at >= self.hold_seconds
+            if held and self.lag < self.thresholds[self.level - 1] * self.recover_ratio:
+                target = self.level - 1
+        if target == self.level:
+            return None
+        event = {
+            "time": time.time(),
+            "audio_seconds": round(audio_end, 3),
+            "lag_seconds": round(self.lag, 3),
+            "from": SHED_STAGES[self.level],
+            "to": SHED_STAGES[target],
+            "level": target,
+        }
+        if target > self.level:
+            self.escalations += 1
+        self.level = target
+        self._changed_at = now
+        self.events.append(event)
+        return event
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "stage": self.stage,
+            "lag_seconds": round(self.lag, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+            "escalations": self.escalations,
+            "events": list(self.events),
+        }
@@ -1,21 +1,37 @@
 import os
+import threading
 import time
 import traceback
-import numpy as np
-import pyaudio
 from collections import deque
-from funasr import AutoModel
+import numpy as np
 
 MODEL_DIR = "./models/iic/"
 # 导入配置和工具
-from config import (
+from .config import (
     SAMPLE_RATE, FORMAT, CHANNELS, 
     VAD_CHUNK_SIZE, ASR_CHUNK_SIZE, VAD_CHUNK_DURATION_MS,
-    SIMILARITY_THRESHOLD, TEMP_WAV_PATH, TEACHER_WAV_PATH,
+    SIMILARITY_THRESHOLD, TEACHER_WAV_PATH, INFERENCE_BACKENDS, CHECKPOINT_INTERVAL_SECONDS,
+    IDLE_SUSPEND_SECONDS, IDLE_WAKE_RMS, IDLE_WAKE_GRACE_SECONDS,
+    LOAD_SHEDDING_ENABLED, SHED_ASR_CHUNK_SIZE, SHED_BATCH_CHUNKS,
     COMMAND_KEYWORDS_STOP, COMMAND_KEYWORDS_START
 )
-from speaker_manager import SpeakerManager
-from utils import detect_command, check_for_commands, save_temp_wav, register_teacher_from_file
+from .backends import backend_concurrency, create_backend, lock_wait_seconds
+from .model_cache import load_stats as model_load_stats, record_load
+from .speaker_manager import SpeakerManager
+from .utils import (
+    detect_command, check_for_commands, register_teacher_from_file,
+    approx_nbytes, COMMAND_MATCHER
+)
+from .command_matcher import command_match_dict
+from .session_tap import read_tap
+from .pcm_buffer import PcmBuffer, PcmRing
+from .frontend import StreamingFbank
+from .load_shedding import (
+    LoadShedder, CAUGHT_UP_WAIT_SECONDS,
+    LEVEL_DEFER_PUNCTUATION, LEVEL_REUSE_SPEAKER, LEVEL_LARGE_CHUNKS, LEVEL_BATCH_CATCHUP,
+)
+from . import checkpoint
+from .tracing import traced
 
 class AudioStream:
     """音频流基类，所有音频输入源应继承此类"""
@@ -27,9 +43,22 @@ class AudioStream:
         """关闭音频流"""
         pass
 
+    def __iter__(self):
+        """按 VAD 粒度迭代音频块，供 run_stream 直接消费；读到空数据时结束"""
+        try:
+            while True:
+                data = self.read(VAD_CHUNK_SIZE)
+                if not data:
+                    break
+                yield data
+        finally:
+            self.close()
+
 class MicrophoneStream(AudioStream):
     """麦克风音频流实现"""
     def __init__(self):
+        import pyaudio  # 只有麦克风输入需要 PortAudio
+
         self.p = pyaudio.PyAudio()
         self.stream = self.p.open(
             format=FORMAT,
@@ -49,14 +78,82 @@ class MicrophoneStream(AudioStream):
         if hasattr(self, 'p') and self.p:
             self.p.terminate()
 
+class ReplayStream(AudioStream):
+    """
+    回放会话抓取文件（见 session_tap.SessionTap）。
+    speed=1.0 按原始到达时间实时回放，speed=N 为 N 倍速，speed=None 或 0 为不限速。
+    """
+    def __init__(self, path, speed=1.0):
+        self.records = read_tap(path)
+        self.speed = speed
+        self._index = 0
+        self._buffer = bytearray()
+        self._start = None
+        self._last_arrival = 0.0
+
+    def read(self, size):
+        want = size * 2  # size 为采样点数，16bit PCM
+        while len(self._buffer) < want and self._index < len(self.records):
+            arrival, pcm = self.records[self._index]
+            self._index += 1
+            self._buffer += pcm
+            self._last_arrival = arrival
+        if self._index >= len(self.records) and len(self._buffer) < want:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            return data
+        self._pace(self._last_arrival)
+        data = bytes(self._buffer[:want])
+        del self._buffer[:want]
+        return data
+
+    def _pace(self, arrival):
+        """按到达时间（相对首帧）与倍速等待，使块的释放时刻与原会话一致"""
+        if not self.speed:
+            return
+        if self._start is None:
+            self._start = time.monotonic() - arrival / self.speed
+        delay = self._start + arrival / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+PRE_ROLL_CHUNKS = 3  # 语音开始前补入的 VAD 块数
+SPK_MIN_CHUNKS = 6  # 声纹识别所需的最少 VAD 块数（含预录制部分）
+DEFAULT_ASR_CHUNK_SIZE = [0, 10, 5]  # Paraformer 流式配置，chunk_size[1] 以 60ms 为单位（600ms）
+ARRIVAL_HISTORY_CHUNKS = 64  # 记录到达时间的最近音频块数，用于把语音结束的采样点换算为墙钟时间
+
+
 class RecognitionState:
-    """管理语音识别的状态"""
+    """
+    管理语音识别的状态。
+    音频缓冲为预分配的 int16 数组：pre_buffer 为预录制环形缓冲，asr_buffer 累积待送入 ASR 的音频，
+    spk_buffer 累积用于声纹识别的音频；逐块处理时不再分配新的缓冲对象。
+    stream_samples 为已处理的音频在会话音频流中的位置（16kHz 采样点），utterance_start/utterance_end 为当前句子的区间。
+    """
+    __slots__ = (
+        "vad_cache", "asr_cache", "asr_buffer", "spk_buffer", "pre_buffer",
+        "is_speaking", "current_speaker", "is_speaker_identified",
+        "current_sentence_text", "last_asr_text", "last_line_len", "last_voice_time",
+        "asr_chunk_size", "encoder_chunk_look_back", "decoder_chunk_look_back",
+        "dialog_mode", "session_started", "pending_stop_command", "stop_command_processed",
+        "command_cursor", "suspended", "silent_seconds", "spk_frontend",
+        "asr_chunk_samples", "vad_offset_ms", "speaker_reused",
+        "stream_samples", "utterance_start", "utterance_end", "speech_end_at", "asr_final_at",
+    )
+    # 写入检查点的标量字段（缓冲区、流式缓存与指令游标单独处理）
+    _SNAPSHOT_FIELDS = (
+        "is_speaking", "current_speaker", "is_speaker_identified", "current_sentence_text",
+        "last_asr_text", "dialog_mode", "session_started", "pending_stop_command", "stop_command_processed",
+        "suspended", "silent_seconds", "asr_chunk_size", "asr_chunk_samples", "vad_offset_ms", "speaker_reused",
+        "stream_samples", "utterance_start",
+    )
+
     def __init__(self, dialog_mode: bool = False):
         self.vad_cache = {}
         self.asr_cache = {}
-        self.asr_buffer = bytearray()
-        self.spk_buffer = []
-        self.pre_buffer = deque(maxlen=3)
+        self.asr_buffer = PcmBuffer(ASR_CHUNK_SIZE * 2 + VAD_CHUNK_SIZE)
+        self.spk_buffer = PcmBuffer(SPK_MIN_CHUNKS * VAD_CHUNK_SIZE)
+        self.pre_buffer = PcmRing(PRE_ROLL_CHUNKS * VAD_CHUNK_SIZE)
         self.is_speaking = False
         self.current_speaker = "[识别中]"
         self.is_speaker_identified = False
@@ -64,81 +161,168 @@ class RecognitionState:
         self.last_asr_text = ""
         self.last_line_len = 0
         self.last_voice_time = time.time()
-        self.asr_chunk_size = [0, 10, 5]
+        self.set_asr_profile(DEFAULT_ASR_CHUNK_SIZE)
         self.encoder_chunk_look_back = 4
         self.decoder_chunk_look_back = 1
         self.dialog_mode = dialog_mode  # 是否启用“开始/停止”指令模式
         self.session_started = not dialog_mode  # 普通 ASR 直接开始
         self.pending_stop_command = None  # 记录待处理的停止命令
         self.stop_command_processed = False  # 标记是否已处理停止命令
+        self.command_cursor = COMMAND_MATCHER.cursor()  # 对流式文本增量做指令匹配
+        self.suspended = False  # 空闲挂起：流式缓存已释放，只做能量检测
+        self.silent_seconds = 0.0  # 自 VAD 上次检测到语音以来的音频时长（按音频时间，不受回放速度影响）
+        self.spk_frontend = None  # StreamingFbank；声纹后端接受 fbank 特征时在语音开始时创建，与 spk_buffer 同步
+        self.vad_offset_ms = 0  # 已送入当前 VAD 缓存的音频时长，用于把 VAD 返回的时间换算到批内位置
+        self.speaker_reused = False  # 负载卸除：本句沿用上一句的说话人，未做声纹识别
+        self.stream_samples = 0
+        self.utterance_start = None  # VAD 语音起点（不早于预录制缓冲的开头）
+        self.utterance_end = None  # VAD 语音终点
+        self.speech_end_at = None  # 语音终点所在音频块的到达时间（墙钟）
+        self.asr_final_at = None  # 本句最终解码完成的时间（墙钟）
+
+    def snapshot(self):
+        """
+        返回可写入检查点的状态。流式缓存与缓冲区按引用返回，
+        调用方需在处理下一个音频块之前完成序列化。
+        """
+        snap = {name: getattr(self, name) for name in self._SNAPSHOT_FIELDS}
+        snap.update(
+            vad_cache=self.vad_cache,
+            asr_cache=self.asr_cache,
+            asr_buffer=self.asr_buffer.view(),
+            spk_buffer=self.spk_buffer.view(),
+            pre_buffer=np.concatenate(self.pre_buffer.segments()),
+            command_cursor=self.command_cursor.get_state(),
+        )
+        return snap
+
+    @classmethod
+    def from_snapshot(cls, snap):
+        state = cls(dialog_mode=snap["dialog_mode"])
+        for name in cls._SNAPSHOT_FIELDS:
+            if name in snap:  # 旧检查点中没有后来新增的字段
+                setattr(state, name, snap[name])
+        state.vad_cache = snap["vad_cache"]
+        state.asr_cache = snap["asr_cache"]
+        state.asr_buffer.extend(snap["asr_buffer"])
+        state.spk_buffer.extend(snap["spk_buffer"])
+        state.pre_buffer.append(snap["pre_buffer"])
+        state.command_cursor.set_state(snap["command_cursor"])
+        return state
+
+    def set_asr_profile(self, chunk_size):
+        """切换 ASR 流式配置；流式缓存与块长度相关，只能在句子之间调用"""
+        self.asr_chunk_size = list(chunk_size)
+        self.asr_chunk_samples = chunk_size[1] * ASR_CHUNK_SIZE // DEFAULT_ASR_CHUNK_SIZE[1]
 
     def reset_for_new_sentence(self):
         """重置状态以开始新句子"""
         self.asr_cache = {}
-        self.asr_buffer = bytearray()
-        self.spk_buffer = []
+        self.asr_buffer.clear()
+        self.spk_buffer.clear()
         self.current_speaker = "[识别中]"
         self.is_speaker_identified = False
+        self.speaker_reused = False
         self.current_sentence_text = ""
         self.last_asr_text = ""
         self.last_line_len = 0
         self.pending_stop_command = None
         self.stop_command_processed = False
+        self.command_cursor.reset()
+        self.utterance_start = None
+        self.utterance_end = None
+        self.speech_end_at = None
+        self.asr_final_at = None
 
 class RealtimeAssistant:
-    def __init__(self):
-        self.model_asr = None
-        self.model_vad = None
-        self.model_spk = None
-        self.model_punc = None
+    def __init__(self, models_from=None, backends=None):
+        """
+        Args:
+            models_from: 另一个 RealtimeAssistant 实例；提供时共享其模型与老师声纹，
+                         只创建独立的识别状态和学生声纹库（用于并发会话）
+            backends: 各阶段推理后端名称，如 {"asr": "stub"}；未指定的阶段使用 config.INFERENCE_BACKENDS
+        """
+        self.vad_backend = None
+        self.asr_backend = None
+        self.spk_backend = None
+        self.punc_backend = None
         self.speaker_mgr = None
         self.all_results = []
         self.stop_requested = False
         self.stop_requested_by_role = None
         self.dialog_mode = False  # 运行时模式：True=对话/课堂指令模式
-        self._init_models()
-        self._init_speaker_manager()
+        # 负载统计：已处理的音频时长与各阶段推理耗时（秒）；等待共享模型锁的时间单独统计，不计入推理耗时
+        self.audio_seconds = 0.0
+        self.stage_seconds = dict.fromkeys(("vad", "asr", "speaker", "punc"), 0.0)
+        self.lock_wait_seconds = dict.fromkeys(("vad", "asr", "speaker", "punc"), 0.0)
+        self.tracer = None  # SessionTracer；设置后记录各阶段耗时区间
+        self.state = None  # 当前 run_stream 的识别状态，供诊断使用
+        # 会话检查点：checkpoint_sink 为接收检查点字节串的回调，设置后每隔 checkpoint_interval 秒调用一次
+        self.checkpoint_sink = None
+        self.checkpoint_interval = CHECKPOINT_INTERVAL_SECONDS
+        self._last_checkpoint = time.monotonic()
+        self._resume_state = None
+        # 定稿结果的回调 result_sink(序号, 结果)：在识别线程中调用，须立即返回（如 WebhookDispatcher.submit）
+        self.result_sink = None
+        # 空闲挂起：None 表示不挂起
+        self.idle_suspend_seconds = IDLE_SUSPEND_SECONDS
+        self.suspensions = 0
+        self.wakeups = 0
+        self.released_cache_bytes = 0  # 挂起时释放的流式缓存累计字节数（估算）
+        # 负载卸除：处理滞后于音频时钟时逐级降级；shedder 在每次 run_stream 开始时创建
+        self.load_shedding = LOAD_SHEDDING_ENABLED
+        self.shedder = None
+        self._deferred_punctuation = []  # 推迟了标点的结果，滞后恢复后逐句补上
+        self._received_seconds = 0.0  # 已从音频源读取的音频时长（音频时钟）
+        self._chunk_wait = 0.0  # 读取上一块时在音频源上阻塞的时长
+        self._received_samples = 0  # 已从音频源读取的音频在会话音频流中的位置
+        self._arrivals = deque(maxlen=ARRIVAL_HISTORY_CHUNKS)  # (块末尾的采样点位置, 到达时间)
+        if models_from is not None:
+            self._share_models(models_from)
+        else:
+            self._init_models(backends)
+            self._init_speaker_manager()
 
-    def _init_models(self):
-        """初始化所有AI模型"""
+    def _share_models(self, other):
+        """复用已加载的模型，老师声纹复制一份，学生声纹库独立"""
+        self.vad_backend = other.vad_backend
+        self.asr_backend = other.asr_backend
+        self.spk_backend = other.spk_backend
+        self.punc_backend = other.punc_backend
+        self.speaker_mgr = SpeakerManager(threshold=other.speaker_mgr.threshold)
+        self.speaker_mgr.teacher_embeddings = list(other.speaker_mgr.teacher_embeddings)
+        self.speaker_mgr.teacher_name = other.speaker_mgr.teacher_name
+
+    def _init_models(self, backends=None):
+        """按配置初始化各阶段推理后端"""
+        names = dict(INFERENCE_BACKENDS)
+        names.update(backends or {})
         print("正在加载模型，请稍候...")
         try:
-            print("正在加载语音识别模型...")
-            self.model_asr = AutoModel(
-                model="paraformer-zh-streaming",
-                # model=MODEL_DIR + "speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-online",
-                model_revision="v2.0.4",
-                disable_update=True
-            )
+            print(f"正在加载语音识别模型... ({names['asr']})")
+            self.asr_backend = self._load_backend("asr", names["asr"])
             
-            print("正在加载语音检测模型...")
-            self.model_vad = AutoModel(
-                model="fsmn-vad",
-                # model=MODEL_DIR + "speech_fsmn_vad_zh-cn-16k-common-pytorch",
-                model_revision="v2.0.4",
-                disable_update=True
-            )
+            print(f"正在加载语音检测模型... ({names['vad']})")
+            self.vad_backend = self._load_backend("vad", names["vad"])
             
-            print("正在加载声纹识别模型...")
-            self.model_spk = AutoModel(
-                model="cam++",
-                # model=MODEL_DIR + "speech_campplus_sv_zh-cn_16k-common",
-                model_revision="v2.0.2",
-                disable_update=True
-            )
+            print(f"正在加载声纹识别模型... ({names['speaker']})")
+            self.spk_backend = self._load_backend("speaker", names["speaker"])
             
-            print("正在加载标点符号恢复模型...")
-            self.model_punc = AutoModel(
-                model="ct-punc",
-                # model=MODEL_DIR + "punc_ct-transformer_cn-en-common-vocab471067-large",
-                model_revision="v2.0.4",
-                disable_update=True
-            )
-            print("所有模型加载完成！")
+            print(f"正在加载标点符号恢复模型... ({names['punc']})")
+            self.punc_backend = self._load_backend("punc", names["punc"])
+            print(f"所有模型加载完成！（{model_load_stats()['load_seconds']:.1f}s）")
         except Exception as e:
             print(f"模型加载失败: {e}")
             raise e
 
+    @staticmethod
+    def _load_backend(stage, name):
+        """创建推理后端，加载耗时记入 model_cache 的进程级统计"""
+        start = time.perf_counter()
+        backend = create_backend(stage, name)
+        record_load(stage, backend=name, load_seconds=round(time.perf_counter() - start, 3))
+        return backend
+
     def _init_speaker_manager(self):
         """初始化声纹管理器并注册老师"""
         self.speaker_mgr = SpeakerManager(threshold=SIMILARITY_THRESHOLD)
@@ -147,7 +331,7 @@ class RealtimeAssistant:
             print("检测到尚未注册老师声纹。")
             if os.path.exists(TEACHER_WAV_PATH):
                 print(f"发现预置音频文件: {TEACHER_WAV_PATH}")
-                register_teacher_from_file(self.model_spk, self.speaker_mgr, TEACHER_WAV_PATH)
+                register_teacher_from_file(self.spk_backend, self.speaker_mgr, TEACHER_WAV_PATH)
             else:
                 print(f"警告: 未找到音频文件 {TEACHER_WAV_PATH}")
                 print("无法注册老师声纹。所有说话人将被识别为学生。")
@@ -155,25 +339,207 @@ class RealtimeAssistant:
             print(f"已加载老师声纹: [{self.speaker_mgr.teacher_name}]")
             print(">>> 直接进入实时助手模式 <<<")
 
+    def _infer(self, stage, fn, *args, **kwargs):
+        """调用推理后端，并把耗时计入该阶段；在模型锁上等待的时间（见 backends.TimedLock）另计"""
+        start = time.perf_counter()
+        waited = lock_wait_seconds()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            wait = lock_wait_seconds() - waited
+            self.stage_seconds[stage] += end - start - wait
+            self.lock_wait_seconds[stage] += wait
+            if self.tracer is not None:
+                if wait > 0:
+                    self.tracer.complete(f"{stage}_lock_wait", start, start + wait, cat="inference")
+                self.tracer.complete(f"{stage}_inference", start + wait, end, cat="inference")
+
+    def load_stats(self):
+        """实测推理开销：rtf 为每秒音频占用的推理秒数（实时流下约等于占用的核数）"""
+        inference_seconds = sum(self.stage_seconds.values())
+        return {
+            "audio_seconds": round(self.audio_seconds, 3),
+            "inference_seconds": round(inference_seconds, 3),
+            "rtf": inference_seconds / self.audio_seconds if self.audio_seconds > 0 else None,
+            "stages": {k: round(v, 3) for k, v in self.stage_seconds.items()},
+            "stage_rtf": {k: v / self.audio_seconds for k, v in self.stage_seconds.items()} if self.audio_seconds > 0 else None,
+            "lock_wait": {k: round(v, 3) for k, v in self.lock_wait_seconds.items()},
+        }
+
+    def stage_concurrency(self):
+        """各阶段模型可同时执行的调用数（只含有限制的阶段），由本进程的所有会话共享"""
+        backends = {"vad": self.vad_backend, "asr": self.asr_backend, "speaker": self.spk_backend, "punc": self.punc_backend}
+        limits = {stage: backend_concurrency(b) for stage, b in backends.items() if b is not None}
+        return {stage: n for stage, n in limits.items() if n is not None}
+
+    def checkpoint_bytes(self, state):
+        """把识别状态、学生声纹库与已有结果序列化为检查点"""
+        return checkpoint.dumps({
+            "state": state.snapshot(),
+            "gallery": self.speaker_mgr.export_gallery(),
+            "all_results": self.all_results,
+            "audio_seconds": self.audio_seconds,
+            "stage_seconds": self.stage_seconds,
+            "saved_at": time.time(),
+        })
+
+    def resume_from(self, data):
+        """从检查点恢复；下一次 run_stream 将沿用恢复的状态与结果继续识别"""
+        payload = checkpoint.loads(data, device=getattr(self.asr_backend, "device", None))
+        self.speaker_mgr.import_gallery(payload["gallery"])
+        self.all_results = payload["all_results"]
+        self._deferred_punctuation = [(i, r) for i, r in enumerate(self.all_results) if r.get('punctuation_deferred')]
+        self.audio_seconds = payload["audio_seconds"]
+        self.stage_seconds.update(payload["stage_seconds"])
+        self._resume_state = RecognitionState.from_snapshot(payload["state"])
+        print(f"已从检查点恢复：{len(self.all_results)} 条结果，当前句子: {self._resume_state.current_sentence_text!r}")
+
+    @traced("checkpoint")
+    def _save_checkpoint(self, state):
+        self._last_checkpoint = time.monotonic()
+        try:
+            self.checkpoint_sink(self.checkpoint_bytes(state))
+        except Exception as e:
+            print(f"\n⚠️  保存检查点失败: {e}")
+            traceback.print_exc()
+
+    @property
+    def suspended(self):
+        return self.state is not None and self.state.suspended
+
+    def idle_stats(self):
+        state = self.state
+        return {
+            "suspended": self.suspended,
+            "idle_seconds": round(state.silent_seconds, 1) if state else 0.0,
+            "suspensions": self.suspensions,
+            "wakeups": self.wakeups,
+            "released_cache_bytes": self.released_cache_bytes,
+        }
+
+    def memory_stats(self):
+        """会话内随时间增长的结构的规模（字节为估算值）"""
+        state = self.state
+        return {
+            "suspended": self.suspended,
+            "all_results": len(self.all_results),
+            "students": len(self.speaker_mgr.students) if self.speaker_mgr else 0,
+            "pending_candidates": len(self.speaker_mgr.pending) if self.speaker_mgr else 0,
+            "asr_cache_bytes": approx_nbytes(state.asr_cache) if state else 0,
+            "vad_cache_bytes": approx_nbytes(state.vad_cache) if state else 0,
+        }
+
+    def model_stats(self):
+        """本进程各阶段模型的加载耗时与内存映射的权重字节数（模型由所有会话共享）"""
+        return model_load_stats()
+
+    def shedding_stats(self):
+        """负载卸除：当前级别、处理滞后与级别变化事件；未启用时返回 None"""
+        if self.shedder is None:
+            return None
+        stats = self.shedder.stats()
+        stats["deferred_punctuation"] = len(self._deferred_punctuation)
+        stats["asr_chunk_size"] = list(self.state.asr_chunk_size) if self.state else None
+        return stats
+
+    def _shed_level(self):
+        return self.shedder.level if self.shedder is not None else 0
+
     def get_text_width(self, text):
         """计算文本的显示宽度 (中文字符计为2，其他计为1)"""
         return sum(2 if '\u4e00' <= char <= '\u9fff' else 1 for char in text)
 
-    def _add_punctuation(self, text):
-        """添加标点符号，优先使用模型，失败时使用简单后处理"""
-        if not text.strip() or self.model_punc is None:
+    @traced("punctuation")
+    def _add_punctuation(self, text, force=False):
+        """添加标点符号，优先使用模型，失败时使用简单后处理；负载卸除期间除非 force 否则返回原文"""
+        if not text.strip() or self.punc_backend is None:
             return text
+        if not force and self._shed_level() >= LEVEL_DEFER_PUNCTUATION:
+            return text  # 先保存原文，滞后恢复后由 _flush_deferred_punctuation 补上
         
         try:
-            result = self.model_punc.generate(text, disable_pbar=True)
-            if result and len(result) > 0 and 'text' in result[0]:
-                return result[0]['text']
+            result = self._infer("punc", self.punc_backend.punctuate, text)
+            if result:
+                return result
         except Exception as e:
             print(f"标点符号恢复失败: {e}")
             traceback.print_exc()
         
         return self._simple_punctuation(text)
 
+    def _append_result(self, result):
+        """
+        保存一条结果；负载卸除期间标记推迟的标点与沿用的说话人。标点确定后交给 result_sink。
+        结果带有本句在会话音频流中的采样点区间与语音结束、最终解码、标点完成的墙钟时间（见 _utterance_timing）。
+        """
+        index = len(self.all_results)
+        if self.state is not None:
+            for key, value in self._utterance_timing(self.state).items():
+                result.setdefault(key, value)
+        deferred = self.punc_backend is not None and self._shed_level() >= LEVEL_DEFER_PUNCTUATION
+        if deferred:
+            result['punctuation_deferred'] = True
+            self._deferred_punctuation.append((index, result))
+        else:
+            result['punctuated_at'] = time.time()
+        if self.state is not None and self.state.speaker_reused:
+            result['speaker_reused'] = True
+        # 说话人角色：共享流水线的订阅者按它做对话模式的指令授权（见 asr_service/fanout.py）
+        result.setdefault('role', "unknown" if result.get('speaker_reused') else self._get_speaker_role(result.get('speaker')))
+        self.all_results.append(result)
+        if not deferred:
+            self._emit_result(index, result)
+
+    def _utterance_timing(self, state):
+        """
+        当前句子的时间信息：start_sample/end_sample 为会话音频流中的采样点区间（16kHz，左闭右开），
+        speech_end_at 为语音终点所在音频块的到达时间，asr_final_at 为最终解码完成的时间。
+        没有 VAD 终点时（收尾、停止指令）以已处理音频的末尾为终点。
+        """
+        end = state.stream_samples if state.utterance_end is None else state.utterance_end
+        start = end if state.utterance_start is None else min(state.utterance_start, end)
+        return {
+            'start_sample': start,
+            'end_sample': end,
+            'speech_end_at': self._arrival_time(end) if state.speech_end_at is None else state.speech_end_at,
+            'asr_final_at': time.time() if state.asr_final_at is None else state.asr_final_at,
+        }
+
+    def _arrival_time(self, sample):
+        """会话音频流中第 sample 个采样点所在音频块的到达时间；早于记录范围时取最早的记录"""
+        for end, arrived_at in self._arrivals:
+            if sample <= end:
+                return arrived_at
+        return self._arrivals[-1][1] if self._arrivals else time.time()
+
+    def _mark_speech_start(self, state, sample):
+        # 送入 ASR 的音频从预录制缓冲的开头算起，VAD 起点更早时以它为准
+        state.utterance_start = max(sample, state.stream_samples - len(state.pre_buffer))
+
+    def _mark_speech_end(self, state, sample):
+        state.utterance_end = sample
+        state.speech_end_at = self._arrival_time(sample)
+
+    def _emit_result(self, index, result):
+        if self.result_sink is None:
+            return
+        try:
+            self.result_sink(index, result)
+        except Exception as e:
+            print(f"\n⚠️  结果回调失败: {e}")
+            traceback.print_exc()
+
+    def _flush_deferred_punctuation(self, limit=None):
+        """为推迟了标点的结果补上标点（原地更新），limit 为本次最多处理的句数"""
+        count = len(self._deferred_punctuation) if limit is None else min(limit, len(self._deferred_punctuation))
+        for index, result in self._deferred_punctuation[:count]:
+            result['text'] = self._add_punctuation(result['raw_text'], force=True)
+            result['punctuated_at'] = time.time()
+            result.pop('punctuation_deferred', None)
+            self._emit_result(index, result)
+        del self._deferred_punctuation[:count]
+
     def _simple_punctuation(self, text):
         """简单的标点符号后处理"""
         if not text.strip():
@@ -198,6 +564,12 @@ class RealtimeAssistant:
         """检查说话人是否是老师"""
         return speaker and speaker not in ["[识别中]", "[Unknown]"] and "Teacher" in speaker
 
+    def _sentence_role(self, state):
+        """当前句子说话人的角色；沿用上一句说话人（未经声纹确认）时不授予任何角色权限"""
+        if state.speaker_reused:
+            return "unknown"
+        return self._get_speaker_role(state.current_speaker)
+
     def _get_speaker_role(self, speaker):
         if self._is_teacher_speaker(speaker):
             return "teacher"
@@ -218,6 +590,39 @@ class RealtimeAssistant:
             return None
         return detect_command(text)
 
+    def _check_partial_command(self, state, delta, restart=False):
+        """
+        对未完成句子的文本增量做指令匹配，授权的停止指令可在句子结束前生效。
+        restart 为 True 表示新的部分结果没有延续上一次的文本，delta 是完整的新文本，匹配从头开始。
+        """
+        if not self.dialog_mode or state.stop_command_processed:
+            return
+        if restart:
+            state.command_cursor.reset()
+        for keyword, payload in state.command_cursor.feed(delta):
+            cmd_match = command_match_dict(keyword, payload)
+            if cmd_match.get("type") == "stop":
+                state.pending_stop_command = cmd_match
+        self._fire_pending_stop_command(state)
+
+    def _fire_pending_stop_command(self, state):
+        """若已识别出说话人且有权限，立即处理待定的停止指令"""
+        if state.pending_stop_command is None or state.stop_command_processed:
+            return
+        if not state.session_started or not state.is_speaker_identified:
+            return  # 声纹未确定前无法判断权限，等待识别结果
+        # 以整句的匹配结果为准（与句子结束时的判定保持一致）
+        cmd_match = self._match_command(state.current_sentence_text)
+        if not cmd_match or cmd_match.get("type") != "stop":
+            return
+        role = self._sentence_role(state)
+        if not self._is_authorized(role, cmd_match):
+            return
+        state.stop_command_processed = True
+        print(f"\n⚡ 句中检测到停止指令: {cmd_match.get('keyword')}")
+        if self._handle_sentence_completion(state, state.current_sentence_text):
+            self.stop_requested = True
+
     def _check_stop_command(self, text):
         """检查文本中是否包含停止命令"""
         if not self.dialog_mode:
@@ -257,7 +662,7 @@ class RealtimeAssistant:
         if not is_teacher:
             result['ignored_stop_command'] = True
             
-        self.all_results.append(result)
+        self._append_result(result)
         print(f"\n✅ 保存包含停止命令的句子 ({'老师' if is_teacher else '学生'}): {speaker}: {punctuated_text}")
 
     def _save_final_result(self, speaker, text):
@@ -277,32 +682,29 @@ class RealtimeAssistant:
             'raw_text': text.strip(),
             'timestamp': time.time()
         }
-        self.all_results.append(result)
+        self._append_result(result)
         print(f"\n✅ 保存识别结果: {speaker}: {punctuated_text}")
         return result
 
+    @traced("vad")
     def _process_vad_result(self, audio_chunk_np, state):
         """处理VAD结果并更新状态"""
         try:
-            res_vad = self.model_vad.generate(
-                input=audio_chunk_np, 
-                cache=state.vad_cache, 
-                is_final=False, 
-                chunk_size=VAD_CHUNK_DURATION_MS,
-                disable_pbar=True
-            )
-            
-            vad_segments = res_vad[0]['value'] if res_vad else []
+            base_ms, chunk_start = state.vad_offset_ms, state.stream_samples
+            vad_segments = self._infer("vad", self.vad_backend.detect, audio_chunk_np, state.vad_cache, is_final=False)
+            state.vad_offset_ms += len(audio_chunk_np) * 1000 // SAMPLE_RATE
             
             for segment in vad_segments:
                 if segment[0] != -1:
                     # 语音开始
                     state.is_speaking = True
+                    self._mark_speech_start(state, chunk_start + (segment[0] - base_ms) * SAMPLE_RATE // 1000)
                     self._prepend_pre_buffer_audio(state)
                     self._print_new_line_header(state) # 传入 state 对象
                 
                 if segment[1] != -1:
                     # 语音结束
+                    self._mark_speech_end(state, chunk_start + (segment[1] - base_ms) * SAMPLE_RATE // 1000)
                     self._handle_speech_end(state)
                     
         except Exception as e:
@@ -311,9 +713,16 @@ class RealtimeAssistant:
 
     def _prepend_pre_buffer_audio(self, state):
         """将预录制缓冲区的音频加入处理缓冲区"""
-        for chunk in state.pre_buffer:
-            state.asr_buffer.extend(chunk)
-            state.spk_buffer.append(np.frombuffer(chunk, dtype=np.int16))
+        state.pre_buffer.copy_into(state.asr_buffer, state.spk_buffer)
+        # 声纹前端与 spk_buffer 同步：每块只转换一次浮点并增量计算 fbank，声纹识别时直接取用
+        options = self.spk_backend.feature_options if self.spk_backend is not None else None
+        if options is None:
+            return
+        if state.spk_frontend is None:
+            state.spk_frontend = StreamingFbank(options, history_frames=SPK_MIN_CHUNKS * VAD_CHUNK_SIZE // options.window_shift)
+        state.spk_frontend.reset()
+        for segment in state.pre_buffer.segments():
+            state.spk_frontend.accept(segment)
 
     def _print_new_line_header(self, state):
         """打印新行头"""
@@ -332,7 +741,7 @@ class RealtimeAssistant:
             return False
             
         punctuated_text = self._add_punctuation(final_text.strip())
-        role = self._get_speaker_role(state.current_speaker)
+        role = self._sentence_role(state)
         is_teacher = (role == "teacher")
         
         # === [新增逻辑] 检查是否还未开始上课 ===
@@ -350,7 +759,7 @@ class RealtimeAssistant:
                     'raw_text': final_text.strip(),
                     'timestamp': time.time()
                 }
-                self.all_results.append(result)
+                self._append_result(result)
                 print(f"\n🔔  [{state.current_speaker}] 宣布上课，开始正式记录会议内容...")
                 print(f"✅ 保存上课指令: {state.current_speaker}: {punctuated_text}")
                 return False
@@ -385,45 +794,39 @@ class RealtimeAssistant:
                 self.stop_requested_by_role = role
                 print(f"\n🛑 老师要求下课: {stop_command}")
                 # 原有的 _save_final_result_with_stop_command 逻辑现在被简化为 append + return True
-                self.all_results.append(result)
+                self._append_result(result)
                 print(">>> 停止识别。")
                 return True
             else:
                 print(f"\nℹ️  学生说 '{stop_command}'，但只有老师可以停止识别")
-                self.all_results.append(result)
+                self._append_result(result)
                 return False
 
         # 常规保存
-        self.all_results.append(result)
+        self._append_result(result)
         print(f"\n✅ 保存识别结果: {state.current_speaker}: {punctuated_text}")
         return False
 
 
+    @traced("speech_end")
     def _handle_speech_end(self, state):
         """处理语音结束 - 重构版本"""
         state.is_speaking = False
         final_speaker = state.current_speaker
         final_text = ""
+        if state.stop_command_processed:
+            # 停止指令已在句中处理并保存
+            state.reset_for_new_sentence()
+            return
         
         try:
             if len(state.asr_buffer) > 0:
-                asr_chunk_np = np.frombuffer(state.asr_buffer, dtype=np.int16)
-                res_asr = self.model_asr.generate(
-                    input=asr_chunk_np, 
-                    cache=state.asr_cache, 
-                    is_final=True,
-                    chunk_size=state.asr_chunk_size,
-                    encoder_chunk_look_back=state.encoder_chunk_look_back, 
-                    decoder_chunk_look_back=state.decoder_chunk_look_back,
-                    disable_pbar=True
-                )
-                
-                if res_asr:
-                    text = res_asr[0]['text']
-                    delta = text[len(state.last_asr_text):] if text.startswith(state.last_asr_text) else text
-                    final_text = state.current_sentence_text + delta
+                text = self._decode_asr(state.asr_buffer.view(), state, is_final=True)
+                delta = text[len(state.last_asr_text):] if text.startswith(state.last_asr_text) else text
+                final_text = state.current_sentence_text + delta
             else:
                 final_text = state.current_sentence_text
+            state.asr_final_at = time.time()
                 
             # 统一处理句子完成
             if final_text.strip():
@@ -450,40 +853,45 @@ class RealtimeAssistant:
         state.reset_for_new_sentence()
 
 
-    def _process_asr_chunk(self, audio_chunk, state):
+    @traced("asr_chunk")
+    def _process_asr_chunk(self, audio_chunk_np, state):
         """处理ASR块 - 移除实时停止命令检查"""
-        state.asr_buffer.extend(audio_chunk)
+        state.asr_buffer.extend(audio_chunk_np)
+        # 缓冲中所有完整的 ASR 块一次送入模型（逐块处理时只有一块，积压追赶时为多块）
+        ready = len(state.asr_buffer) // state.asr_chunk_samples * state.asr_chunk_samples
         
-        if len(state.asr_buffer) >= ASR_CHUNK_SIZE * 2:
-            chunk_bytes = state.asr_buffer[:ASR_CHUNK_SIZE * 2]
-            state.asr_buffer = state.asr_buffer[ASR_CHUNK_SIZE * 2:]
-            
-            asr_chunk_np = np.frombuffer(chunk_bytes, dtype=np.int16)
-            
+        if ready:
             try:
-                res_asr = self.model_asr.generate(
-                    input=asr_chunk_np, 
-                    cache=state.asr_cache, 
-                    is_final=False, 
-                    chunk_size=state.asr_chunk_size,
-                    encoder_chunk_look_back=state.encoder_chunk_look_back, 
-                    decoder_chunk_look_back=state.decoder_chunk_look_back,
-                    disable_pbar=True
-                )
-                
-                if res_asr:
-                    text = res_asr[0]['text']
-                    if text:
-                        delta = text[len(state.last_asr_text):] if text.startswith(state.last_asr_text) else text
-                        state.current_sentence_text += delta
-                        state.last_asr_text = text
-                        self._refresh_display_line(state)
-                        
-                        # 移除实时停止命令检查 - 改为在句子结束时统一处理
+                # 直接把缓冲区视图交给模型，解码完成后再从头部消费
+                text = self._decode_asr(state.asr_buffer.view(ready), state, is_final=False)
+                if text:
+                    extends = text.startswith(state.last_asr_text)
+                    delta = text[len(state.last_asr_text):] if extends else text
+                    state.current_sentence_text += delta
+                    state.last_asr_text = text
+                    self._refresh_display_line(state)
+                    
+                    # 对部分识别结果增量匹配指令
+                    self._check_partial_command(state, delta, restart=not extends)
                         
             except Exception as e:
                 print(f"\nASR处理错误: {e}")
                 traceback.print_exc()
+            finally:
+                state.asr_buffer.consume(ready)
+
+    def _decode_asr(self, audio_chunk_np, state, is_final):
+        """调用流式 ASR 后端，返回识别文本"""
+        return self._infer(
+            "asr",
+            self.asr_backend.decode,
+            audio_chunk_np,
+            state.asr_cache,
+            is_final=is_final,
+            chunk_size=state.asr_chunk_size,
+            encoder_chunk_look_back=state.encoder_chunk_look_back,
+            decoder_chunk_look_back=state.decoder_chunk_look_back,
+        )
 
     def _refresh_display_line(self, state):
         """刷新显示行"""
@@ -497,6 +905,7 @@ class RealtimeAssistant:
         print(f"\r{line_content}{padding}", end="", flush=True)
         state.last_line_len = current_width
 
+    @traced("speaker_embedding")
     def _identify_speaker(self, state):
         """识别说话人声纹"""
         # # ============== [调试代码开始] ==============
@@ -505,19 +914,18 @@ class RealtimeAssistant:
         # state.is_speaker_identified = True
         # return # 直接返回，不执行后面真正的AI识别
         # # ============== [调试代码结束] ==============
-        if state.is_speaker_identified or len(state.spk_buffer) < 6:
+        if state.is_speaker_identified or len(state.spk_buffer) < SPK_MIN_CHUNKS * VAD_CHUNK_SIZE:
             return
             
-        full_audio = np.concatenate(state.spk_buffer)
-        save_temp_wav(full_audio, SAMPLE_RATE, TEMP_WAV_PATH)
+        full_audio = state.spk_buffer.view()
+        features = state.spk_frontend.features(len(full_audio)) if state.spk_frontend is not None else None
         
         try:
-            spk_res = self.model_spk.generate(TEMP_WAV_PATH, disable_pbar=True)
-            if spk_res and len(spk_res) > 0 and 'spk_embedding' in spk_res[0]:
-                emb = spk_res[0]['spk_embedding']
- # 修复CUDA张量转换问题：将设备上的张量移至CPU
-                if hasattr(emb, 'cpu'):
-                    emb = emb.cpu().numpy()
+            if features is not None:
+                emb = self._infer("speaker", self.spk_backend.embed_features, features, full_audio)
+            else:
+                emb = self._infer("speaker", self.spk_backend.embed, full_audio)
+            if emb is not None:
                 new_speaker = self.speaker_mgr.identify(emb)
                 
                 if new_speaker != state.current_speaker:
@@ -527,13 +935,13 @@ class RealtimeAssistant:
             print(f"\n声纹识别错误: {e}")
             traceback.print_exc()
             state.current_speaker = "[Unknown]"
-        finally:
-            if os.path.exists(TEMP_WAV_PATH):
-                os.remove(TEMP_WAV_PATH)
         
         state.is_speaker_identified = True
+        # 声纹确定后，处理此前在部分结果中检测到的停止指令
+        self._fire_pending_stop_command(state)
         return
 
+    @traced("final_decode")
     def _process_remaining_audio(self, state):
         """处理剩余音频数据 - 增强版，确保不丢失已识别文本"""
         if self.stop_requested or not state.is_speaking:
@@ -544,27 +952,16 @@ class RealtimeAssistant:
         # 保护性检查：即使ASR处理失败，也要保存已累积的文本
         try:
             if len(state.asr_buffer) > 0:
-                asr_chunk_np = np.frombuffer(state.asr_buffer, dtype=np.int16)
-                res_asr = self.model_asr.generate(
-                    input=asr_chunk_np, 
-                    cache=state.asr_cache, 
-                    is_final=True,
-                    chunk_size=state.asr_chunk_size,
-                    encoder_chunk_look_back=state.encoder_chunk_look_back, 
-                    decoder_chunk_look_back=state.decoder_chunk_look_back,
-                    disable_pbar=True
-                )
-                
-                if res_asr:
-                    text = res_asr[0]['text']
-                    if text.strip():
-                        final_text = state.current_sentence_text + text
-                        # 检查停止命令并保存
-                        should_stop = self._handle_sentence_completion(state, final_text)
-                        if should_stop:
-                            self.stop_requested = True
-                        print(f"\n📝 处理完成: {state.current_speaker}: {final_text}")
-                        return  # 正常处理完成，直接返回
+                text = self._decode_asr(state.asr_buffer.view(), state, is_final=True)
+                state.asr_final_at = time.time()
+                if text.strip():
+                    final_text = state.current_sentence_text + text
+                    # 检查停止命令并保存
+                    should_stop = self._handle_sentence_completion(state, final_text)
+                    if should_stop:
+                        self.stop_requested = True
+                    print(f"\n📝 处理完成: {state.current_speaker}: {final_text}")
+                    return  # 正常处理完成，直接返回
         except Exception as e:
             print(f"\n剩余音频处理错误: {e}")
             traceback.print_exc()
@@ -575,13 +972,160 @@ class RealtimeAssistant:
             if should_stop:
                 self.stop_requested = True
             print(f"\n⚠️  Fallback: 保存已累积文本 (ASR处理失败): {state.current_speaker}: {state.current_sentence_text}")
-    def run_stream(self, audio_stream, timeout=30, mode="plain"):
+
+    @traced("chunk")
+    def _process_chunk(self, audio_chunk, state):
+        """对一个 200ms 音频块依次执行 VAD、流式 ASR 与声纹识别"""
+        audio_chunk_np = np.frombuffer(audio_chunk, dtype=np.int16)
+        self.audio_seconds += len(audio_chunk_np) / SAMPLE_RATE
+        
+        # 处理VAD
+        self._process_vad_result(audio_chunk_np, state)
+        
+        # 处理正在说话的情况
+        if state.is_speaking:
+            self._process_asr_chunk(audio_chunk_np, state)
+            if not state.is_speaker_identified:
+                if self._shed_level() >= LEVEL_REUSE_SPEAKER:
+                    self._reuse_speaker(state)
+                else:
+                    state.spk_buffer.extend(audio_chunk_np)
+                    if state.spk_frontend is not None:
+                        state.spk_frontend.accept(audio_chunk_np)
+                    self._identify_speaker(state)
+        
+        # 更新预录制缓冲区
+        state.pre_buffer.append(audio_chunk_np)
+        state.stream_samples += len(audio_chunk_np)
+
+    @traced("backlog")
+    def _process_backlog(self, audio, state):
+        """
+        积压追赶：多个音频块合并后只调用一次 VAD，按返回的语音段边界切分，
+        语音部分送入 ASR（缓冲中的完整块一次解码）；说话人沿用上一句。
+        """
+        audio_np = np.frombuffer(audio, dtype=np.int16)
+        self.audio_seconds += len(audio_np) / SAMPLE_RATE
+        base_ms, batch_start = state.vad_offset_ms, state.stream_samples
+        try:
+            segments = self._infer("vad", self.vad_backend.detect, audio_np, state.vad_cache, is_final=False)
+        except Exception as e:
+            print(f"\nVAD处理错误: {e}")
+            traceback.print_exc()
+            segments = []
+        state.vad_offset_ms += len(audio_np) * 1000 // SAMPLE_RATE
+
+        pos = 0
+        for beg, end in segments:
+            if beg != -1:
+                pos = self._feed_backlog(audio_np, pos, beg - base_ms, state)
+                state.is_speaking = True
+                self._mark_speech_start(state, batch_start + (beg - base_ms) * SAMPLE_RATE // 1000)
+                self._prepend_pre_buffer_audio(state)
+                self._print_new_line_header(state)
+            if end != -1:
+                pos = self._feed_backlog(audio_np, pos, end - base_ms, state)
+                self._mark_speech_end(state, batch_start + (end - base_ms) * SAMPLE_RATE // 1000)
+                self._handle_speech_end(state)
+        self._feed_backlog(audio_np, pos, None, state)
+
+    def _feed_backlog(self, audio_np, pos, until_ms, state):
+        """处理批内 [pos, until_ms) 的音频（until_ms 为 None 时到批末尾），返回新的位置"""
+        end = len(audio_np) if until_ms is None else min(len(audio_np), max(pos, until_ms * SAMPLE_RATE // 1000))
+        part = audio_np[pos:end]
+        if len(part):
+            if state.is_speaking:
+                self._process_asr_chunk(part, state)
+                if not state.is_speaker_identified:
+                    self._reuse_speaker(state)
+            state.pre_buffer.append(part)
+            state.stream_samples += len(part)
+        return end
+
+    def _reuse_speaker(self, state):
+        """负载卸除：沿用上一句的说话人，不提取声纹"""
+        state.current_speaker = self.all_results[-1]['speaker'] if self.all_results else "[Unknown]"
+        state.speaker_reused = True
+        state.is_speaker_identified = True
+
+    def _update_shedding(self, state):
+        """按处理完成时的滞后调整降级级别：滞后恢复后逐句补标点，在句子之间切换 ASR 配置"""
+        event = self.shedder.processed(self._received_seconds)
+        if event is not None:
+            print(f"\n⚠️  处理滞后 {event['lag_seconds']:.1f}s，负载卸除: {event['from']} -> {event['to']}")
+            if self.tracer is not None:
+                self.tracer.instant("load_shedding", args=event)
+        level = self.shedder.level
+        if level < LEVEL_DEFER_PUNCTUATION and self._deferred_punctuation:
+            self._flush_deferred_punctuation(limit=1)
+        if not state.is_speaking and len(state.asr_buffer) == 0:
+            profile = SHED_ASR_CHUNK_SIZE if level >= LEVEL_LARGE_CHUNKS else DEFAULT_ASR_CHUNK_SIZE
+            if state.asr_chunk_size != list(profile):
+                state.set_asr_profile(profile)
+
+    def _clocked(self, audio_stream):
+        """逐块读取音频源，记录读取时在音频源上阻塞的时长，并按音频时钟登记每块的到达"""
+        iterator = iter(audio_stream)
+        while True:
+            wall, cpu = time.monotonic(), time.thread_time()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            received = time.monotonic()
+            # 阻塞时长 = 墙钟耗时 - 本线程 CPU 耗时（解码大批数据报的耗时不算作等待）
+            self._chunk_wait = max(0.0, (received - wall) - (time.thread_time() - cpu))
+            self._received_seconds += len(chunk) / (2 * SAMPLE_RATE)
+            self._received_samples += len(chunk) // 2
+            self._arrivals.append((self._received_samples, time.time()))
+            if self.shedder is not None:
+                self.shedder.arrived(self._received_seconds, received, self._chunk_wait)
+            yield chunk
+
+    def _suspend(self, state):
+        """长时间无语音：释放 VAD/ASR 流式缓存，之后只做能量检测"""
+        self.released_cache_bytes += approx_nbytes(state.vad_cache) + approx_nbytes(state.asr_cache)
+        state.vad_cache = {}
+        state.vad_offset_ms = 0
+        state.asr_cache = {}
+        state.spk_frontend = None
+        state.asr_buffer.clear()
+        state.spk_buffer.clear()
+        state.suspended = True
+        self.suspensions += 1
+        if self.tracer is not None:
+            self.tracer.instant("suspend")
+
+    def _wake(self, state):
+        """挂起中出现声音：以空的 VAD 缓存恢复流式处理（预录制缓冲保持更新，语音开头不会丢失）"""
+        state.suspended = False
+        self.wakeups += 1
+        # 恢复后只给 VAD 一小段确认时间，噪声误触发时很快重新挂起
+        state.silent_seconds = max(0.0, self.idle_suspend_seconds - IDLE_WAKE_GRACE_SECONDS)
+        if self.tracer is not None:
+            self.tracer.instant("wake")
+
+    def _process_idle_chunk(self, audio_chunk, state):
+        """挂起期间的音频块：只计算能量并更新预录制缓冲，返回是否需要恢复"""
+        audio_chunk_np = np.frombuffer(audio_chunk, dtype=np.int16)
+        samples = audio_chunk_np.astype(np.float32)
+        if len(samples) and float(np.sqrt(np.mean(samples * samples))) > IDLE_WAKE_RMS:
+            return True
+        self.audio_seconds += len(audio_chunk_np) / SAMPLE_RATE
+        state.silent_seconds += len(audio_chunk_np) / SAMPLE_RATE
+        state.pre_buffer.append(audio_chunk_np)
+        state.stream_samples += len(audio_chunk_np)
+        return False
+
+    def run_stream(self, audio_stream, timeout=30, mode="plain", stop_event=None):
         """
         流式处理音频输入 - 重构版本
         Args:
             audio_stream: 生成16bit pcm音频数据的生成器
-            timeout: 无语音输入时的超时时间(秒)
+            timeout: 无语音输入时的超时时间(秒)；None 表示不超时（由空闲挂起代替）
             mode: 模式选择，"plain"=普通ASR，"dialog"=启用开始/停止指令
+            stop_event: 可选的 threading.Event；在每个音频块开始前检查，
+                        set 后不再处理已缓冲的后续音频块，直接收尾
         Returns:
             list: 所有识别结果
         """
@@ -598,45 +1142,70 @@ class RealtimeAssistant:
             print("  【注意】普通 ASR 模式，无需“上课/下课”指令")
         print("="*50)
         
-        # 重置状态
-        self.all_results = []
+        # 重置状态（从检查点恢复时沿用恢复的状态与结果）
         self.stop_requested = False
         self.stop_requested_by_role = None
-        state = RecognitionState(dialog_mode=dialog_mode)
+        state, self._resume_state = self._resume_state, None
+        if state is None:
+            self.all_results = []
+            state = RecognitionState(dialog_mode=dialog_mode)
+        self.state = state
+        self._received_samples = state.stream_samples
+        self._arrivals.clear()
+        self._last_checkpoint = time.monotonic()
+        self.shedder = LoadShedder() if self.load_shedding else None
+        self._received_seconds = 0.0
+        backlog = []  # 积压追赶（第 4 级）时待合并处理的音频块
         
         try:
-            for audio_chunk in audio_stream:
+            for audio_chunk in self._clocked(audio_stream):
+                if stop_event is not None and stop_event.is_set():
+                    print("\n⏹️  收到停止请求，结束识别...")
+                    break
                 if len(audio_chunk) == 0:
                     continue
                 
-                state.last_voice_time = time.time()
-                audio_chunk_np = np.frombuffer(audio_chunk, dtype=np.int16)
-                
-                # 处理VAD
-                self._process_vad_result(audio_chunk_np, state)
-                
-                # 处理正在说话的情况
-                if state.is_speaking:
-                    self._process_asr_chunk(audio_chunk, state)
-                    if not state.is_speaker_identified:
-                        state.spk_buffer.append(audio_chunk_np)
-                        self._identify_speaker(state)
+                if state.suspended and self._process_idle_chunk(audio_chunk, state):
+                    self._wake(state)
+                now = time.time()
+                if not state.suspended:
+                    if self._shed_level() >= LEVEL_BATCH_CATCHUP:
+                        backlog.append(audio_chunk)
+                        # 音频源上还有积压时继续合并；阻塞过说明已追上，立即处理
+                        if len(backlog) < SHED_BATCH_CHUNKS and self._chunk_wait < CAUGHT_UP_WAIT_SECONDS:
+                            continue
+                        audio_chunk = b"".join(backlog)
+                        backlog.clear()
+                        self._process_backlog(audio_chunk, state)
+                    else:
+                        self._process_chunk(audio_chunk, state)
+                    if state.is_speaking:
+                        state.last_voice_time = now
+                        state.silent_seconds = 0.0
+                    else:
+                        state.silent_seconds += len(audio_chunk) / (2 * SAMPLE_RATE)
+                        if self.idle_suspend_seconds is not None and state.silent_seconds >= self.idle_suspend_seconds:
+                            self._suspend(state)
+                if self.shedder is not None:
+                    self._update_shedding(state)
+                if self.checkpoint_sink is not None and time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+                    self._save_checkpoint(state)
                 
                 # 检查停止命令
                 if self.stop_requested:
                     print("\n⏹️  老师指令，结束识别...")
                     break
                 
-                # 更新预录制缓冲区
-                state.pre_buffer.append(audio_chunk)
-                
                 # 检查超时
-                if time.time() - state.last_voice_time > timeout and not state.is_speaking:
+                if timeout is not None and now - state.last_voice_time > timeout and not state.is_speaking:
                     print(f"\n⏰ 超时 ({timeout}秒无输入)，停止处理...")
                     break
             
+            if backlog and not self.stop_requested and not (stop_event is not None and stop_event.is_set()):
+                self._process_backlog(b"".join(backlog), state)
             # 处理剩余数据
             self._process_remaining_audio(state)
+            self._flush_deferred_punctuation()
             
             print(f"\n✅ 识别完成，共识别到 {len(self.all_results)} 个句子")
             return self.all_results
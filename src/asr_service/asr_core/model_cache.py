@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+
+from .config import MODEL_MMAP_DIR
+
+# 模型权重的内存映射缓存：模型加载后，把参数另存为 torch zip 格式文件，再以 torch.load(mmap=True) 读回，
+# 用 load_state_dict(assign=True) 让参数直接指向映射的文件页。
+# 文件页位于页缓存中，同一主机上的所有工作进程（多个节点、多个 uvicorn worker）共享同一份只读权重，
+# 堆上的原始副本随即释放。只对 CPU 上的模型有效（GPU 模型的权重在显存中）。
+
+
+def cache_path(stage, spec, directory=MODEL_MMAP_DIR, source=None):
+    """
+    按阶段、模型配置（名称、版本等）与源权重指纹（见 weights_fingerprint）确定缓存文件路径；
+    配置变化或源权重被替换（同名同版本重新发布、本地目录原地更新）时使用新文件
+    """
+    key = {"spec": spec, "source": source} if source is not None else spec
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"{stage}-{digest}.pt")
+
+
+def weights_fingerprint(checkpoint, module=None):
+    """
+    源权重的指纹：checkpoint 为模型加载的权重文件时取其真实路径、大小与修改时间；
+    文件不可用时对 module 的参数内容做哈希（较慢，只在启动时执行一次）。两者都没有时返回 None。
+    """
+    if isinstance(checkpoint, str) and os.path.isfile(checkpoint):
+        stat = os.stat(checkpoint)
+        return {"path": os.path.realpath(checkpoint), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if module is None:
+        return None
+    import torch
+
+    digest = hashlib.sha1()
+    for name, tensor in sorted(module.state_dict().items()):
+        digest.update(name.encode("utf-8"))
+        digest.update(str(tensor.dtype).encode("utf-8"))
+        digest.update(tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes())
+    return {"sha1": digest.hexdigest()}
+
+
+def _state_matches(module, state):
+    own = module.state_dict()
+    return own.keys() == state.keys() and all(
+        own[k].shape == state[k].shape and own[k].dtype == state[k].dtype for k in own
+    )
+
+
+def mmap_weights(module, path):
+    """
+    让 module 的参数与缓冲区改为指向 path 的内存映射；缓存不存在或与模型结构不符时先写入。
+    返回映射的字节数。
+    """
+    import torch
+
+    state = None
+    if os.path.exists(path):
+        try:
+            state = torch.load(path, mmap=True, weights_only=True, map_location="cpu")
+        except Exception as e:
+            print(f"⚠️ 权重缓存不可读，将重新生成: {path} ({e})")
+        if state is not None and not _state_matches(module, state):
+            print(f"⚠️ 权重缓存与模型结构不符，将重新生成: {path}")
+            state = None
+    if state is None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # 多个进程同时启动时各写各的临时文件，os.replace 保证读到的总是完整文件
+        tmp = f"{path}.{os.getpid()}.tmp"
+        torch.save({k: v.detach().cpu().contiguous() for k, v in module.state_dict().items()}, tmp)
+        os.replace(tmp, path)
+        state = torch.load(path, mmap=True, weights_only=True, map_location="cpu")
+    module.load_state_dict(state, assign=True)
+    return sum(t.numel() * t.element_size() for t in state.values())
+
+
+# 本进程各阶段模型的加载记录：{阶段: {"backend", "load_seconds", "mapped_bytes"}}
+_LOAD_RECORDS = {}
+
+
+def record_load(stage, **fields):
+    _LOAD_RECORDS.setdefault(stage, {}).update(fields)
+
+
+def load_stats():
+    """本进程的模型加载耗时与映射的权重字节数（服务启动时加载一次，各会话共享）"""
+    return {
+        "load_seconds": round(sum(r.get("load_seconds", 0.0) for r in _LOAD_RECORDS.values()), 3),
+        "mapped_bytes": sum(r.get("mapped_bytes", 0) for r in _LOAD_RECORDS.values()),
+        "stages": {stage: dict(r) for stage, r in _LOAD_RECORDS.items()},
+    }
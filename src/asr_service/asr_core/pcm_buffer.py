@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class PcmBuffer:
+    """
+    预分配的 int16 线性缓冲：追加音频块、以视图形式读取、从头部消费。
+    正常使用时容量固定，不随每个音频块分配新对象；超出容量时按倍数扩容。
+    """
+
+    __slots__ = ("_buf", "_len")
+
+    def __init__(self, capacity):
+        self._buf = np.zeros(capacity, dtype=np.int16)
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def capacity(self):
+        return len(self._buf)
+
+    def extend(self, samples):
+        n = len(samples)
+        if self._len + n > len(self._buf):
+            grown = np.zeros(max(len(self._buf) * 2, self._len + n), dtype=np.int16)
+            grown[:self._len] = self._buf[:self._len]
+            self._buf = grown
+        self._buf[self._len:self._len + n] = samples
+        self._len += n
+
+    def view(self, n=None):
+        """前 n 个（默认全部）采样的视图，不复制；在下一次 extend/consume 之前有效"""
+        return self._buf[:self._len if n is None else min(n, self._len)]
+
+    def consume(self, n):
+        """丢弃前 n 个采样，剩余部分移到缓冲区开头"""
+        n = min(n, self._len)
+        remaining = self._len - n
+        if remaining:
+            self._buf[:remaining] = self._buf[n:self._len]
+        self._len = remaining
+
+    def clear(self):
+        self._len = 0
+
+
+class PcmRing:
+    """固定容量的 int16 环形缓冲，只保留最近写入的 capacity 个采样（用于语音开始前的预录制）"""
+
+    __slots__ = ("_buf", "_pos", "_len")
+
+    def __init__(self, capacity):
+        self._buf = np.zeros(capacity, dtype=np.int16)
+        self._pos = 0  # 下一次写入的位置
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def append(self, samples):
+        cap = len(self._buf)
+        n = len(samples)
+        if n >= cap:
+            self._buf[:] = samples[n - cap:]
+            self._pos = 0
+            self._len = cap
+            return
+        first = min(n, cap - self._pos)
+        self._buf[self._pos:self._pos + first] = samples[:first]
+        if first < n:
+            self._buf[:n - first] = samples[first:]
+        self._pos = (self._pos + n) % cap
+        self._len = min(cap, self._len + n)
+
+    def segments(self):
+        """按时间顺序返回至多两段视图，拼起来即为缓冲内容"""
+        start = (self._pos - self._len) % len(self._buf)
+        if start + self._len <= len(self._buf):
+            return (self._buf[start:start + self._len],)
+        return (self._buf[start:], self._buf[:self._pos])
+
+    def copy_into(self, *targets):
+        """把缓冲内容按时间顺序追加到各个 PcmBuffer"""
+        for segment in self.segments():
+            for target in targets:
+                target.extend(segment)
+
+    def clear(self):
+        self._pos = 0
+        self._len = 0
@@ -0,0 +1,142 @@
+import mmap
+import os
+import struct
+import time
+
+# 会话音频抓取文件（内存映射环形文件）
+#
+# 文件头（128 字节）：
+#   magic(8s) | version(I) | sample_rate(I) | capacity(Q) | head(Q) | tail(Q)
+#   | count(Q) | written(Q) | evicted(Q) | started_at(d)
+# 数据区为环形缓冲，每条记录为 length(I) | arrival(d) | PCM 负载；
+# 记录不跨越数据区末尾，放不下时写入 PAD 标记并回绕到开头，空间不足时淘汰最旧的记录。
+TAP_MAGIC = b"ASRTAP01"
+TAP_VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQQQd")
+HEADER_SIZE = 128
+RECORD = struct.Struct("<Id")
+PAD = 0xFFFFFFFF
+
+
+class SessionTap:
+    """
+    将会话的 PCM 帧及其到达时间写入有界的内存映射环形文件。
+    写入只是内存拷贝，不产生逐帧系统调用；文件大小固定为 capacity + 128 字节。
+    """
+
+    def __init__(self, path, capacity_bytes, sample_rate=16000):
+        self.path = path
+        self.capacity = int(capacity_bytes)
+        self._t0 = time.monotonic()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w+b") as f:
+            f.truncate(HEADER_SIZE + self.capacity)
+            self._mm = mmap.mmap(f.fileno(), HEADER_SIZE + self.capacity)
+        self._data = memoryview(self._mm)[HEADER_SIZE:]
+        self.sample_rate = sample_rate
+        self.head = 0
+        self.tail = 0
+        self.count = 0
+        self.written = 0
+        self.evicted = 0
+        self.dropped = 0
+        self.started_at = time.time()
+        self._write_header()
+
+    def write(self, pcm, arrival_time=None):
+        """写入一帧 PCM；arrival_time 为 time.monotonic() 时间戳"""
+        if not pcm or self._mm is None:
+            return
+        need = RECORD.size + len(pcm)
+        if need > self.capacity:
+            self.dropped += 1
+            return
+        offset = self._reserve(need)
+        arrival = (arrival_time if arrival_time is not None else time.monotonic()) - self._t0
+        RECORD.pack_into(self._data, offset, len(pcm), arrival)
+        self._data[offset + RECORD.size:offset + need] = pcm
+        self.head = offset + need
+        self.count += 1
+        self.written += 1
+        self._write_header()
+
+    def close(self):
+        if self._mm is None:
+            return
+        self._write_header()
+        self._data.release()
+        self._mm.flush()
+        self._mm.close()
+        self._mm = None
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "capacity_bytes": self.capacity,
+            "records": self.count,
+            "written": self.written,
+            "evicted": self.evicted,
+            "dropped": self.dropped,
+        }
+
+    def _reserve(self, need):
+        while True:
+            if self.count == 0:
+                self.head = self.tail = 0
+            if self.count == 0 or self.head > self.tail:
+                if self.capacity - self.head >= need:
+                    return self.head
+                # 末尾空间不足：写 PAD 并回绕
+                if self.capacity - self.head >= 4:
+                    struct.pack_into("<I", self._data, self.head, PAD)
+                self.head = 0
+                continue
+            if self.tail - self.head >= need:
+                return self.head
+            self._evict_one()
+
+    def _evict_one(self):
+        if self.capacity - self.tail < RECORD.size:
+            self.tail = 0
+            return
+        (length,) = struct.unpack_from("<I", self._data, self.tail)
+        if length == PAD:
+            self.tail = 0
+            return
+        self.tail += RECORD.size + length
+        self.count -= 1
+        self.evicted += 1
+
+    def _write_header(self):
+        HEADER.pack_into(
+            self._mm, 0, TAP_MAGIC, TAP_VERSION, self.sample_rate, self.capacity,
+            self.head, self.tail, self.count, self.written, self.evicted, self.started_at,
+        )
+
+
+def read_tap(path):
+    """
+    读取抓取文件，按时间顺序返回 (到达时间, PCM 字节) 列表。
+    到达时间为相对抓取开始的秒数。
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    magic, version, sample_rate, capacity, head, tail, count = HEADER.unpack_from(raw)[:7]
+    if magic != TAP_MAGIC or version != TAP_VERSION:
+        raise ValueError(f"不是有效的会话抓取文件: {path}")
+    data = memoryview(raw)[HEADER_SIZE:HEADER_SIZE + capacity]
+    records = []
+    offset = tail
+    while len(records) < count:
+        if capacity - offset < RECORD.size:
+            offset = 0
+            continue
+        length, arrival = RECORD.unpack_from(data, offset)
+        if length == PAD:
+            offset = 0
+            continue
+        start = offset + RECORD.size
+        records.append((arrival, bytes(data[start:start + length])))
+        offset = start + length
+    return records
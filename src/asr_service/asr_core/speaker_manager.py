@@ -1,18 +1,45 @@
 import os
 import pickle
 import numpy as np
-from scipy.spatial.distance import cosine
-from config import REGISTERED_DB_PATH
+from .config import (
+    REGISTERED_DB_PATH, MAX_STUDENTS, STUDENT_MERGE_THRESHOLD,
+    STUDENT_MIN_EVIDENCE, MAX_PENDING_CANDIDATES
+)
+
+
+def _cosine_scores(embedding, matrix):
+    """计算 embedding 与矩阵每一行的余弦相似度"""
+    if len(matrix) == 0:
+        return np.empty(0)
+    matrix = np.asarray(matrix, dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(embedding)
+    norms[norms == 0] = 1e-12
+    return matrix @ embedding / norms
+
 
 class SpeakerManager:
-    def __init__(self, threshold=0.45):
+    def __init__(self, threshold=0.45, max_students=MAX_STUDENTS,
+                 merge_threshold=STUDENT_MERGE_THRESHOLD,
+                 min_evidence=STUDENT_MIN_EVIDENCE,
+                 max_pending=MAX_PENDING_CANDIDATES):
         self.threshold = threshold
         # 变更：现在存储一个向量列表，而不是单个向量
         self.teacher_embeddings = [] 
         self.teacher_name = "Teacher"
         
+        # 学生声纹库（有上限）：每项包含 id / embedding / count / last_matched
         self.students = [] 
         self.next_student_id = 1
+        self.max_students = max_students
+        self.merge_threshold = merge_threshold
+        self.min_evidence = max(1, min_evidence)
+        # 证据不足的未匹配片段，累计到 min_evidence 次后才升级为学生
+        self.pending = []
+        self.max_pending = max_pending
+        self._tick = 0  # 逻辑时钟，用于 LRU 淘汰
+        self.created_count = 0
+        self.evicted_count = 0
+        self.merged_count = 0
         
         self.load_teacher()
 
@@ -71,6 +98,8 @@ class SpeakerManager:
         best_teacher_idx = -1
         
         if self.teacher_embeddings:
+            from scipy.spatial.distance import cosine
+
             for idx, t_emb in enumerate(self.teacher_embeddings):
                 score = 1 - cosine(embedding, t_emb)
                 if score > max_teacher_score:
@@ -88,14 +117,10 @@ class SpeakerManager:
                 self.teacher_embeddings[best_teacher_idx] = new_emb
 
         # --- 2. 比对学生 ---
-        best_score = -1
-        best_student_idx = -1
-        
-        for i, student in enumerate(self.students):
-            score = 1 - cosine(embedding, student['embedding'])
-            if score > best_score:
-                best_score = score
-                best_student_idx = i
+        self._tick += 1
+        scores = _cosine_scores(embedding, [st['embedding'] for st in self.students])
+        best_student_idx = int(np.argmax(scores)) if len(scores) else -1
+        best_score = float(scores[best_student_idx]) if len(scores) else -1
         
         # Debug: 打印分数以便调试
         # print(f" [Debug] T:{max_teacher_score:.3f} S:{best_score:.3f} ", end="")
@@ -110,13 +135,103 @@ class SpeakerManager:
             matched_student = self.students[best_student_idx]
             alpha = 0.2
             new_emb = (1 - alpha) * matched_student['embedding'] + alpha * embedding
-            self.students[best_student_idx]['embedding'] = new_emb
+            matched_student['embedding'] = new_emb
+            matched_student['count'] += 1
+            matched_student['last_matched'] = self._tick
+            matched_student = self._merge_near_duplicates(matched_student)
             return f"[{matched_student['id']} {debug_info}]"
+
+        student = self._add_evidence(embedding)
+        if student is None:
+            # 证据不足，暂不创建新学生
+            return f"[Unknown {debug_info}]"
+        return f"[{student['id']} {debug_info}]"
+
+    def _add_evidence(self, embedding):
+        """累计未匹配片段的证据，达到 min_evidence 后创建新学生并返回，否则返回 None"""
+        scores = _cosine_scores(embedding, [c['embedding'] for c in self.pending])
+        if len(scores) and scores.max() > self.threshold:
+            idx = int(np.argmax(scores))
+            cand = self.pending[idx]
+            n = cand['count']
+            cand['embedding'] = (cand['embedding'] * n + embedding) / (n + 1)
+            cand['count'] = n + 1
+            cand['last_seen'] = self._tick
         else:
-            new_id = f"Student_{self.next_student_id}"
-            self.students.append({
-                'id': new_id,
-                'embedding': embedding
-            })
-            self.next_student_id += 1
-            return f"[{new_id} {debug_info}]"
+            cand = {'embedding': embedding, 'count': 1, 'last_seen': self._tick}
+            self.pending.append(cand)
+            if len(self.pending) > self.max_pending:
+                oldest = min(range(len(self.pending)), key=lambda i: self.pending[i]['last_seen'])
+                self.pending.pop(oldest)
+
+        if cand['count'] < self.min_evidence:
+            return None
+        self.pending = [c for c in self.pending if c is not cand]
+        return self._create_student(cand['embedding'], cand['count'])
+
+    def _create_student(self, embedding, count):
+        """创建新学生，超出容量时淘汰最久未匹配的学生"""
+        if self.max_students and len(self.students) >= self.max_students:
+            lru = min(range(len(self.students)), key=lambda i: self.students[i]['last_matched'])
+            self.students.pop(lru)
+            self.evicted_count += 1
+        new_id = f"Student_{self.next_student_id}"
+        student = {
+            'id': new_id,
+            'embedding': embedding,
+            'count': count,
+            'last_matched': self._tick,
+        }
+        self.students.append(student)
+        self.next_student_id += 1
+        self.created_count += 1
+        return student
+
+    def _merge_near_duplicates(self, student):
+        """将与 student 高度相似的其它学生簇合并，保留证据更多的一方"""
+        others = [st for st in self.students if st is not student]
+        for other in others:
+            # 合并后 student 的均值声纹会变化，后续候选按当前声纹重新比较
+            if _cosine_scores(student['embedding'], [other['embedding']])[0] <= self.merge_threshold:
+                continue
+            keep, drop = (student, other) if student['count'] >= other['count'] else (other, student)
+            total = keep['count'] + drop['count']
+            keep['embedding'] = (keep['embedding'] * keep['count'] + drop['embedding'] * drop['count']) / total
+            keep['count'] = total
+            keep['last_matched'] = max(keep['last_matched'], drop['last_matched'])
+            self.students = [st for st in self.students if st is not drop]
+            self.merged_count += 1
+            student = keep
+        return student
+
+    def export_gallery(self):
+        """导出学生声纹库与候选池（老师声纹来自注册库，不包含在内）"""
+        return {
+            'students': [dict(st) for st in self.students],
+            'pending': [dict(c) for c in self.pending],
+            'next_student_id': self.next_student_id,
+            'tick': self._tick,
+            'created': self.created_count,
+            'evicted': self.evicted_count,
+            'merged': self.merged_count,
+        }
+
+    def import_gallery(self, gallery):
+        self.students = [dict(st) for st in gallery['students']]
+        self.pending = [dict(c) for c in gallery['pending']]
+        self.next_student_id = gallery['next_student_id']
+        self._tick = gallery['tick']
+        self.created_count = gallery['created']
+        self.evicted_count = gallery['evicted']
+        self.merged_count = gallery['merged']
+
+    def gallery_stats(self):
+        """返回声纹库规模与淘汰/合并统计"""
+        return {
+            'students': len(self.students),
+            'pending': len(self.pending),
+            'max_students': self.max_students,
+            'created': self.created_count,
+            'evicted': self.evicted_count,
+            'merged': self.merged_count,
+        }
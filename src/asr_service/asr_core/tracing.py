@@ -0,0 +1,109 @@
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from .config import TRACE_CAPACITY_EVENTS
+
+
+class SessionTracer:
+    """
+    会话级流水线计时：把各阶段的耗时区间写入有界环形缓冲，导出为 Chrome Trace Event JSON。
+    导出文件可直接用 chrome://tracing 或 https://ui.perfetto.dev 打开。
+
+    记录一条事件只是一次 deque.append，缓冲满后自动丢弃最旧的事件。
+    """
+
+    def __init__(self, capacity=TRACE_CAPACITY_EVENTS, name=None):
+        self.name = name
+        self._events = deque(maxlen=capacity)
+        self._threads = {}
+        self._t0 = time.perf_counter()
+        self.started_at = time.time()
+        self.recorded = 0
+
+    def complete(self, name, start, end, cat="pipeline", args=None):
+        """记录一个区间；start/end 为 time.perf_counter() 时间"""
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        self._events.append((name, cat, start, end, tid, args))
+        self.recorded += 1
+
+    def instant(self, name, cat="pipeline", args=None):
+        now = time.perf_counter()
+        self.complete(name, now, now, cat, args)
+
+    def span(self, name, cat="pipeline", args=None):
+        return _Span(self, name, cat, args)
+
+    def stats(self):
+        return {
+            "events": len(self._events),
+            "recorded": self.recorded,
+            "dropped": self.recorded - len(self._events),
+            "capacity": self._events.maxlen,
+        }
+
+    def to_chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        for tid, thread_name in list(self._threads.items()):
+            events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": thread_name}})
+        for name, cat, start, end, tid, args in list(self._events):
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X" if end > start else "i",
+                "ts": round((start - self._t0) * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+            }
+            if end > start:
+                event["dur"] = round((end - start) * 1e6, 3)
+            else:
+                event["s"] = "t"
+            if args:
+                event["args"] = args
+            events.append(event)
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"session": self.name, "started_at": self.started_at, **self.stats()},
+        }
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_cat", "_args", "_start")
+
+    def __init__(self, tracer, name, cat, args):
+        self._tracer = tracer
+        self._name = name
+        self._cat = cat
+        self._args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._tracer.complete(self._name, self._start, time.perf_counter(), self._cat, self._args)
+        return False
+
+
+def traced(name, cat="pipeline"):
+    """方法装饰器：实例的 tracer 不为 None 时记录该方法的耗时区间"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            tracer = self.tracer
+            if tracer is None:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                tracer.complete(name, start, time.perf_counter(), cat)
+        return wrapper
+    return decorator
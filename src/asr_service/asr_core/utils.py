@@ -1,16 +1,24 @@
 import os
+import sys
 import time
 import wave
-import pyaudio
+from collections import deque
 import numpy as np
-import scipy.io.wavfile as wavfile
-from config import (
+from .config import (
     SAMPLE_RATE, CHUNK_SIZE, FORMAT, CHANNELS, 
     TEMP_WAV_PATH, COMMAND_KEYWORDS, COMMAND_DEFINITIONS
 )
+from .audio_format import resample_pcm16
+from .command_matcher import CommandMatcher, build_command_matcher, command_match_dict
+
+# 指令匹配自动机：模块加载时根据配置编译一次
+COMMAND_MATCHER = build_command_matcher(COMMAND_DEFINITIONS)
+KEYWORD_MATCHER = CommandMatcher((kw, kw) for kw in COMMAND_KEYWORDS)
 
 def record_voice_fingerprint(model, speaker_manager):
     """录制并注册老师声纹"""
+    import pyaudio
+
     p = pyaudio.PyAudio()
     stream = p.open(format=FORMAT,
                     channels=CHANNELS,
@@ -43,24 +51,14 @@ def record_voice_fingerprint(model, speaker_manager):
     wf.writeframes(b''.join(frames))
     wf.close()
 
-    # 提取特征
+    # 提取特征（model 为 SpeakerEmbeddingBackend）
     try:
-        # 使用文件路径而不是numpy数组，避免维度问题
-        # 注意：这里添加 disable_pbar=True 保持清爽
-        res = model.generate(input=os.path.abspath(TEMP_WAV_PATH), disable_pbar=True)
-        
-        # 修正：从返回结果中正确提取 embedding
-        if res and len(res) > 0 and 'spk_embedding' in res[0]:
-            embedding = res[0]['spk_embedding']
+        embedding = model.embed(os.path.abspath(TEMP_WAV_PATH))
+        if embedding is not None:
             speaker_manager.save_teacher("Teacher", embedding)
             print("注册成功！")
         else:
-            # 尝试直接使用返回结果（兼容旧版本或不同返回格式）
-            if res is not None:
-                 speaker_manager.save_teacher("Teacher", res)
-                 print("注册成功！(直接保存)")
-            else:
-                print("注册失败：未能提取到有效声纹特征。")
+            print("注册失败：未能提取到有效声纹特征。")
 
     except Exception as e:
         print(f"注册失败: {e}")
@@ -70,12 +68,15 @@ def record_voice_fingerprint(model, speaker_manager):
         os.remove(TEMP_WAV_PATH)
 
 def register_teacher_from_file(model, speaker_manager, file_path):
-    """从文件注册老师声纹 (多粒度切片版 - 增强版)"""
+    """从文件注册老师声纹 (多粒度切片版 - 增强版)，model 为 SpeakerEmbeddingBackend"""
+    import scipy.io.wavfile as wavfile
+
     if not os.path.exists(file_path):
         print(f"未找到老师录音文件: {file_path}")
         return
 
     print(f"正在处理老师录音文件: {file_path} ...")
+    resampled_path = None
     try:
         # 读取音频
         sr, audio_data = wavfile.read(file_path)
@@ -86,9 +87,14 @@ def register_teacher_from_file(model, speaker_manager, file_path):
             print(f"检测到多声道音频 ({audio_data.shape})，正在转换为单声道...")
             audio_data = np.mean(audio_data, axis=1).astype(np.int16)
         
-        # 2. 检查采样率
+        # 2. 检查采样率，不一致时重采样到系统采样率
         if sr != SAMPLE_RATE:
-            print(f"警告: 采样率不匹配 (文件:{sr} vs 系统:{SAMPLE_RATE})，建议重采样。")
+            print(f"采样率不匹配 (文件:{sr} vs 系统:{SAMPLE_RATE})，正在重采样...")
+            audio_data = resample_pcm16(audio_data.astype(np.int16), sr, SAMPLE_RATE)
+            sr = SAMPLE_RATE
+            resampled_path = "temp_register_resampled.wav"
+            wavfile.write(resampled_path, sr, audio_data)
+            file_path = resampled_path
         
         duration = len(audio_data) / sr
         print(f"音频时长: {duration:.2f} 秒, 样本数: {len(audio_data)}")
@@ -103,9 +109,9 @@ def register_teacher_from_file(model, speaker_manager, file_path):
         # 1. 首先提取全量音频的特征 (作为基准)
         print("正在提取全量音频特征...")
         try:
-            res_global = model.generate(input=os.path.abspath(file_path), disable_pbar=True)
-            if res_global and 'spk_embedding' in res_global[0]:
-                embeddings.append(res_global[0]['spk_embedding'])
+            emb_global = model.embed(os.path.abspath(file_path))
+            if emb_global is not None:
+                embeddings.append(emb_global)
                 print("  - 全量特征提取成功")
         except Exception as e:
             print(f"  - 全量特征提取失败: {e}")
@@ -124,9 +130,9 @@ def register_teacher_from_file(model, speaker_manager, file_path):
                 
                 # 提取特征
                 try:
-                    res = model.generate(input=os.path.abspath(temp_slice), disable_pbar=True)
-                    if res and len(res) > 0 and 'spk_embedding' in res[0]:
-                        embeddings.append(res[0]['spk_embedding'])
+                    emb = model.embed(os.path.abspath(temp_slice))
+                    if emb is not None:
+                        embeddings.append(emb)
                     else:
                         print(f"  - 提取片段 {count}: 失败 (模型未返回特征)")
                 except Exception as e:
@@ -147,6 +153,9 @@ def register_teacher_from_file(model, speaker_manager, file_path):
         print(f"注册过程出错: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if resampled_path and os.path.exists(resampled_path):
+            os.remove(resampled_path)
 
 def _normalize_text(text):
     if text is None:
@@ -168,35 +177,11 @@ def detect_command(text):
     if not text_norm:
         return None
 
-    # Exact match
-    for cmd in COMMAND_DEFINITIONS:
-        if not cmd or "id" not in cmd:
-            continue
-        for kw in cmd.get("keywords", []):
-            if kw and kw in text_norm:
-                return {
-                    "id": cmd.get("id"),
-                    "type": cmd.get("type"),
-                    "roles": cmd.get("roles", []),
-                    "keyword": kw,
-                    "source": "exact",
-                }
-
-    # Optional fuzzy aliases
-    for cmd in COMMAND_DEFINITIONS:
-        if not cmd or "id" not in cmd:
-            continue
-        for kw in cmd.get("fuzzy_keywords", []):
-            if kw and kw in text_norm:
-                return {
-                    "id": cmd.get("id"),
-                    "type": cmd.get("type"),
-                    "roles": cmd.get("roles", []),
-                    "keyword": kw,
-                    "source": "fuzzy",
-                }
-
-    return None
+    # 精确匹配优先，其次 fuzzy 别名；单次扫描完成
+    match = COMMAND_MATCHER.best(text_norm)
+    if match is None:
+        return None
+    return command_match_dict(*match)
 
 def check_for_commands(text):
     """
@@ -206,10 +191,10 @@ def check_for_commands(text):
     if not text:
         return None
 
-    # 1. 精确匹配 (遍历配置的关键词)
-    for cmd in COMMAND_KEYWORDS:
-        if cmd in text:
-            return cmd
+    # 1. 精确匹配 (配置的关键词，按配置顺序取优先)
+    match = KEYWORD_MATCHER.best(text)
+    if match is not None:
+        return match[0]
 
     # 2. 模糊匹配 (针对 ASR 可能出现的同音字或断句问题)
     # 例如: "下 课" 或 "下客"
@@ -233,7 +218,41 @@ def check_for_commands(text):
 
 def save_temp_wav(audio_data, sample_rate, path):
     """将numpy音频数据保存为wav文件"""
+    import scipy.io.wavfile as wavfile
+
     # 确保数据是 int16 格式
     if audio_data.dtype != np.int16:
         audio_data = (audio_data * 32767).astype(np.int16)
     wavfile.write(path, sample_rate, audio_data)
+
+def approx_nbytes(obj, _seen=None):
+    """
+    估算对象占用的内存（字节），递归统计 dict/list/tuple/set 的内容；
+    numpy 数组与 torch 张量按其数据缓冲区计算。用于观察会话缓存的增长。
+    可在其他线程修改 obj 的同时调用：容器先复制再遍历，复制时被并发修改则重试。
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if hasattr(obj, "element_size") and hasattr(obj, "nelement"):
+        return obj.element_size() * obj.nelement()
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(approx_nbytes(k, _seen) + approx_nbytes(v, _seen) for k, v in _snapshot(obj.items))
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        size += sum(approx_nbytes(v, _seen) for v in _snapshot(lambda: obj))
+    return size
+
+
+def _snapshot(items, retries=5):
+    """复制容器内容；遍历期间容器被其他线程改变大小（RuntimeError）时重试，仍失败则按空容器计"""
+    for _ in range(retries):
+        try:
+            return list(items())
+        except RuntimeError:
+            continue
+    return []
@@ -1,19 +1,76 @@
 ﻿import logging
-import socket
-import struct
+import os
+import re
+import selectors
 import threading
 import time
-from typing import Iterable, List
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List
+from urllib.parse import urlsplit
 
-import pyaudio
-
-from .asr_core.config import VAD_CHUNK_SIZE
+from .admission import AdmissionController
+from .asr_core.audio_format import InputDecoder, InputFormat
+from .asr_core.checkpoint import CheckpointStore
+from .asr_core.config import (
+    ADMISSION_MIN_AUDIO_SECONDS,
+    CHECKPOINT_DIR,
+    LOCAL_INGEST_DIR,
+    LOCAL_SHM_RING_BYTES,
+    TAP_CAPACITY_BYTES,
+    TAP_DIR,
+    UDP_ADDRESS,
+    VAD_CHUNK_SIZE,
+)
+from .asr_core.model_cache import load_stats as model_load_stats
+from .asr_core.session_tap import SessionTap
+from .asr_core.tracing import SessionTracer
+from .fanout import SUBSCRIBER_MODES, Subscription
+from .local_ingest import LOCAL_TRANSPORTS, LocalIngest
+from .profiling import process_memory
 from .speaker_audio import SpeakerAudio
+from .udp_framing import JitterBuffer, parse_frame
+from .udp_ingest import (
+    MAX_DATAGRAM_BYTES, RECV_BATCH_SIZE, Datagram, SessionInbox, StopEvent, UdpIngestServer,
+    close_udp_socket, open_udp_socket, parse_udp_address,
+)
+from .webhooks import WebhookDispatcher, create_dispatcher
 
 logger = logging.getLogger(__name__)
 
-# 预热：服务启动即加载模型，避免每次 /asr/start 重新初始化
-_GLOBAL_SPEAKER_AUDIO = SpeakerAudio()
+# 全局模型：首次使用时加载（服务在 lifespan 启动阶段调用 preload_models 预热），导入本模块不加载模型
+_GLOBAL_SPEAKER_AUDIO: SpeakerAudio | None = None
+_GLOBAL_SPEAKER_AUDIO_LOCK = threading.Lock()
+
+DEFAULT_UDP_ADDRESS = UDP_ADDRESS
+CHUNK_SIZE_BYTES = VAD_CHUNK_SIZE * 2  # 200ms * 16000 * 2
+MAX_FINISHED_SESSIONS = 64  # 已结束会话的保留上限，超出后淘汰最早结束的
+# 会话 ID 会成为 tap、socket 与检查点的文件名，只允许不含路径分隔符与 ".." 的字符
+SESSION_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+
+def validate_session_id(session_id: str) -> str:
+    if not isinstance(session_id, str) or not re.fullmatch(SESSION_ID_PATTERN, session_id):
+        raise ValueError(f"Invalid session_id: {session_id!r}")
+    return session_id
+
+
+def session_file(directory: str, session_id: str, suffix: str) -> str:
+    """会话在 directory 下的文件路径；解析后不在 directory 内（如经符号链接）时拒绝"""
+    root = os.path.realpath(directory)
+    path = os.path.realpath(os.path.join(root, f"{validate_session_id(session_id)}{suffix}"))
+    if os.path.dirname(path) != root:
+        raise ValueError(f"Session file for {session_id!r} resolves outside {directory}")
+    return path
+
+
+def preload_models() -> SpeakerAudio:
+    """加载（仅一次）各会话共享的模型，避免每次 /asr/start 重新初始化"""
+    global _GLOBAL_SPEAKER_AUDIO
+    with _GLOBAL_SPEAKER_AUDIO_LOCK:
+        if _GLOBAL_SPEAKER_AUDIO is None:
+            _GLOBAL_SPEAKER_AUDIO = SpeakerAudio()
+        return _GLOBAL_SPEAKER_AUDIO
 
 
 def microphone_audio_stream(stop_event: threading.Event, chunk_size: int = VAD_CHUNK_SIZE) -> Iterable[bytes]:
@@ -22,6 +79,8 @@ def microphone_audio_stream(stop_event: threading.Event, chunk_size: int = VAD_C
 
     通过 stop_event 控制结束，确保可以被 /asr/stop 主动中止。
     """
+    import pyaudio  # 只有麦克风输入需要 PortAudio
+
     pa = pyaudio.PyAudio()
     stream = pa.open(
         format=pyaudio.paInt16,
@@ -44,88 +103,582 @@ def microphone_audio_stream(stop_event: threading.Event, chunk_size: int = VAD_C
             pa.terminate()
 
 
+class AsrSession:
+    """
+    识别流水线：独立的识别状态、数据报队列与网络统计。
+
+    客户端通过 Subscription 使用流水线；第一个订阅者的会话 ID 即流水线 ID（接收注册、检查点、抓取与 trace 按它命名），
+    流水线运行期间（即使该订阅者已离开）这个 ID 不能用于新会话。
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        audio: SpeakerAudio,
+        input_format: InputFormat | None = None,
+        framing: str = "raw",
+        concealment: str = "zero",
+        source: str | None = None,
+        stream_id: int | None = None,
+        tap: bool = False,
+        trace: bool = False,
+        transport: str = "udp",
+    ):
+        self.session_id = session_id
+        self.audio = audio
+        self.input_format = input_format or InputFormat()
+        self.framing = framing
+        self.concealment = concealment
+        self.source = source
+        self.stream_id = stream_id
+        self.transport = transport
+        self.inbox = SessionInbox()
+        self.stop_event = StopEvent()
+        self.local: LocalIngest | None = None
+        if transport in LOCAL_TRANSPORTS:
+            self.local = LocalIngest(
+                session_file(LOCAL_INGEST_DIR, session_id, ".sock"),
+                transport=transport,
+                ring_bytes=LOCAL_SHM_RING_BYTES,
+                stop_event=self.stop_event,
+            )
+        self.jitter_buffer: JitterBuffer | None = None
+        if framing == "framed":
+            self.jitter_buffer = make_jitter_buffer(self.input_format, concealment)
+        self.tap: SessionTap | None = None
+        if tap:
+            self.tap = SessionTap(session_file(TAP_DIR, session_id, ".tap"), TAP_CAPACITY_BYTES)
+        self.tracer: SessionTracer | None = None
+        if trace:
+            self.tracer = SessionTracer(name=session_id)
+            audio.assistant.tracer = self.tracer
+        self.checkpoint = False  # 是否定期写入检查点
+        self.resumed = False  # 是否从检查点恢复
+        self.subscribers: Dict[str, Subscription] = {}  # 会话 ID -> 订阅者（含已离开的）
+        self.thread: threading.Thread | None = None
+        self.results: List[dict] = []
+        self.error: Exception | None = None
+        self.state = "listening"  # listening -> finalizing -> finished / failed
+        self.done: Future = Future()  # 后台收尾完成后给出最终结果
+        self.started_at = time.time()
+        self.stopped_at: float | None = None
+        self.finished_at: float | None = None
+
+    @property
+    def listening(self) -> bool:
+        return self.state == "listening"
+
+    @property
+    def final(self) -> bool:
+        return self.done.done()
+
+    def measured_cost(self) -> float | None:
+        """实测推理开销（RTF）；处理的音频不足 ADMISSION_MIN_AUDIO_SECONDS 时返回 None"""
+        stats = self.audio.load_stats()
+        if stats["audio_seconds"] < ADMISSION_MIN_AUDIO_SECONDS:
+            return None
+        return stats["rtf"]
+
+    def measured_stage_costs(self) -> Dict[str, float] | None:
+        """各阶段的实测开销（阶段推理秒数 / 音频秒数），不足 ADMISSION_MIN_AUDIO_SECONDS 时返回 None"""
+        stats = self.audio.load_stats()
+        if stats["audio_seconds"] < ADMISSION_MIN_AUDIO_SECONDS:
+            return None
+        return stats["stage_rtf"]
+
+    def current_results(self) -> List[dict]:
+        """收尾完成后返回最终结果，否则返回目前已定稿的句子"""
+        if self.done.done():
+            return self.results
+        return self.audio.partial_results()
+
+    def subscriber_count(self) -> int:
+        """仍在监听的订阅者数"""
+        return sum(1 for s in list(self.subscribers.values()) if s.listening)
+
+    def network_stats(self) -> dict | None:
+        """分帧模式下的丢包/乱序/抖动统计；原始 PCM 模式返回 None"""
+        return self.jitter_buffer.stats() if self.jitter_buffer is not None else None
+
+    def summary(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "listening": self.listening,
+            "state": self.state,
+            "source": self.source,
+            "stream_id": self.stream_id,
+            "framing": self.framing,
+            "transport": self.transport,
+            "local": self.local.stats() if self.local is not None else None,
+            "input_format": {
+                "encoding": self.input_format.encoding,
+                "sample_rate": self.input_format.sample_rate,
+                "channels": self.input_format.channels,
+            },
+            "datagrams": self.inbox.received,
+            "datagrams_dropped": self.inbox.dropped,
+            "network": self.network_stats(),
+            "speaker_gallery": self.audio.gallery_stats(),
+            "load": self.audio.load_stats(),
+            "idle": self.audio.idle_stats(),
+            "shedding": self.audio.shedding_stats(),
+            "tap": self.tap.stats() if self.tap is not None else None,
+            "trace": self.tracer.stats() if self.tracer is not None else None,
+            "checkpoint": self.checkpoint,
+            "resumed": self.resumed,
+        }
+
+
 class AsrSessionManager:
     """
-    ASR 会话管理：保证同时只有一个监听会话。
+    ASR 会话管理：多个会话并发运行，共享同一个 UDP 接收端。
+
+    每个会话在 /asr/start 时注册到接收端，数据报按 stream_id（分帧包头）
+    或来源地址分发；未指定来源的会话接收该地址上的全部数据。
+    transport 为 "unix"/"shm" 的会话不经过 UDP，由同机的生产者连接会话自己的 socket 文件（见 local_ingest.py）。
+    指定了 source 或 stream_id 的会话按来源共享识别流水线：同一来源已有流水线在运行时，新会话只是它的一个
+    订阅者（Subscription），有自己的会话 ID、结果游标与模式过滤，不再重复运行 VAD/ASR/声纹/标点；
+    流水线在最后一个订阅者停止后收尾。推理开销因此随音频来源数而不是消费者数增长。
+    新流水线须经 AdmissionController 准入（订阅已有流水线不占用准入额度），收尾中的流水线仍计入负载。
+    定稿的句子交给 WebhookDispatcher 推送（默认地址加上会话 start 时追加的地址），识别线程不等待发送。
+    开启检查点的会话定期把识别状态写入 checkpoint_dir，进程重启后可用同一 session_id 恢复；
+    会话正常结束时删除检查点，失败时保留。
     """
 
-    def __init__(self, timeout_seconds: int = 30):
+    def __init__(
+        self,
+        timeout_seconds: int = 30,
+        udp_address: str = DEFAULT_UDP_ADDRESS,
+        ingest_sockets: int = 1,
+        admission: AdmissionController | None = None,
+        checkpoint_dir: str = CHECKPOINT_DIR,
+        webhooks: WebhookDispatcher | None = None,
+    ):
         self._timeout_seconds = timeout_seconds
+        self.checkpoints = CheckpointStore(checkpoint_dir)
+        self.webhooks = webhooks or create_dispatcher()
+        self._admission = admission or AdmissionController()
         self._lock = threading.Lock()
-        self._thread: threading.Thread | None = None
-        self._stop_event: threading.Event | None = None
-        self._results: List[dict] = []
-        self._error: Exception | None = None
-        self._listening = False
+        self._sessions: Dict[str, Subscription] = {}
+        self._pipelines: Dict[str, AsrSession] = {}  # 运行中（含收尾中）的流水线
+        self._by_source: Dict[tuple, AsrSession] = {}  # 按来源共享的流水线
+        self._ingest = UdpIngestServer(udp_address, num_sockets=ingest_sockets)
 
-    def start(self) -> None:
+    def start(
+        self,
+        input_format: InputFormat | None = None,
+        framing: str = "raw",
+        concealment: str = "zero",
+        session_id: str | None = None,
+        source: str | None = None,
+        stream_id: int | None = None,
+        tap: bool = False,
+        trace: bool = False,
+        checkpoint: bool = False,
+        resume: bool = False,
+        webhooks: List[str] | None = None,
+        transport: str = "udp",
+        mode: str = "plain",
+    ) -> str:
+        if resume and not session_id:
+            raise ValueError("session_id is required to resume from a checkpoint")
+        if transport != "udp":
+            if transport not in LOCAL_TRANSPORTS:
+                raise ValueError(f"Unknown transport: {transport}")
+            if framing != "raw" or source is not None or stream_id is not None:
+                raise ValueError("framing, source and stream_id only apply to the udp transport")
+        if mode not in SUBSCRIBER_MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        for url in webhooks or []:
+            if urlsplit(url).scheme not in ("http", "https"):
+                raise ValueError(f"Invalid webhook URL: {url}")
+        urls = self.webhooks.default_urls + [u for u in webhooks or [] if u not in self.webhooks.default_urls]
+        key = (source, stream_id) if transport == "udp" and (source or stream_id is not None) else None
+        if session_id is not None:
+            validate_session_id(session_id)
         with self._lock:
-            if self._listening:
+            session_id = session_id or uuid.uuid4().hex[:12]
+            existing = self._sessions.get(session_id)
+            if existing is not None and not existing.final:
                 raise RuntimeError("ASR session already active")
+            if session_id in self._pipelines:
+                # 第一个订阅者已离开，但以其 ID 命名的流水线仍在为其它订阅者运行
+                raise RuntimeError("ASR session ID is still in use by a running pipeline")
+            shared = self._by_source.get(key) if key is not None else None
+            if shared is not None and shared.listening:
+                # 同一来源的流水线已在运行：只增加一个订阅者
+                if (shared.input_format, shared.framing, shared.concealment) != (input_format or InputFormat(), framing, concealment):
+                    raise ValueError(f"Source {source or stream_id} is already being decoded with a different input format")
+                if tap or trace or checkpoint or resume:
+                    raise ValueError("tap, trace, checkpoint and resume apply to the shared pipeline and must be set by its first session")
+                subscription = Subscription(session_id, shared, mode=mode, start=len(shared.current_results()), webhooks=urls)
+                shared.subscribers[session_id] = subscription
+                self._sessions[session_id] = subscription
+                return session_id
+
+            models = preload_models()
+            # 模型由所有会话共享，各阶段的并发容量取决于实际加载的后端
+            self._admission.stage_capacity = models.assistant.stage_concurrency()
+            self._admission.admit(self._active_costs_locked(), self._active_stage_costs_locked())
+            checkpoint_data = None
+            if resume:
+                try:
+                    checkpoint_data = self.checkpoints.load(session_id)
+                except KeyError:
+                    raise ValueError(f"No checkpoint for session {session_id}")
 
-            self._stop_event = threading.Event()
-            self._results = []
-            self._error = None
-            self._listening = True
+            session = AsrSession(
+                session_id,
+                models.fork(),
+                input_format=input_format,
+                framing=framing,
+                concealment=concealment,
+                source=source,
+                stream_id=stream_id,
+                tap=tap,
+                trace=trace,
+                transport=transport,
+            )
+            if checkpoint_data is not None:
+                session.audio.resume_from(checkpoint_data)
+                session.resumed = True
+            if checkpoint:
+                session.checkpoint = True
+                store = self.checkpoints
+                session.audio.assistant.checkpoint_sink = lambda data: store.save(session_id, data)
+            session.audio.assistant.result_sink = lambda index, result: self._fan_out(session, index, result)
+            if session.local is None:
+                self._ingest.start()
+                self._ingest.register(session_id, session.inbox, source=source, stream_id=stream_id)
+            session.subscribers[session_id] = Subscription(session_id, session, mode=mode, webhooks=urls)
+            self._sessions[session_id] = session.subscribers[session_id]
+            self._pipelines[session_id] = session
+            if key is not None:
+                self._by_source[key] = session
 
             def _worker():
                 try:
-                    audio = _GLOBAL_SPEAKER_AUDIO
+                    audio = session.audio
 
                     # === ASR 入口选择（仅保留一个启用，其余注释） ===
-                    # 1) 机器人方法：UDP 流（返回字符串）
-                    # recognized_text = stream2text_udp(
+                    # 1) 机器人方法：共享 UDP 接收端分发给本会话的数据流（同机生产者则为本机 socket / 共享内存）
+                    if session.local is not None:
+                        stream = local_audio_stream(
+                            session.local,
+                            input_format=session.input_format,
+                            tap=session.tap,
+                            tracer=session.tracer,
+                            park=lambda: audio.suspended,
+                        )
+                    else:
+                        stream = inbox_audio_stream(
+                            session.inbox,
+                            stop_event=session.stop_event,
+                            input_format=session.input_format,
+                            jitter_buffer=session.jitter_buffer,
+                            tap=session.tap,
+                            tracer=session.tracer,
+                            park=lambda: audio.suspended,
+                        )
+                    # 会话由 stop 结束，长时间静音由空闲挂起处理，不按无语音超时结束
+                    session.results = audio.process_audio_stream(stream, mode="plain", stop_event=session.stop_event, timeout=None)
+                    #
+                    # 1b) 独立 socket 的 UDP 流（单会话）
+                    # session.results = stream2text_udp(
                     #     audio,
-                    #     "239.168.123.161:5555",
+                    #     DEFAULT_UDP_ADDRESS,
                     #     duration=None,
                     #     mode="plain",
-                    #     stop_event=self._stop_event,
+                    #     stop_event=session.stop_event,
                     # )
-                    # self._results = [{"speaker": "Robot", "text": recognized_text}]
-                    self._results = stream2text_udp(
-                        audio,
-                        "239.168.123.161:5555",
-                        duration=None,
-                        mode="plain",
-                        stop_event=self._stop_event,
-                    )
                     #
-                    # 2) 调试1：本地麦克风输入（推荐/当前启用）
-                    # stream = microphone_audio_stream(self._stop_event, VAD_CHUNK_SIZE)
-                    # self._results = audio.process_audio_stream(stream, mode="plain")
+                    # 2) 调试1：本地麦克风输入
+                    # stream = microphone_audio_stream(session.stop_event, VAD_CHUNK_SIZE)
+                    # session.results = audio.process_audio_stream(stream, mode="plain")
                     #
                     # 3) 调试2：手动输入测试
                     # recognized_text = input("请输入测试文本: ")
-                    # self._results = [{"speaker": "Manual", "text": recognized_text}]
+                    # session.results = [{"speaker": "Manual", "text": recognized_text}]
                 except Exception as e:
-                    self._error = e
-                    logger.exception("ASR worker failed")
+                    session.error = e
+                    logger.exception("ASR worker failed (session %s)", session_id)
                 finally:
+                    self._ingest.unregister(session_id)
+                    session.inbox.close()
+                    if session.local is not None:
+                        session.local.close()
+                    if session.tap is not None:
+                        session.tap.close()
+                    if session.error is None and (session.checkpoint or session.resumed):
+                        self.checkpoints.delete(session_id)
                     with self._lock:
-                        self._listening = False
+                        session.state = "failed" if session.error is not None else "finished"
+                        session.finished_at = time.time()
+                        self._admission.observe(session.measured_cost(), session.measured_stage_costs())
+                        self._pipelines.pop(session_id, None)
+                        if key is not None and self._by_source.get(key) is session:
+                            del self._by_source[key]
+                        # stop() 只在持锁且会话仍在监听时 set，此后不会再写入唤醒描述符
+                        session.stop_event.close()
+                        subscribers = list(session.subscribers.values())
+                        for subscription in subscribers:
+                            if subscription.listening:
+                                subscription.state = "finalizing"  # 流水线自行结束（如对话模式的停止指令）
+                        self._prune_finished_locked()
+                    if session.error is not None:
+                        session.done.set_exception(session.error)
+                    else:
+                        session.done.set_result(session.results)
+                    for subscription in subscribers:
+                        subscription.finish()
 
-            self._thread = threading.Thread(target=_worker, daemon=True)
-            self._thread.start()
+            session.thread = threading.Thread(target=_worker, daemon=True, name=f"asr-session-{session_id}")
+            session.thread.start()
+            return session_id
 
-    def stop(self) -> List[dict]:
-        with self._lock:
-            if not self._listening or self._thread is None or self._stop_event is None:
+    def _fan_out(self, pipeline: AsrSession, index: int, result: dict) -> None:
+        """在识别线程中把一条定稿的句子分发给流水线的各订阅者（webhook 序号为订阅者自己的句子序号）"""
+        results = pipeline.audio.assistant.all_results
+        closed = []
+        for subscription in list(pipeline.subscribers.values()):
+            # 已停止、正在收尾的订阅者仍接收收尾时定稿的句子；已离开或已结束的不再接收
+            if subscription.state not in ("listening", "finalizing"):
+                continue
+            subscription.cursor.advance(results, index + 1)
+            position = subscription.cursor.position(index)
+            if position is not None and subscription.webhooks:
+                self.webhooks.submit(subscription.session_id, position, result, subscription.webhooks)
+            if subscription.cursor.closed:
+                closed.append(subscription.session_id)
+        for session_id in closed:
+            # 对话模式的订阅者收到有权限的停止指令：与单独运行对话模式的会话一样结束
+            try:
+                self.stop(session_id)
+            except RuntimeError:
+                pass
+
+    def _resolve(self, session_id: str | None) -> Subscription:
+        """按 ID 查找会话；未指定 ID 时要求恰好有一个活动会话"""
+        if session_id is not None:
+            session = self._sessions.get(session_id)
+            if session is None or not session.listening:
                 raise RuntimeError("ASR session not active")
-            self._stop_event.set()
-            thread = self._thread
+            return session
+        active = [s for s in self._sessions.values() if s.listening]
+        if not active:
+            raise RuntimeError("ASR session not active")
+        if len(active) > 1:
+            raise LookupError("Multiple ASR sessions active, session_id required")
+        return active[0]
 
-        thread.join(timeout=self._timeout_seconds)
-        if thread.is_alive():
-            raise TimeoutError("ASR stop timed out")
+    def stop(self, session_id: str | None = None) -> Subscription:
+        """
+        停止接收音频并立即返回会话句柄，不等待收尾。
 
-        if self._error is not None:
-            raise self._error
+        流水线还有其它订阅者时，本会话立即结束，结果为目前已定稿的句子；
+        否则剩余缓冲的解码与标点在会话线程中继续完成，完成后 session.done 给出最终结果；
+        调用方可用 session.current_results() 取得目前已定稿的句子。
+        """
+        with self._lock:
+            session = self._resolve(session_id)
+            session.stopped_at = time.time()
+            pipeline = session.pipeline
+            if pipeline.subscriber_count() > 1:
+                session.detach()
+                self._prune_finished_locked()
+                return session
+            session.state = "finalizing"
+            pipeline.stop_event.set()
+            pipeline.inbox.close()
+            pipeline.state = "finalizing"
+            pipeline.stopped_at = session.stopped_at
+        return session
 
-        return self._results
+    def get(self, session_id: str) -> Subscription:
+        """按 ID 查找会话（包括收尾中和已结束的会话）"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def wait(self, session_id: str, timeout: float | None = None) -> List[dict]:
+        """阻塞等待会话收尾完成并返回最终结果；超时抛出 TimeoutError"""
+        return self.get(session_id).done.result(timeout=timeout)
+
+    def _active_costs_locked(self) -> List[float | None]:
+        return [p.measured_cost() for p in self._pipelines.values()]
 
-    def status(self) -> bool:
+    def _active_stage_costs_locked(self) -> List[Dict[str, float] | None]:
+        return [p.measured_stage_costs() for p in self._pipelines.values()]
+
+    def load_stats(self) -> dict:
+        """当前负载与准入状态，供负载均衡判断是否路由到本节点"""
         with self._lock:
-            return self._listening
+            return self._admission.load(self._active_costs_locked(), self._active_stage_costs_locked())
+
+    def _prune_finished_locked(self) -> None:
+        finished = [s for s in self._sessions.values() if s.finished_at is not None]
+        finished.sort(key=lambda s: s.finished_at)
+        for session in finished[:max(0, len(finished) - MAX_FINISHED_SESSIONS)]:
+            del self._sessions[session.session_id]
+
+    def status(self, session_id: str | None = None) -> bool:
+        with self._lock:
+            if session_id is not None:
+                session = self._sessions.get(session_id)
+                return session is not None and session.listening
+            return any(s.listening for s in self._sessions.values())
+
+    def sessions(self) -> List[dict]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [s.summary() for s in sessions]
+
+    def memory_stats(self) -> Dict[str, dict]:
+        """各流水线结果列表、声纹库与模型缓存的规模（共享流水线的订阅者只计一次）"""
+        with self._lock:
+            pipelines = {s.pipeline.session_id: s.pipeline for s in self._sessions.values()}
+        return {pipeline_id: p.audio.memory_stats() for pipeline_id, p in pipelines.items()}
+
+    def ingest_stats(self) -> dict:
+        return self._ingest.stats()
+
+    def webhook_stats(self) -> dict:
+        return self.webhooks.stats()
+
+    def process_stats(self) -> dict:
+        """本工作进程的内存（rss/pss/private）与模型加载耗时、内存映射的权重字节数"""
+        return {"pid": os.getpid(), "memory": process_memory(), "models": model_load_stats()}
+
+    def close(self) -> None:
+        """停止所有会话并等待各流水线收尾（包括此前已停止、仍在收尾的），再关闭接收端与 webhook"""
+        for session_id in [s["session_id"] for s in self.sessions() if s["listening"]]:
+            try:
+                self.stop(session_id)
+            except Exception:
+                logger.exception("Failed to stop session %s", session_id)
+        with self._lock:
+            pipelines = list(self._pipelines.values())
+        for pipeline in pipelines:
+            if pipeline.thread is not None:
+                pipeline.thread.join(timeout=self._timeout_seconds)
+        self._ingest.close()
+        self.webhooks.close()
+
+
+def make_jitter_buffer(input_format: InputFormat, concealment: str = "zero") -> JitterBuffer:
+    return JitterBuffer(
+        sample_rate=input_format.sample_rate,
+        frame_bytes=input_format.frame_bytes,
+        silence_frame=input_format.silence_frame,
+        concealment=concealment,
+    )
+
+
+def datagram_audio_stream(
+    next_batch: Callable[[], List[Datagram] | None],
+    input_format: InputFormat | None = None,
+    jitter_buffer: JitterBuffer | None = None,
+    stop_event: threading.Event | None = None,
+    duration: float | None = None,
+    tap: SessionTap | None = None,
+    tracer: SessionTracer | None = None,
+) -> Iterable[bytes]:
+    """
+    将数据报转换为 200ms 的 16bit PCM 块。
+
+    next_batch() 返回一批 (数据, 到达时间)；超时返回空列表，数据源关闭返回 None。
+    分帧模式（传入 jitter_buffer）下先经抖动缓冲重排与丢包隐藏，再解码为 16kHz 单声道 PCM。
+    传入 tap 时，解码后的 PCM 连同到达时间写入会话抓取文件，可用 ReplayStream 回放。
+    传入 tracer 时，每批数据报的重排与解码记录为 "ingest" 区间。
+    """
+    decoder = InputDecoder(input_format or InputFormat())
+    start_time = time.time()
+    buffer = bytearray()
+
+    def _append(pcm: bytes, arrival_time: float) -> None:
+        buffer.extend(pcm)
+        if tap is not None:
+            tap.write(pcm, arrival_time)
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            break
+        if duration is not None and (time.time() - start_time) >= duration:
+            break
+        batch = next_batch()
+        if batch is None:
+            break
+        if not batch:
+            if jitter_buffer is not None:
+                # 空闲时不再等待缺失的包
+                for payload in jitter_buffer.flush():
+                    _append(decoder.feed(payload), time.monotonic())
+        ingest_start = time.perf_counter()
+        for data, arrival_time in batch:
+            if jitter_buffer is None:
+                _append(decoder.feed(data), arrival_time)
+                continue
+            frame = parse_frame(data)
+            if frame is None:
+                jitter_buffer.malformed += 1
+                continue
+            jitter_buffer.push(frame, arrival_time)
+            for payload in jitter_buffer.pop_ready():
+                _append(decoder.feed(payload), arrival_time)
+        if tracer is not None and batch:
+            tracer.complete(
+                "ingest", ingest_start, time.perf_counter(), cat="ingest",
+                args={"datagrams": len(batch), "queue_delay_ms": round((time.monotonic() - batch[0][1]) * 1000, 3)},
+            )
+        while len(buffer) >= CHUNK_SIZE_BYTES:
+            chunk = bytes(buffer[:CHUNK_SIZE_BYTES])
+            del buffer[:CHUNK_SIZE_BYTES]
+            yield chunk
+
+
+def inbox_audio_stream(
+    inbox: SessionInbox,
+    stop_event: threading.Event | None = None,
+    input_format: InputFormat | None = None,
+    jitter_buffer: JitterBuffer | None = None,
+    tap: SessionTap | None = None,
+    tracer: SessionTracer | None = None,
+    park: Callable[[], bool] | None = None,
+) -> Iterable[bytes]:
+    """
+    共享接收端分发给某个会话的音频流。
+
+    park() 返回 True 时（会话已挂起）不再每秒醒来一次，一直等到有数据报或收件箱关闭。
+    """
+    return datagram_audio_stream(
+        lambda: inbox.get_batch(timeout=None if park is not None and park() else 1.0),
+        input_format=input_format,
+        jitter_buffer=jitter_buffer,
+        stop_event=stop_event,
+        tap=tap,
+        tracer=tracer,
+    )
+
+
+def local_audio_stream(
+    local: LocalIngest,
+    input_format: InputFormat | None = None,
+    tap: SessionTap | None = None,
+    tracer: SessionTracer | None = None,
+    park: Callable[[], bool] | None = None,
+) -> Iterable[bytes]:
+    """
+    同机生产者经 Unix socket 或共享内存送来的音频流；消息可靠且有序，不经抖动缓冲。
+
+    stop_event 在 LocalIngest 内部与 socket 一起阻塞在 selector 上，set() 后立即结束。
+    """
+    return datagram_audio_stream(
+        lambda: local.next_batch(timeout=None if park is not None and park() else 1.0),
+        input_format=input_format,
+        tap=tap,
+        tracer=tracer,
+    )
 
 
 def results_to_text(results: List[dict]) -> str:
@@ -153,74 +706,64 @@ def stream2text_udp(
     duration: float | None = 5.0,
     mode: str = "plain",
     stop_event: threading.Event | None = None,
+    input_format: InputFormat | None = None,
+    framing: str = "raw",
+    jitter_buffer: JitterBuffer | None = None,
 ) -> list:
     """
     从 UDP 音频流识别文本（复用 SpeakerAudio 的 ASR 逻辑）。
     参考 robot-dialogue/audio/audio.py 的 stream2text 实现。
-    """
-    host, port_str = udp_address.split(":")
-    port = int(port_str)
 
-    # 判断是否为组播地址
-    is_multicast = False
-    try:
-        ip_parts = list(map(int, host.split(".")))
-        if len(ip_parts) == 4 and 224 <= ip_parts[0] <= 239:
-            is_multicast = True
-    except Exception:
-        pass
+    input_format 指定发送端的编码/采样率/声道数（默认 16kHz/16bit/单声道 PCM），
+    非原生格式会在入口处解码、下混并重采样。
 
-    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    udp_socket.settimeout(1.0)
+    framing="raw" 时数据报按到达顺序直接拼接；framing="framed" 时每个数据报带
+    udp_framing 协议头，经抖动缓冲重排并对丢包做隐藏处理。
 
-    try:
-        if is_multicast:
-            udp_socket.bind(("", port))
-            group = socket.inet_aton(host)
-            mreq = struct.pack("4sL", group, socket.INADDR_ANY)
-            udp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-        else:
-            udp_socket.bind((host, port))
-    except Exception as e:
-        udp_socket.close()
-        raise Exception(f"UDP 绑定失败: {e}")
+    stop_event 为 StopEvent 时接收循环与其唤醒描述符一起阻塞在 selector 上，set() 后立即返回；
+    普通 threading.Event 则最多在 1 秒后被检查到。
+    """
+    if framing not in ("raw", "framed"):
+        raise ValueError(f"未知的 UDP 分帧模式: {framing}")
+    host, port, is_multicast = parse_udp_address(udp_address)
+    udp_socket = open_udp_socket(host, port, is_multicast)
+    udp_socket.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(udp_socket, selectors.EVENT_READ)
+    if isinstance(stop_event, StopEvent):
+        selector.register(stop_event, selectors.EVENT_READ)
+
+    def _recv_batch() -> List[Datagram] | None:
+        if not selector.select(timeout=1.0):
+            return []
+        batch: List[Datagram] = []
+        now = time.monotonic()
+        while len(batch) < RECV_BATCH_SIZE:
+            try:
+                data, _ = udp_socket.recvfrom(MAX_DATAGRAM_BYTES)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                return None
+            batch.append((data, now))
+        return batch
 
-    chunk_size_bytes = 6400  # 200ms * 16000 * 2
+    input_format = input_format or InputFormat()
+    if framing == "framed" and jitter_buffer is None:
+        jitter_buffer = make_jitter_buffer(input_format)
 
     def udp_audio_stream_generator():
-        start_time = time.time()
-        buffer = b""
         try:
-            while True:
-                if stop_event is not None and stop_event.is_set():
-                    break
-                if duration is not None and (time.time() - start_time) >= duration:
-                    break
-                try:
-                    data, _ = udp_socket.recvfrom(4096)
-                    buffer += data
-                    while len(buffer) >= chunk_size_bytes:
-                        chunk = buffer[:chunk_size_bytes]
-                        buffer = buffer[chunk_size_bytes:]
-                        yield chunk
-                except socket.timeout:
-                    if len(buffer) >= chunk_size_bytes:
-                        chunk = buffer[:chunk_size_bytes]
-                        buffer = buffer[chunk_size_bytes:]
-                        yield chunk
-                    continue
-                except OSError:
-                    break
+            yield from datagram_audio_stream(
+                _recv_batch,
+                input_format=input_format,
+                jitter_buffer=jitter_buffer if framing == "framed" else None,
+                stop_event=stop_event,
+                duration=duration,
+            )
         finally:
-            if is_multicast:
-                try:
-                    group = socket.inet_aton(host)
-                    mreq = struct.pack("4sL", group, socket.INADDR_ANY)
-                    udp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_DROP_MEMBERSHIP, mreq)
-                except Exception:
-                    pass
-            udp_socket.close()
+            selector.close()
+            close_udp_socket(udp_socket, host, is_multicast)
 
     results = audio.process_audio_stream(udp_audio_stream_generator(), mode=mode)
     # lines = [f"{r.get('speaker', '')}: {r.get('text', '')}" for r in results if r.get("text")]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+
+from .asr_core.utils import detect_command
+
+SUBSCRIBER_MODES = ("plain", "dialog")
+
+
+class ResultCursor:
+    """
+    订阅者在共享流水线结果列表上的游标：从订阅时的句子序号开始，按 mode 过滤。
+
+    plain 接收之后的全部句子。dialog 与 RealtimeAssistant 的对话模式一致，但只作用于本订阅者：
+    有权限的说话人说出开始指令的句子起开始接收，有权限的停止指令所在的句子为最后一句，此后 closed 为 True。
+    游标只记录被接收句子在流水线结果列表中的下标，句子推迟补上的标点（原地更新）对订阅者同样可见。
+    """
+
+    def __init__(self, start: int = 0, mode: str = "plain"):
+        if mode not in SUBSCRIBER_MODES:
+            raise ValueError(f"Unknown subscriber mode: {mode}")
+        self.start = start
+        self.mode = mode
+        self.closed = False
+        self._active = mode == "plain"
+        self._next = start
+        self._positions: Dict[int, int] = {}  # 流水线结果下标 -> 本订阅者的句子序号
+        self._indices: List[int] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _command(result: dict, kind: str) -> bool:
+        match = detect_command(result.get("raw_text") or result.get("text") or "")
+        if not match or match.get("type") != kind:
+            return False
+        roles = match.get("roles") or []
+        return not roles or result.get("role") in roles
+
+    def _accept(self, result: dict) -> bool:
+        if self.closed:
+            return False
+        if not self._active:
+            self._active = self._command(result, "start")
+            return self._active
+        if self.mode == "dialog" and self._command(result, "stop"):
+            self.closed = True
+        return True
+
+    def advance(self, results: List[dict], end: int | None = None) -> None:
+        """按顺序处理流水线结果列表中尚未看过的句子（最多到 end）"""
+        with self._lock:
+            end = len(results) if end is None else min(end, len(results))
+            for i in range(self._next, end):
+                if self._accept(results[i]):
+                    self._positions[i] = len(self._indices)
+                    self._indices.append(i)
+            self._next = max(self._next, end)
+
+    def position(self, index: int) -> int | None:
+        """流水线第 index 句在本订阅者结果中的序号；未被接收时返回 None"""
+        with self._lock:
+            return self._positions.get(index)
+
+    def view(self, results: List[dict]) -> List[dict]:
+        self.advance(results)
+        with self._lock:
+            return [results[i] for i in self._indices]
+
+
+class Subscription:
+    """
+    共享识别流水线（AsrSession）上的一个订阅者：独立的会话 ID、结果游标、模式过滤、状态与 webhook 地址。
+
+    同一音频来源的所有订阅者共用一条 VAD/ASR/声纹/标点流水线；流水线在最后一个订阅者停止后收尾。
+    较早停止的订阅者立即结束，最终结果为停止时已定稿的句子。
+    """
+
+    def __init__(self, session_id: str, pipeline, mode: str = "plain", start: int = 0, webhooks: List[str] | None = None):
+        self.session_id = session_id
+        self.pipeline = pipeline
+        self.mode = mode
+        self.cursor = ResultCursor(start, mode)
+        self.webhooks: List[str] = list(webhooks or [])
+        self.state = "listening"  # listening -> finalizing -> finished / failed
+        self.done: Future = Future()
+        self.started_at = time.time()
+        self.stopped_at: float | None = None
+        self.finished_at: float | None = None
+        self._end: int | None = None  # 提前离开时的结果下标上限
+
+    @property
+    def listening(self) -> bool:
+        return self.state == "listening"
+
+    @property
+    def final(self) -> bool:
+        return self.done.done()
+
+    # 以下属性来自共享的流水线
+    @property
+    def audio(self):
+        return self.pipeline.audio
+
+    @property
+    def local(self):
+        return self.pipeline.local
+
+    @property
+    def tracer(self):
+        return self.pipeline.tracer
+
+    @property
+    def resumed(self) -> bool:
+        return self.pipeline.resumed
+
+    @property
+    def error(self) -> Exception | None:
+        return self.pipeline.error
+
+    def _bounded(self, results: List[dict]) -> List[dict]:
+        return results[:self._end] if self._end is not None else results
+
+    def current_results(self) -> List[dict]:
+        """收尾完成后返回最终结果，否则返回目前已定稿、且通过本订阅者过滤的句子"""
+        if self.done.done() and self.done.exception() is None:
+            return self.done.result()
+        return self.cursor.view(self._bounded(self.pipeline.current_results()))
+
+    def detach(self) -> None:
+        """在流水线继续运行时离开：只保留目前已定稿的句子"""
+        results = self.pipeline.current_results()
+        self._end = len(results)
+        self.finish(results)
+
+    def finish(self, results: List[dict] | None = None) -> None:
+        if self.done.done():
+            return
+        self.finished_at = time.time()
+        if self.pipeline.error is not None and self._end is None:
+            self.state = "failed"
+            self.done.set_exception(self.pipeline.error)
+            return
+        self.state = "finished"
+        results = self.pipeline.current_results() if results is None else results
+        self.done.set_result(self.cursor.view(self._bounded(results)))
+
+    def summary(self) -> dict:
+        summary = self.pipeline.summary()
+        summary.update({
+            "session_id": self.session_id,
+            "listening": self.listening,
+            "state": self.state,
+            "pipeline": self.pipeline.session_id,
+            "subscribers": self.pipeline.subscriber_count(),
+            "mode": self.mode,
+            "webhooks": self.webhooks,
+        })
+        return summary
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import select
+import selectors
+import socket
+import stat
+import struct
+import threading
+import time
+from typing import List
+
+from .udp_ingest import RECV_BATCH_SIZE, Datagram
+
+logger = logging.getLogger(__name__)
+
+# 本机音频生产者的接入方式（与服务运行在同一主机的采集进程）：
+#   "unix": Unix SOCK_SEQPACKET，每个消息是一段编码后的音频，保留消息边界；内核缓冲写满时发送端阻塞，不丢数据
+#   "shm":  共享内存环形缓冲（memfd）+ eventfd 通知，音频不经过 socket；两个描述符在连接时通过 SCM_RIGHTS 传给生产者
+# 两种方式都由生产者连接会话的 socket 文件，连接后服务端先发一条握手消息：
+#   b"pcm" 表示直接发送音频消息；b"shm" + 环形缓冲容量（!Q）并附带 [memfd, 数据 eventfd, 空间 eventfd]
+TRANSPORT_UNIX = "unix"
+TRANSPORT_SHM = "shm"
+LOCAL_TRANSPORTS = (TRANSPORT_UNIX, TRANSPORT_SHM)
+SHM_SUPPORTED = hasattr(os, "memfd_create") and hasattr(os, "eventfd") and hasattr(socket, "send_fds")
+
+MAX_LOCAL_PACKET_BYTES = 65536  # SEQPACKET 单条消息上限，超出部分被截断
+HELLO_PCM = b"pcm"
+HELLO_SHM = b"shm"
+_CAPACITY = struct.Struct("!Q")
+
+# 环形缓冲布局：写位置与读位置各占一个缓存行，均为单调递增的字节计数（<Q）
+_POS = struct.Struct("<Q")
+_WRITE_POS_OFFSET = 0
+_READ_POS_OFFSET = 64
+_DATA_OFFSET = 128
+
+
+class ShmRing:
+    """
+    单生产者/单消费者的共享内存字节环。
+
+    生产者先写数据再更新写位置，随后写数据 eventfd；消费者先清空 eventfd 再读，读完更新读位置并写空间 eventfd。
+    eventfd 的系统调用同时起内存屏障的作用。环满时 write 只写入能放下的部分，由调用方等待空间。
+    """
+
+    def __init__(self, fd: int, capacity: int):
+        self.fd = fd
+        self.capacity = capacity
+        self._map = mmap.mmap(fd, _DATA_OFFSET + capacity)
+
+    @classmethod
+    def create(cls, name: str, capacity: int) -> "ShmRing":
+        fd = os.memfd_create(name, os.MFD_CLOEXEC)
+        os.ftruncate(fd, _DATA_OFFSET + capacity)
+        return cls(fd, capacity)
+
+    def _get(self, offset: int) -> int:
+        return _POS.unpack_from(self._map, offset)[0]
+
+    def available(self) -> int:
+        return self._get(_WRITE_POS_OFFSET) - self._get(_READ_POS_OFFSET)
+
+    def write(self, data: bytes) -> int:
+        """写入尽可能多的数据，返回写入的字节数"""
+        write_pos = self._get(_WRITE_POS_OFFSET)
+        n = min(len(data), self.capacity - (write_pos - self._get(_READ_POS_OFFSET)))
+        if n <= 0:
+            return 0
+        start = write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._map[_DATA_OFFSET + start:_DATA_OFFSET + start + first] = data[:first]
+        if n > first:
+            self._map[_DATA_OFFSET:_DATA_OFFSET + n - first] = data[first:n]
+        _POS.pack_into(self._map, _WRITE_POS_OFFSET, write_pos + n)
+        return n
+
+    def read(self) -> bytes:
+        """取出当前所有可读数据"""
+        read_pos = self._get(_READ_POS_OFFSET)
+        n = self._get(_WRITE_POS_OFFSET) - read_pos
+        if n <= 0:
+            return b""
+        start = read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        data = self._map[_DATA_OFFSET + start:_DATA_OFFSET + start + first]
+        if n > first:
+            data += self._map[_DATA_OFFSET:_DATA_OFFSET + n - first]
+        _POS.pack_into(self._map, _READ_POS_OFFSET, read_pos + n)
+        return data
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self.fd)
+
+
+def _drain_eventfd(fd: int) -> None:
+    try:
+        os.eventfd_read(fd)
+    except BlockingIOError:
+        pass
+
+
+class LocalIngest:
+    """
+    单个会话的本机接入端：监听 path 上的 SOCK_SEQPACKET socket，同一时间接受一个生产者。
+
+    生产者断开后（例如采集进程重启）继续等待下一个连接，会话只由 stop_event 结束。
+    next_batch() 与 UdpIngest 的收件箱一样返回 [(数据, 到达时间)]，可直接交给 datagram_audio_stream。
+    """
+
+    def __init__(self, path: str, transport: str = TRANSPORT_UNIX, ring_bytes: int = 1 << 20, stop_event=None):
+        if transport not in LOCAL_TRANSPORTS:
+            raise ValueError(f"未知的本机接入方式: {transport}")
+        if transport == TRANSPORT_SHM and not SHM_SUPPORTED:
+            raise ValueError("当前平台不支持共享内存接入（需要 Linux 的 memfd/eventfd）")
+        self.path = path
+        self.transport = transport
+        self.ring_bytes = ring_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        try:
+            existing = os.lstat(path)
+        except FileNotFoundError:
+            pass
+        else:
+            # 只清理上次进程遗留的 socket 文件，不删除其它类型的文件或符号链接
+            if not stat.S_ISSOCK(existing.st_mode):
+                raise ValueError(f"{path} 已存在且不是 socket 文件")
+            os.unlink(path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self._listener.bind(path)
+        self._listener.listen(1)
+        self._listener.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, "accept")
+        if stop_event is not None and hasattr(stop_event, "fileno"):
+            self._selector.register(stop_event, selectors.EVENT_READ, "stop")
+        self._stop_event = stop_event
+        self._conn: socket.socket | None = None
+        self._ring: ShmRing | None = None
+        self._data_fd: int | None = None
+        self._space_fd: int | None = None
+        self._closed = False
+        self.connections = 0
+        self.rejected = 0
+        self.messages = 0
+        self.bytes = 0
+
+    def _accept(self) -> None:
+        try:
+            conn, _ = self._listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        if self._conn is not None:
+            self.rejected += 1  # 已有生产者，拒绝第二个连接
+            conn.close()
+            return
+        try:
+            if self.transport == TRANSPORT_SHM:
+                self._ring = ShmRing.create(f"asr-ingest-{self.connections}", self.ring_bytes)
+                self._data_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+                self._space_fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+                socket.send_fds(conn, [HELLO_SHM + _CAPACITY.pack(self.ring_bytes)],
+                                [self._ring.fd, self._data_fd, self._space_fd])
+                self._selector.register(self._data_fd, selectors.EVENT_READ, "ring")
+            else:
+                conn.send(HELLO_PCM)
+        except OSError:
+            logger.exception("Local ingest handshake failed on %s", self.path)
+            conn.close()
+            self._release()
+            return
+        conn.setblocking(False)
+        self._conn = conn
+        self._selector.register(conn, selectors.EVENT_READ, "conn")
+        self.connections += 1
+        logger.info("Local %s producer connected on %s", self.transport, self.path)
+
+    def _release(self) -> None:
+        """断开当前生产者，释放其环形缓冲与 eventfd"""
+        if self._conn is not None:
+            self._selector.unregister(self._conn)
+            self._conn.close()
+            self._conn = None
+        if self._data_fd is not None:
+            try:
+                self._selector.unregister(self._data_fd)
+            except KeyError:
+                pass
+            os.close(self._data_fd)
+            self._data_fd = None
+        if self._space_fd is not None:
+            os.close(self._space_fd)
+            self._space_fd = None
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
+
+    def _read_ring(self, now: float, items: List[Datagram]) -> None:
+        _drain_eventfd(self._data_fd)
+        data = self._ring.read()
+        if data:
+            items.append((data, now))
+            self.messages += 1
+            self.bytes += len(data)
+            os.eventfd_write(self._space_fd, 1)  # 唤醒等待空间的生产者
+
+    def _read_conn(self, now: float, items: List[Datagram]) -> bool:
+        """读取生产者 socket 上的消息；返回 False 表示对端已断开"""
+        while len(items) < RECV_BATCH_SIZE:
+            try:
+                data = self._conn.recv(MAX_LOCAL_PACKET_BYTES)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                return False
+            if not data:
+                return False
+            if self._ring is None:
+                items.append((data, now))
+                self.messages += 1
+                self.bytes += len(data)
+        return True
+
+    def next_batch(self, timeout: float | None = 1.0) -> List[Datagram] | None:
+        """等待并取出一批音频；超时返回空列表，关闭或 stop_event 被 set 后返回 None"""
+        if self._closed or (self._stop_event is not None and self._stop_event.is_set()):
+            return None
+        items: List[Datagram] = []
+        for key, _ in self._selector.select(timeout):
+            now = time.monotonic()
+            if key.data == "accept":
+                self._accept()
+            elif key.data == "ring" and self._ring is not None:
+                self._read_ring(now, items)
+            elif key.data == "conn" and self._conn is not None:
+                if not self._read_conn(now, items):
+                    if self._ring is not None:
+                        self._read_ring(now, items)  # 断开前写入的数据
+                    logger.info("Local producer disconnected from %s", self.path)
+                    self._release()
+        if self._stop_event is not None and self._stop_event.is_set() and not items:
+            return None
+        return items
+
+    def stats(self) -> dict:
+        return {
+            "transport": self.transport,
+            "path": self.path,
+            "connected": self._conn is not None,
+            "connections": self.connections,
+            "rejected": self.rejected,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "ring_bytes": self.ring_bytes if self.transport == TRANSPORT_SHM else None,
+        }
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._release()
+        self._selector.close()
+        self._listener.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalAudioProducer:
+    """
+    本机生产者：连接会话的 socket 文件，按服务端的握手选择发送方式，send() 对两种方式相同。
+
+    send() 不丢数据：SEQPACKET 写满时阻塞，环形缓冲写满时等待服务端读出后再继续写。
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self._sock.settimeout(timeout)  # 握手：等待服务端接受连接
+        try:
+            self._sock.connect(path)
+            msg, fds, _, _ = socket.recv_fds(self._sock, 64, 3)
+        except OSError:
+            self._sock.close()
+            raise
+        if not msg:
+            self._sock.close()
+            raise ConnectionRefusedError(f"{path} already has a producer")
+        self._sock.settimeout(None)
+        self.transport = TRANSPORT_SHM if msg.startswith(HELLO_SHM) else TRANSPORT_UNIX
+        self._ring: ShmRing | None = None
+        if self.transport == TRANSPORT_SHM:
+            (capacity,) = _CAPACITY.unpack_from(msg, len(HELLO_SHM))
+            ring_fd, self._data_fd, self._space_fd = fds
+            os.set_blocking(self._space_fd, False)
+            self._ring = ShmRing(ring_fd, capacity)
+        self._lock = threading.Lock()
+
+    def send(self, data: bytes, timeout: float | None = None) -> None:
+        """发送一段编码后的音频；环形缓冲在 timeout 秒内一直没有空间时抛出 TimeoutError"""
+        with self._lock:
+            if self._ring is None:
+                self._sock.sendall(data)
+                return
+            view = memoryview(data)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while view:
+                written = self._ring.write(view)
+                if written:
+                    view = view[written:]
+                    os.eventfd_write(self._data_fd, 1)
+                    continue
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Shared-memory ring is full")
+                # 环已满：等服务端读出后的空间通知（读位置在 eventfd 写之前已更新）
+                select.select([self._space_fd], [], [], 1.0 if remaining is None else remaining)
+                _drain_eventfd(self._space_fd)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._ring is not None:
+                self._ring.close()
+                os.close(self._data_fd)
+                os.close(self._space_fd)
+                self._ring = None
+            self._sock.close()
@@ -1,12 +1,22 @@
 ﻿from __future__ import annotations
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from typing import Literal
 
-from .asr_engine import AsrSessionManager, results_to_text
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field
+
+from .admission import AdmissionRejected
+from .asr_core.audio_format import InputFormat
+from .asr_core.checkpoint import CheckpointError, validate as validate_checkpoint
+from .asr_core.config import PROFILING_ENABLED
+from .asr_engine import SESSION_ID_PATTERN, AsrSessionManager, preload_models, results_to_text
+from .profiling import DEFAULT_THREAD_PREFIXES, MemoryProfiler, SamplingProfiler
 
 logger = logging.getLogger(__name__)
 
@@ -16,56 +26,303 @@ class AsrError(Exception):
     status_code: int
     error_code: str
     message: str
+    retry_after: int | None = None
+
+
+class InputFormatRequest(BaseModel):
+    encoding: Literal["pcm_s16le", "mulaw", "alaw"] = "pcm_s16le"
+    sample_rate: int = Field(16000, gt=0)
+    channels: int = Field(1, gt=0, le=8)
+
+
+class AsrStartRequest(BaseModel):
+    input_format: InputFormatRequest | None = None
+    transport: Literal["udp", "unix", "shm"] = "udp"  # unix/shm：同机生产者连接返回的 local_socket，不经过 UDP
+    framing: Literal["raw", "framed"] = "raw"
+    concealment: Literal["zero", "repeat"] = "zero"
+    session_id: str | None = Field(None, pattern=SESSION_ID_PATTERN)  # 字母、数字、_ 与 -，最长 64
+    source: str | None = None  # 机器人来源地址 "ip" 或 "ip:port"
+    stream_id: int | None = Field(None, ge=0, lt=2**32)  # 分帧包头中的 stream_id
+    tap: bool = False  # 将会话音频抓取到 TAP_DIR 下的环形文件，便于回放复现
+    trace: bool = False  # 记录流水线各阶段耗时，可从 /asr/sessions/{id}/trace 下载
+    checkpoint: bool = False  # 定期把识别状态写入 CHECKPOINT_DIR，进程重启后可恢复
+    resume: bool = False  # 从 session_id 对应的检查点恢复（须同时指定 session_id）
+    webhooks: list[str] | None = Field(None, max_length=8)  # 追加的 webhook 地址，定稿的句子批量 POST 到这些地址
+    # 本会话的结果过滤：plain 为全部句子；dialog 从有权限的开始指令起、到停止指令止（共享流水线时只影响本会话）
+    mode: Literal["plain", "dialog"] = "plain"
+
+
+class AsrStopRequest(BaseModel):
+    session_id: str | None = None
+    wait: float = Field(0, ge=0, le=30)  # 最多等待后台收尾的秒数；0 表示立即返回已定稿的结果
+
+
+class CpuProfileRequest(BaseModel):
+    seconds: float = Field(10, gt=0, le=300)
+    interval_ms: float = Field(5, ge=1, le=1000)
+    all_threads: bool = False  # 默认只采样会话线程与 UDP 接收线程
 
 
 class UTF8JSONResponse(JSONResponse):
     media_type = "application/json; charset=utf-8"
 
 
-app = FastAPI(default_response_class=UTF8JSONResponse)
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # 导入本模块不加载模型、不启动线程；服务启动时再预热模型，并开始重发上次未送达的 webhook 批次
+    await asyncio.to_thread(preload_models)
+    if manager.webhooks.default_urls:
+        manager.webhooks.start()
+    yield
+    # 停止仍在运行的会话并等待其收尾（最后的句子进入 webhook 队列），关闭接收端；
+    # 随后发出内存中尚未推送的句子，失败的留在磁盘队列中，下次启动后重发
+    await asyncio.to_thread(manager.close)
+
+
+app = FastAPI(default_response_class=UTF8JSONResponse, lifespan=_lifespan)
 manager = AsrSessionManager(timeout_seconds=30)
+memory_profiler = MemoryProfiler()
+_cpu_profiler: SamplingProfiler | None = None
 
 
 @app.exception_handler(AsrError)
 def handle_asr_error(request, exc: AsrError):
+    headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after is not None else None
     return UTF8JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.error_code, "message": exc.message},
+        headers=headers,
     )
 
 
 @app.post("/asr/start")
-def asr_start():
+def asr_start(body: AsrStartRequest | None = None):
+    body = body or AsrStartRequest()
+    input_format = None
+    if body.input_format is not None:
+        input_format = InputFormat(**body.input_format.model_dump())
+
     try:
-        manager.start()
+        session_id = manager.start(
+            input_format=input_format,
+            framing=body.framing,
+            concealment=body.concealment,
+            session_id=body.session_id,
+            source=body.source,
+            stream_id=body.stream_id,
+            tap=body.tap,
+            trace=body.trace,
+            checkpoint=body.checkpoint,
+            resume=body.resume,
+            webhooks=body.webhooks,
+            transport=body.transport,
+            mode=body.mode,
+        )
+    except AdmissionRejected as e:
+        raise AsrError(429, "TooManyRequests", e.reason, retry_after=e.retry_after)
     except RuntimeError:
         raise AsrError(400, "InvalidRequest", "ASR session already active")
+    except ValueError as e:
+        raise AsrError(400, "InvalidRequest", str(e))
     except Exception as e:
         logger.exception("ASR start failed")
         raise AsrError(503, "ServiceUnavailable", f"ASR start failed: {e}")
 
-    return {"success": True}
+    local = manager.get(session_id).local
+    if local is not None:
+        return {"success": True, "session_id": session_id, "local_socket": local.path}
+    return {"success": True, "session_id": session_id}
+
+
+async def _wait_final(session, timeout: float) -> None:
+    """在事件循环中等待会话收尾完成，不占用线程池；超时直接返回"""
+    if timeout <= 0 or session.final:
+        return
+    try:
+        # shield：超时取消的是等待本身，而不是会话的收尾
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(session.done)), timeout)
+    except asyncio.TimeoutError:
+        pass
+    except Exception:
+        pass  # 收尾失败由 _session_result 报告
+
+
+def _session_result(session) -> dict:
+    if session.final and session.error is not None:
+        raise AsrError(503, "ServiceUnavailable", f"ASR finalization failed: {session.error}")
+    final = session.final
+    return {
+        "success": True,
+        "session_id": session.session_id,
+        "state": session.state,
+        "final": final,
+        "text": results_to_text(session.current_results()),
+    }
 
 
 @app.post("/asr/stop")
-def asr_stop():
+async def asr_stop(body: AsrStopRequest | None = None):
+    body = body or AsrStopRequest()
     try:
-        results = manager.stop()
+        session = manager.stop(body.session_id)
     except RuntimeError:
         raise AsrError(400, "AsrNotActive", "ASR session is not active")
-    except TimeoutError:
-        raise AsrError(408, "ServiceTimeout", "ASR stop timed out")
+    except LookupError as e:
+        raise AsrError(400, "InvalidRequest", str(e))
     except Exception as e:
         logger.exception("ASR stop failed")
         raise AsrError(503, "ServiceUnavailable", f"ASR stop failed: {e}")
 
-    text = results_to_text(results)
-    return {"success": True, "text": text}
+    await _wait_final(session, body.wait)
+    return _session_result(session)
+
+
+@app.get("/asr/sessions/{session_id}/result")
+async def asr_result(session_id: str, wait: float = Query(0, ge=0, le=60)):
+    """获取会话结果；wait>0 时最多等待该秒数直到收尾完成。未完成返回 202 与目前的部分结果"""
+    try:
+        session = manager.get(session_id)
+    except KeyError:
+        raise AsrError(404, "SessionNotFound", f"ASR session {session_id} not found")
+
+    await _wait_final(session, wait)
+    payload = _session_result(session)
+    return UTF8JSONResponse(status_code=200 if payload["final"] else 202, content=payload)
+
+
+@app.get("/asr/sessions/{session_id}/trace")
+def asr_trace(session_id: str):
+    """下载会话的 Chrome Trace Event JSON（chrome://tracing 或 ui.perfetto.dev 打开）"""
+    try:
+        session = manager.get(session_id)
+    except KeyError:
+        raise AsrError(404, "SessionNotFound", f"ASR session {session_id} not found")
+    if session.tracer is None:
+        raise AsrError(404, "TraceNotEnabled", "Session was started without trace=true")
+    return UTF8JSONResponse(
+        content=session.tracer.to_chrome_trace(),
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.trace.json"'},
+    )
+
+
+@app.get("/asr/checkpoints")
+def asr_checkpoints():
+    return {"checkpoints": manager.checkpoints.list()}
+
+
+@app.get("/asr/checkpoints/{session_id}")
+def asr_checkpoint_download(session_id: str):
+    """下载会话检查点，可上传到其它节点后以 resume=true 恢复"""
+    try:
+        data = manager.checkpoints.load(session_id)
+    except ValueError as e:
+        raise AsrError(400, "InvalidRequest", str(e))
+    except KeyError:
+        raise AsrError(404, "CheckpointNotFound", f"No checkpoint for session {session_id}")
+    return Response(
+        content=data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.ckpt"'},
+    )
+
+
+@app.put("/asr/checkpoints/{session_id}")
+async def asr_checkpoint_upload(session_id: str, request: Request):
+    data = await request.body()
+    try:
+        validate_checkpoint(data)
+        manager.checkpoints.save(session_id, data)
+    except CheckpointError as e:
+        raise AsrError(400, "InvalidCheckpoint", str(e))
+    except ValueError as e:
+        raise AsrError(400, "InvalidRequest", str(e))
+    return {"success": True, "session_id": session_id, "bytes": len(data)}
 
 
 @app.get("/asr/status")
-def asr_status():
-    return {"listening": manager.status()}
+def asr_status(session_id: str | None = Query(None)):
+    return {
+        "listening": manager.status(session_id),
+        "sessions": [s for s in manager.sessions() if session_id is None or s["session_id"] == session_id],
+        "ingest": manager.ingest_stats(),
+        "load": manager.load_stats(),
+        "webhooks": manager.webhook_stats(),
+        "process": manager.process_stats(),
+    }
+
+
+def _require_profiling() -> None:
+    if not PROFILING_ENABLED:
+        raise AsrError(404, "NotFound", "Profiling endpoints are disabled (set ASR_ENABLE_PROFILING=1)")
+
+
+@app.post("/admin/profile/cpu")
+async def profile_cpu(body: CpuProfileRequest | None = None):
+    """采样 seconds 秒的调用栈，返回折叠栈文本（flamegraph.pl / speedscope 可直接读取）"""
+    global _cpu_profiler
+    _require_profiling()
+    body = body or CpuProfileRequest()
+    if _cpu_profiler is not None:
+        raise AsrError(409, "Conflict", "CPU profiler already running")
+
+    profiler = SamplingProfiler(
+        interval=body.interval_ms / 1000,
+        thread_prefixes=None if body.all_threads else DEFAULT_THREAD_PREFIXES,
+    )
+    _cpu_profiler = profiler
+    try:
+        profiler.start()
+        await asyncio.sleep(body.seconds)
+    finally:
+        collapsed = profiler.stop()
+        _cpu_profiler = None
+    return PlainTextResponse(
+        collapsed,
+        headers={
+            "Content-Disposition": 'attachment; filename="cpu.collapsed"',
+            "X-Profile-Samples": str(profiler.samples),
+        },
+    )
+
+
+@app.post("/admin/profile/memory/start")
+def profile_memory_start(frames: int = Query(10, ge=1, le=64)):
+    _require_profiling()
+    memory_profiler.start(frames)
+    return {"tracing": memory_profiler.tracing}
+
+
+@app.post("/admin/profile/memory/snapshot")
+def profile_memory_snapshot(limit: int = Query(20, ge=1, le=200)):
+    """拍摄 tracemalloc 快照，返回占用最多的分配位置与各会话结构的规模"""
+    _require_profiling()
+    try:
+        snap_id = memory_profiler.snapshot()
+    except RuntimeError:
+        raise AsrError(400, "InvalidRequest", "Call /admin/profile/memory/start first")
+    return {
+        "snapshot_id": snap_id,
+        "top": memory_profiler.top(snap_id, limit),
+        "sessions": manager.memory_stats(),
+    }
+
+
+@app.get("/admin/profile/memory/diff")
+def profile_memory_diff(base: int, target: int, limit: int = Query(20, ge=1, le=200)):
+    """target 快照相对 base 增长最多的分配位置"""
+    _require_profiling()
+    try:
+        diff = memory_profiler.diff(base, target, limit)
+    except KeyError as e:
+        raise AsrError(404, "NotFound", f"Snapshot {e} not found, available: {memory_profiler.snapshot_ids()}")
+    return {"base": base, "target": target, "diff": diff}
+
+
+@app.post("/admin/profile/memory/stop")
+def profile_memory_stop():
+    _require_profiling()
+    memory_profiler.stop()
+    return {"tracing": memory_profiler.tracing}
 
 
 if __name__ == "__main__":
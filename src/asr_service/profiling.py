@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List
+
+# 默认只采样识别相关线程：会话线程与 UDP 接收线程
+DEFAULT_THREAD_PREFIXES = ("asr-session", "udp-ingest")
+MAX_SNAPSHOTS = 8
+
+
+class SamplingProfiler:
+    """
+    采样式 CPU 分析：后台线程按固定间隔读取 sys._current_frames()，累计各线程的调用栈。
+
+    结果为 flamegraph.pl / speedscope 可直接读取的折叠栈格式（"线程;外层;...;内层 次数"）。
+    只在 start() 与 stop() 之间运行，未启动时没有任何开销。
+    """
+
+    def __init__(self, interval: float = 0.005, thread_prefixes: Iterable[str] | None = DEFAULT_THREAD_PREFIXES):
+        self.interval = interval
+        self.thread_prefixes = tuple(thread_prefixes) if thread_prefixes else None
+        self.samples = 0
+        self._counts: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            raise RuntimeError("Profiler already running")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="cpu-profiler")
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.collapsed()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._counts.most_common())
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own)
+
+    def _sample(self, own: int) -> None:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for tid, frame in sys._current_frames().items():
+            if tid == own:
+                continue
+            name = names.get(tid, str(tid))
+            if self.thread_prefixes is not None and not name.startswith(self.thread_prefixes):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(name)
+            self._counts[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+
+def process_memory(pid: int | str = "self") -> Dict[str, int]:
+    """
+    进程内存（字节）。Linux 上读取 /proc/<pid>/smaps_rollup：rss 包含与其它进程共享的页，
+    pss 按共享进程数均摊，private 为本进程独占；多个工作进程共享内存映射的权重时应看 pss/private。
+    其它平台只给出峰值 rss。
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared_clean", "Shared_Dirty": "shared_dirty",
+              "Private_Clean": "private_clean", "Private_Dirty": "private_dirty"}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            values = {}
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in fields:
+                    values[fields[name]] = int(rest.split()[0]) * 1024
+    except OSError:
+        import resource
+
+        # ru_maxrss：Linux 为 KB，macOS 为字节
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"max_rss": maxrss if sys.platform == "darwin" else maxrss * 1024}
+    values["private"] = values.pop("private_clean", 0) + values.pop("private_dirty", 0)
+    values["shared"] = values.pop("shared_clean", 0) + values.pop("shared_dirty", 0)
+    return values
+
+
+class MemoryProfiler:
+    """
+    tracemalloc 快照与差异。start() 之前不追踪任何分配；stop() 后释放所有快照。
+    """
+
+    def __init__(self):
+        self._snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+        tracemalloc.stop()
+
+    def snapshot(self) -> int:
+        """拍摄快照并返回其编号；最多保留 MAX_SNAPSHOTS 个"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        snap = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        with self._lock:
+            snap_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snap_id] = snap
+            while len(self._snapshots) > MAX_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+        return snap_id
+
+    def top(self, snap_id: int, limit: int = 20, key: str = "lineno") -> List[dict]:
+        stats = self._get(snap_id).statistics(key)
+        return [_stat_dict(s.traceback, s.size, s.count) for s in stats[:limit]]
+
+    def diff(self, base_id: int, target_id: int, limit: int = 20, key: str = "lineno") -> List[dict]:
+        """target 相对 base 增长最多的分配位置"""
+        stats = self._get(target_id).compare_to(self._get(base_id), key)
+        return [
+            {**_stat_dict(s.traceback, s.size, s.count), "size_diff": s.size_diff, "count_diff": s.count_diff}
+            for s in stats[:limit]
+        ]
+
+    def snapshot_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._snapshots)
+
+    def _get(self, snap_id: int) -> tracemalloc.Snapshot:
+        with self._lock:
+            snap = self._snapshots.get(snap_id)
+        if snap is None:
+            raise KeyError(snap_id)
+        return snap
+
+
+def _stat_dict(traceback: tracemalloc.Traceback, size: int, count: int) -> Dict[str, object]:
+    return {
+        "where": [f"{frame.filename}:{frame.lineno}" for frame in traceback],
+        "size": size,
+        "count": count,
+    }
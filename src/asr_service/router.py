@@ -0,0 +1,404 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, Response
+
+from .asr_core.config import (
+    ADMISSION_RETRY_AFTER,
+    ROUTER_HEALTH_INTERVAL_SECONDS,
+    ROUTER_MAX_FAILURES,
+    ROUTER_NODES,
+    ROUTER_REQUEST_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_PINNED_SESSIONS = 4096
+_WILDCARD_HOSTS = ("", "0.0.0.0", "::")
+
+
+@dataclass
+class WorkerNode:
+    """后端 ASR 节点；load 为最近一次 /asr/status 上报的负载"""
+
+    url: str
+    udp_address: str | None = None  # 显式配置的、告知机器人的 UDP 地址
+    healthy: bool = False
+    failures: int = 0
+    load: dict | None = None
+    ingest_address: str | None = None  # 节点上报的 UDP 接收地址
+    checked_at: float | None = None
+    sessions: int = 0  # 经本路由器分配、尚未停止的会话数
+
+    @property
+    def accepting(self) -> bool:
+        return self.healthy and (self.load is None or bool(self.load.get("accepting", True)))
+
+    def target_udp_address(self) -> str | None:
+        """机器人应发送音频的地址：显式配置优先；节点绑定通配或组播地址时使用节点 URL 的主机名"""
+        if self.udp_address:
+            return self.udp_address
+        if not self.ingest_address:
+            return None
+        host, _, port = self.ingest_address.rpartition(":")
+        first_octet = host.split(".")[0]
+        if host in _WILDCARD_HOSTS or (first_octet.isdigit() and 224 <= int(first_octet) <= 239):
+            host = urlsplit(self.url).hostname or host
+        return f"{host}:{port}"
+
+    def utilization(self) -> float:
+        if not self.load:
+            return 0.0
+        if self.load.get("utilization") is not None:
+            return float(self.load["utilization"])
+        return self.load.get("sessions", 0) / max(1, self.load.get("max_sessions", 1))
+
+    def note_assigned(self) -> None:
+        """分配会话后先按估计开销更新负载，避免下次健康检查前的突发请求都落在同一节点"""
+        self.sessions += 1
+        if self.load:
+            self.load["sessions"] = self.load.get("sessions", 0) + 1
+            cost = self.load.get("estimated_session_cost") or 0.0
+            self.load["cpu_load"] = self.load.get("cpu_load", 0.0) + cost
+            budget = self.load.get("cpu_budget")
+            if budget:
+                self.load["utilization"] = self.load["cpu_load"] / budget
+
+    def summary(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "accepting": self.accepting,
+            "failures": self.failures,
+            "udp_address": self.target_udp_address(),
+            "sessions": self.sessions,
+            "load": self.load,
+            "checked_at": self.checked_at,
+        }
+
+
+def parse_nodes(spec: str) -> List[WorkerNode]:
+    """解析 "http://h1:8000,http://h2:8000=10.0.0.2:5555" 形式的节点列表"""
+    nodes = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, udp_address = item.partition("=")
+        nodes.append(WorkerNode(url=url.rstrip("/"), udp_address=udp_address or None))
+    return nodes
+
+
+@dataclass
+class RouterError(Exception):
+    status_code: int
+    error_code: str
+    message: str
+    retry_after: int | None = None
+
+
+@dataclass
+class ForwardedResponse:
+    status_code: int
+    content: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class SessionRouter:
+    """
+    会话路由：按节点上报的负载选择后端 ASR 节点，会话在其生命周期内固定在该节点。
+
+    新会话优先分配给健康、仍接纳会话且利用率最低的节点；节点拒绝（429）或不可达时尝试下一个。
+    健康检查定期拉取各节点的 /asr/status，连续失败 max_failures 次后节点下线，其上的会话随之解除固定。
+    健康检查同时按节点上报的会话列表核对固定关系：不再监听的会话（如由对话内口令或失败结束）不再计为活动会话，
+    节点上已不存在的会话解除固定，使同一 ID 可以重新开始（如从检查点恢复）。
+    音频不经过路由器：/asr/start 的响应中给出机器人应发送 UDP 音频的节点地址。
+    """
+
+    def __init__(
+        self,
+        nodes: List[WorkerNode],
+        client: httpx.AsyncClient | None = None,
+        health_interval: float = ROUTER_HEALTH_INTERVAL_SECONDS,
+        max_failures: int = ROUTER_MAX_FAILURES,
+        request_timeout: float = ROUTER_REQUEST_TIMEOUT_SECONDS,
+    ):
+        self.nodes = nodes
+        self.health_interval = health_interval
+        self.max_failures = max_failures
+        self.request_timeout = request_timeout
+        self._client = client or httpx.AsyncClient(timeout=request_timeout)
+        self._pins: "OrderedDict[str, WorkerNode]" = OrderedDict()
+        self._active: set[str] = set()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    # --- 健康检查 ---
+
+    async def check(self, node: WorkerNode) -> None:
+        # 只核对请求发出前已固定的会话：之后分配的会话可能不在这次的响应中
+        pinned = [sid for sid, n in self._pins.items() if n is node]
+        try:
+            resp = await self._client.get(f"{node.url}/asr/status", timeout=self.request_timeout)
+            resp.raise_for_status()
+            status = resp.json()
+        except Exception as e:
+            node.failures += 1
+            if node.healthy and node.failures >= self.max_failures:
+                logger.warning("ASR node %s marked unhealthy: %s", node.url, e)
+                self._mark_unhealthy(node)
+            return
+        if not node.healthy:
+            logger.info("ASR node %s is healthy", node.url)
+        node.healthy = True
+        node.failures = 0
+        node.load = status.get("load")
+        node.ingest_address = (status.get("ingest") or {}).get("address")
+        node.checked_at = time.time()
+        self._reconcile(node, pinned, status.get("sessions") or [])
+
+    def _reconcile(self, node: WorkerNode, pinned: List[str], sessions: List[dict]) -> None:
+        listening = {s.get("session_id"): bool(s.get("listening")) for s in sessions}
+        for session_id in pinned:
+            if self._pins.get(session_id) is not node:
+                continue
+            if session_id not in listening:
+                self._unpin(session_id)
+            elif not listening[session_id]:
+                self._release(session_id)
+
+    def _mark_unhealthy(self, node: WorkerNode) -> None:
+        node.healthy = False
+        for session_id in [sid for sid, n in self._pins.items() if n is node]:
+            self._unpin(session_id)
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(node) for node in self.nodes))
+
+    async def run_health_checks(self) -> None:
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.health_interval)
+
+    def candidates(self) -> List[WorkerNode]:
+        return sorted((n for n in self.nodes if n.accepting), key=lambda n: (n.utilization(), n.sessions))
+
+    # --- 会话 ---
+
+    def node_for(self, session_id: str) -> WorkerNode:
+        node = self._pins.get(session_id)
+        if node is None:
+            raise RouterError(404, "SessionNotFound", f"ASR session {session_id} not found")
+        return node
+
+    def _pin(self, session_id: str, node: WorkerNode) -> None:
+        self._pins[session_id] = node
+        self._pins.move_to_end(session_id)
+        self._active.add(session_id)
+        while len(self._pins) > MAX_PINNED_SESSIONS:
+            self._unpin(next(iter(self._pins)))
+
+    def _release(self, session_id: str) -> None:
+        if session_id in self._active:
+            self._active.discard(session_id)
+            node = self._pins.get(session_id)
+            if node is not None:
+                node.sessions = max(0, node.sessions - 1)
+
+    def _unpin(self, session_id: str) -> None:
+        self._release(session_id)
+        self._pins.pop(session_id, None)
+
+    async def start(self, body: dict) -> dict:
+        # 由路由器生成会话 ID，节点拒绝后改投其它节点时保持不变
+        body = dict(body)
+        body["session_id"] = body.get("session_id") or uuid.uuid4().hex[:12]
+        session_id = body["session_id"]
+        if session_id in self._active:
+            raise RouterError(400, "InvalidRequest", "ASR session already active")
+
+        rejected: ForwardedResponse | None = None
+        for node in self.candidates():
+            try:
+                resp = await self._client.post(f"{node.url}/asr/start", json=body, timeout=self.request_timeout)
+            except httpx.HTTPError as e:
+                logger.warning("ASR node %s unreachable on start: %s", node.url, e)
+                node.failures += 1
+                if node.failures >= self.max_failures:
+                    self._mark_unhealthy(node)
+                continue
+            if resp.status_code == 429:
+                # 节点已满：在下次健康检查前不再向其分配
+                if node.load is not None:
+                    node.load["accepting"] = False
+                rejected = _forwarded(resp)
+                continue
+            if resp.status_code >= 500:
+                logger.warning("ASR node %s failed to start session: %s", node.url, resp.text)
+                continue
+            if resp.status_code != 200:
+                raise _router_error(resp)
+            payload = resp.json()
+            self._pin(payload["session_id"], node)
+            node.note_assigned()
+            payload.update(node=node.url, udp_address=node.target_udp_address())
+            return payload
+
+        if rejected is not None:
+            raise RouterError(429, "TooManyRequests", "All ASR nodes are at capacity",
+                              retry_after=int(rejected.headers.get("retry-after", ADMISSION_RETRY_AFTER)))
+        raise RouterError(503, "ServiceUnavailable", "No healthy ASR node available",
+                          retry_after=ADMISSION_RETRY_AFTER)
+
+    async def stop(self, body: dict) -> ForwardedResponse:
+        session_id = body.get("session_id")
+        if session_id is None:
+            if not self._active:
+                raise RouterError(400, "AsrNotActive", "ASR session is not active")
+            if len(self._active) > 1:
+                raise RouterError(400, "InvalidRequest", "Multiple ASR sessions active, session_id required")
+            session_id = next(iter(self._active))
+            body = {**body, "session_id": session_id}
+        node = self.node_for(session_id)
+        resp = await self._forward(node, "POST", "/asr/stop", json=body, wait=body.get("wait", 0))
+        if resp.status_code == 200:
+            self._release(session_id)
+        return resp
+
+    async def forward(self, session_id: str, path: str, params: dict | None = None, wait: float = 0) -> ForwardedResponse:
+        return await self._forward(self.node_for(session_id), "GET", path, params=params, wait=wait)
+
+    async def _forward(self, node: WorkerNode, method: str, path: str, wait: float = 0, **kwargs) -> ForwardedResponse:
+        try:
+            resp = await self._client.request(method, f"{node.url}{path}", timeout=self.request_timeout + wait, **kwargs)
+        except httpx.HTTPError as e:
+            raise RouterError(502, "BadGateway", f"ASR node {node.url} unreachable: {e}")
+        return _forwarded(resp)
+
+    async def status(self, session_id: str | None = None) -> dict:
+        nodes = [n for n in self.nodes if n.healthy]
+        if session_id is not None:
+            node = self._pins.get(session_id)
+            nodes = [node] if node is not None and node.healthy else []
+        params = {"session_id": session_id} if session_id is not None else None
+
+        async def _node_status(node: WorkerNode) -> dict | None:
+            try:
+                resp = await self._client.get(f"{node.url}/asr/status", params=params, timeout=self.request_timeout)
+                resp.raise_for_status()
+                return resp.json()
+            except Exception:
+                return None
+
+        statuses = await asyncio.gather(*(_node_status(n) for n in nodes))
+        sessions = []
+        for node, status in zip(nodes, statuses):
+            for s in (status or {}).get("sessions", []):
+                sessions.append({**s, "node": node.url})
+        return {
+            "listening": any(s.get("listening") for s in sessions),
+            "sessions": sessions,
+            "nodes": [n.summary() for n in self.nodes],
+        }
+
+
+def _forwarded(resp: httpx.Response) -> ForwardedResponse:
+    headers = {k: v for k, v in resp.headers.items() if k.lower() in ("content-type", "retry-after", "content-disposition")}
+    return ForwardedResponse(resp.status_code, resp.content, headers)
+
+
+def _router_error(resp: httpx.Response) -> RouterError:
+    """把节点返回的错误原样转换为路由器的错误响应"""
+    try:
+        payload = resp.json()
+    except ValueError:
+        payload = {}
+    return RouterError(resp.status_code, payload.get("error", "InvalidRequest"), payload.get("message", resp.text))
+
+
+def _response(forwarded: ForwardedResponse) -> Response:
+    return Response(content=forwarded.content, status_code=forwarded.status_code, headers=forwarded.headers)
+
+
+class UTF8JSONResponse(JSONResponse):
+    media_type = "application/json; charset=utf-8"
+
+
+def create_router_app(router: SessionRouter) -> FastAPI:
+    """路由模式的 FastAPI 应用：与单节点服务相同的 /asr 接口，会话转发到后端节点"""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await router.check_all()
+        health_task = asyncio.create_task(router.run_health_checks())
+        try:
+            yield
+        finally:
+            health_task.cancel()
+            await router.close()
+
+    app = FastAPI(default_response_class=UTF8JSONResponse, lifespan=lifespan)
+    app.state.router = router
+
+    @app.exception_handler(RouterError)
+    def handle_router_error(request, exc: RouterError):
+        headers = {"Retry-After": str(exc.retry_after)} if exc.retry_after is not None else None
+        return UTF8JSONResponse(
+            status_code=exc.status_code,
+            content={"error": exc.error_code, "message": exc.message},
+            headers=headers,
+        )
+
+    @app.post("/asr/start")
+    async def asr_start(request: Request):
+        return await router.start(await _json_body(request))
+
+    @app.post("/asr/stop")
+    async def asr_stop(request: Request):
+        return _response(await router.stop(await _json_body(request)))
+
+    @app.get("/asr/sessions/{session_id}/result")
+    async def asr_result(session_id: str, wait: float = Query(0, ge=0, le=60)):
+        return _response(await router.forward(session_id, f"/asr/sessions/{session_id}/result", {"wait": wait}, wait))
+
+    @app.get("/asr/sessions/{session_id}/trace")
+    async def asr_trace(session_id: str):
+        return _response(await router.forward(session_id, f"/asr/sessions/{session_id}/trace"))
+
+    @app.get("/asr/status")
+    async def asr_status(session_id: str | None = Query(None)):
+        return await router.status(session_id)
+
+    @app.get("/router/nodes")
+    def router_nodes():
+        return {"nodes": [n.summary() for n in router.nodes]}
+
+    return app
+
+
+async def _json_body(request: Request) -> dict:
+    body = await request.body()
+    if not body:
+        return {}
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise RouterError(400, "InvalidRequest", "Request body must be JSON")
+    if not isinstance(payload, dict):
+        raise RouterError(400, "InvalidRequest", "Request body must be a JSON object")
+    return payload
+
+
+app = create_router_app(SessionRouter(parse_nodes(ROUTER_NODES)))
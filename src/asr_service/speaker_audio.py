@@ -1,12 +1,4 @@
-﻿import os
-import sys
-import traceback
-
-# Ensure asr_core is on sys.path for legacy imports inside it
-current_dir = os.path.dirname(os.path.abspath(__file__))
-core_dir = os.path.join(current_dir, "asr_core")
-if core_dir not in sys.path:
-    sys.path.insert(0, core_dir)
+﻿import traceback
 
 from .asr_core.main import RealtimeAssistant
 
@@ -16,8 +8,11 @@ class SpeakerAudio:
     ASR 适配层：封装 RealtimeAssistant，对外只暴露 process_audio_stream。
     """
 
-    def __init__(self):
+    def __init__(self, assistant: RealtimeAssistant | None = None):
         """初始化 SpeakerAudio 接口"""
+        if assistant is not None:
+            self.assistant = assistant
+            return
         print("正在初始化 SpeakerAudio 接口...")
         try:
             self.assistant = RealtimeAssistant()
@@ -25,25 +20,68 @@ class SpeakerAudio:
             print(f"初始化失败: {e}")
             raise
 
-    def process_audio_stream(self, audio_stream, mode: str = "plain") -> list:
+    def fork(self) -> "SpeakerAudio":
+        """创建共享模型、但识别状态与学生声纹库独立的接口实例（每个会话一个）"""
+        return SpeakerAudio(RealtimeAssistant(models_from=self.assistant))
+
+    def process_audio_stream(self, audio_stream, mode: str = "plain", stop_event=None, timeout=30) -> list:
         """
         处理音频流并返回识别结果。
 
         Args:
             audio_stream: 生成 16bit PCM 音频数据的生成器
             mode: 模式选择，"plain"=普通ASR，"dialog"=启用开始/停止指令
+            stop_event: 可选的 threading.Event；set 后在下一个音频块边界停止并收尾
+            timeout: 无语音多少秒后结束识别；None 表示不结束，长时间静音时会话挂起
 
         Returns:
             list: 识别结果列表（包含说话人、文本等字段）
         """
         print("通过接口处理音频流中...")
         try:
-            return self.assistant.run_stream(audio_stream, mode=mode)
+            return self.assistant.run_stream(audio_stream, timeout=timeout, mode=mode, stop_event=stop_event)
         except Exception as e:
             print(f"音频流处理失败: {e}")
             traceback.print_exc()
             raise
 
+    def resume_from(self, data: bytes) -> None:
+        """从会话检查点恢复识别状态、学生声纹库与已有结果"""
+        self.assistant.resume_from(data)
+
+    def model_stats(self) -> dict:
+        """本进程的模型加载耗时与内存映射的权重字节数"""
+        return self.assistant.model_stats()
+
+    def partial_results(self) -> list:
+        """返回当前会话已定稿的识别结果副本（可在识别线程运行时调用）"""
+        return list(self.assistant.all_results)
+
+    def load_stats(self) -> dict:
+        """返回已处理音频时长与各阶段推理耗时"""
+        return self.assistant.load_stats()
+
+    def memory_stats(self) -> dict:
+        """返回结果列表、声纹库与模型缓存的规模"""
+        return self.assistant.memory_stats()
+
+    @property
+    def suspended(self) -> bool:
+        """会话是否因长时间静音而挂起"""
+        return self.assistant.suspended
+
+    def idle_stats(self) -> dict:
+        """空闲挂起状态与挂起/恢复次数"""
+        return self.assistant.idle_stats()
+
+    def shedding_stats(self) -> dict | None:
+        """负载卸除：处理滞后、当前降级级别与级别变化事件"""
+        return self.assistant.shedding_stats()
+
+    def gallery_stats(self) -> dict:
+        """返回学生声纹库规模与淘汰/合并计数"""
+        return self.assistant.speaker_mgr.gallery_stats()
+
 
 if __name__ == "__main__":
     # 本文件不建议直接运行，保留调试入口
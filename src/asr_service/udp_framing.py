@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+from typing import Dict, List
+
+# 分帧 UDP 协议头（网络字节序，20 字节）：
+#   magic(2s)="AF" | version(B) | flags(B) | stream_id(I) | seq(I) | sample_ts(Q)
+# sample_ts 为该包第一个采样帧在发送端音频流中的序号（按发送端采样率计）。
+FRAME_MAGIC = b"AF"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("!2sBBIIQ")
+
+_SEQ_MOD = 1 << 32
+
+CONCEAL_ZERO = "zero"
+CONCEAL_REPEAT = "repeat"
+
+
+@dataclass
+class Frame:
+    stream_id: int
+    seq: int
+    sample_ts: int
+    payload: bytes
+    flags: int = 0
+
+
+def pack_frame(seq: int, sample_ts: int, payload: bytes, stream_id: int = 0, flags: int = 0) -> bytes:
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, stream_id, seq % _SEQ_MOD, sample_ts)
+    return header + payload
+
+
+def parse_frame(datagram: bytes) -> Frame | None:
+    """解析分帧数据包，格式不符时返回 None"""
+    if len(datagram) < FRAME_HEADER.size:
+        return None
+    magic, version, flags, stream_id, seq, sample_ts = FRAME_HEADER.unpack_from(datagram)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        return None
+    return Frame(stream_id, seq, sample_ts, datagram[FRAME_HEADER.size:], flags)
+
+
+def _seq_diff(a: int, b: int) -> int:
+    """a - b（考虑 32 位序号回绕）"""
+    return ((a - b + (1 << 31)) % _SEQ_MOD) - (1 << 31)
+
+
+class JitterBuffer:
+    """
+    自适应抖动缓冲：按序号重排数据包，对丢失的包做补零或重复前一包的隐藏处理。
+
+    缓冲深度（包数）根据观测到的乱序距离自适应增长，连续按序到达一段时间后逐步回落。
+    输出的是与输入相同编码的负载字节，直接交给 InputDecoder。
+
+    发送端重启（序号从头开始或向回跳）时，序号比期望值早 4 * max_depth 以上、
+    或连续 2 * max_depth 个包都是迟到包，视为新的流：输出缓冲中的旧包后按新序号重新同步。
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        frame_bytes: int = 2,
+        silence_frame: bytes = b"\x00\x00",
+        concealment: str = CONCEAL_ZERO,
+        min_depth: int = 1,
+        max_depth: int = 16,
+        max_conceal_seconds: float = 1.0,
+    ):
+        if concealment not in (CONCEAL_ZERO, CONCEAL_REPEAT):
+            raise ValueError(f"不支持的丢包隐藏方式: {concealment}")
+        self.sample_rate = sample_rate
+        self.frame_bytes = frame_bytes
+        self.silence_frame = silence_frame
+        self.concealment = concealment
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.target_depth = min_depth
+        self._max_conceal_samples = int(max_conceal_seconds * sample_rate)
+
+        self._pending: Dict[int, Frame] = {}
+        self._next_seq: int | None = None
+        self._next_ts: int | None = None
+        self._highest_seq: int | None = None
+        self._last_payload = b""
+        self._in_order_run = 0
+        self._late_run = 0
+        self._carry: List[bytes] = []  # 重新同步前缓冲中的旧包，下次 pop_ready 时先输出
+
+        # RFC 3550 到达间隔抖动估计（单位：采样）
+        self._transit: float | None = None
+        self._jitter = 0.0
+
+        self.received = 0
+        self.lost = 0
+        self.late = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.concealed_samples = 0
+        self.malformed = 0
+        self.resyncs = 0
+
+    def push(self, frame: Frame, arrival_time: float) -> None:
+        """放入一个到达的数据包"""
+        self.received += 1
+        if self._next_seq is not None and self._is_restart(frame):
+            self._resync()
+        self._update_jitter(frame, arrival_time)
+
+        if self._next_seq is None:
+            self._next_seq = frame.seq
+            self._next_ts = frame.sample_ts
+        if _seq_diff(frame.seq, self._next_seq) < 0:
+            self.late += 1  # 该位置已输出（或已隐藏），丢弃
+            self._late_run += 1
+            return
+        self._late_run = 0
+        if frame.seq in self._pending:
+            self.duplicates += 1
+            return
+
+        if self._highest_seq is None or _seq_diff(frame.seq, self._highest_seq) > 0:
+            self._highest_seq = frame.seq
+            self._in_order_run += 1
+            if self._in_order_run >= 500 and self.target_depth > self.min_depth:
+                self.target_depth -= 1
+                self._in_order_run = 0
+        else:
+            # 比已到达的最大序号更早的包：乱序到达
+            self.reordered += 1
+            self._in_order_run = 0
+            displacement = _seq_diff(self._highest_seq, frame.seq)
+            self.target_depth = min(self.max_depth, max(self.target_depth, displacement + 1))
+        self._pending[frame.seq] = frame
+
+    def pop_ready(self) -> List[bytes]:
+        """取出可以按序输出的负载；缓冲超过目标深度时放弃等待缺失的包"""
+        out, self._carry = self._carry, []
+        while self._pending:
+            frame = self._pending.pop(self._next_seq, None)
+            if frame is not None:
+                self._emit(frame, out)
+                continue
+            if len(self._pending) <= self.target_depth:
+                break
+            self._skip_to_earliest(out)
+        return out
+
+    def flush(self) -> List[bytes]:
+        """输出缓冲中的全部数据（空闲或结束时调用）"""
+        out, self._carry = self._carry, []
+        while self._pending:
+            frame = self._pending.pop(self._next_seq, None)
+            if frame is not None:
+                self._emit(frame, out)
+            else:
+                self._skip_to_earliest(out)
+        return out
+
+    def stats(self) -> dict:
+        expected = self.received - self.duplicates - self.late + self.lost
+        return {
+            "received": self.received,
+            "lost": self.lost,
+            "loss_rate": round(self.lost / expected, 4) if expected > 0 else 0.0,
+            "late": self.late,
+            "duplicates": self.duplicates,
+            "reordered": self.reordered,
+            "malformed": self.malformed,
+            "concealed_samples": self.concealed_samples,
+            "jitter_ms": round(self._jitter * 1000 / self.sample_rate, 2),
+            "target_depth": self.target_depth,
+            "resyncs": self.resyncs,
+        }
+
+    def _is_restart(self, frame: Frame) -> bool:
+        behind = -_seq_diff(frame.seq, self._next_seq)
+        return behind > 4 * self.max_depth or (behind > 0 and self._late_run + 1 >= 2 * self.max_depth)
+
+    def _resync(self) -> None:
+        """发送端重启：保留旧流缓冲中的数据，从下一个包起按新的序号与时间戳计"""
+        self._carry = self.flush()
+        self._next_seq = None
+        self._next_ts = None
+        self._highest_seq = None
+        self._transit = None
+        self._late_run = 0
+        self.resyncs += 1
+
+    def _emit(self, frame: Frame, out: List[bytes]) -> None:
+        out.append(frame.payload)
+        self._last_payload = frame.payload
+        self._next_seq = (frame.seq + 1) % _SEQ_MOD
+        self._next_ts = frame.sample_ts + len(frame.payload) // self.frame_bytes
+
+    def _skip_to_earliest(self, out: List[bytes]) -> None:
+        earliest = min(self._pending, key=lambda s: _seq_diff(s, self._next_seq))
+        missing = _seq_diff(earliest, self._next_seq)
+        self.lost += missing
+        gap = self._pending[earliest].sample_ts - self._next_ts
+        if gap <= 0 or gap > self._max_conceal_samples:
+            # 时间戳不可用时按上一包长度估算
+            gap = missing * (len(self._last_payload) // self.frame_bytes)
+        gap = min(gap, self._max_conceal_samples)
+        if gap > 0:
+            out.append(self._conceal(gap))
+            self.concealed_samples += gap
+        self._next_seq = earliest
+        self._next_ts = self._pending[earliest].sample_ts
+
+    def _conceal(self, samples: int) -> bytes:
+        if self.concealment == CONCEAL_REPEAT and self._last_payload:
+            n_bytes = samples * self.frame_bytes
+            reps = n_bytes // len(self._last_payload) + 1
+            return (self._last_payload * reps)[:n_bytes]
+        return self.silence_frame * samples
+
+    def _update_jitter(self, frame: Frame, arrival_time: float) -> None:
+        transit = arrival_time * self.sample_rate - frame.sample_ts
+        if self._transit is not None:
+            d = abs(transit - self._transit)
+            self._jitter += (d - self._jitter) / 16
+        self._transit = transit
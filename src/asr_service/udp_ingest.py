@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Tuple
+
+from .udp_framing import FRAME_HEADER, FRAME_MAGIC
+
+logger = logging.getLogger(__name__)
+
+# 单次从 socket 中连续读取的最大数据报数（非阻塞读到 EAGAIN 为止）
+RECV_BATCH_SIZE = 64
+MAX_DATAGRAM_BYTES = 4096
+
+Datagram = Tuple[bytes, float]  # (数据, 到达时间 time.monotonic())
+
+
+class Wakeup:
+    """
+    可放进 selector 的唤醒描述符：Linux 上用 eventfd，其它平台用自管道。
+    wake() 之后描述符保持可读，直到 drain()。
+    """
+
+    def __init__(self):
+        if hasattr(os, "eventfd"):
+            self._rfd = self._wfd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        else:
+            self._rfd, self._wfd = os.pipe()
+            os.set_blocking(self._rfd, False)
+            os.set_blocking(self._wfd, False)
+        self._closed = False
+
+    def fileno(self) -> int:
+        return self._rfd
+
+    def wake(self) -> None:
+        if self._closed:
+            return
+        try:
+            os.write(self._wfd, (1).to_bytes(8, "little") if self._rfd == self._wfd else b"\0")
+        except BlockingIOError:
+            pass  # 已有未读取的唤醒
+
+    def drain(self) -> None:
+        try:
+            while os.read(self._rfd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        os.close(self._rfd)
+        if self._wfd != self._rfd:
+            os.close(self._wfd)
+
+
+class StopEvent(threading.Event):
+    """set() 时同时触发 Wakeup 的 threading.Event，阻塞在 selector 上的接收循环可立即醒来"""
+
+    def __init__(self):
+        super().__init__()
+        self._wakeup = Wakeup()
+
+    def fileno(self) -> int:
+        return self._wakeup.fileno()
+
+    def set(self) -> None:
+        super().set()
+        self._wakeup.wake()
+
+    def close(self) -> None:
+        self._wakeup.close()
+
+
+def parse_udp_address(udp_address: str) -> Tuple[str, int, bool]:
+    """解析 "host:port"，返回 (host, port, 是否组播)"""
+    host, port_str = udp_address.split(":")
+    port = int(port_str)
+    is_multicast = False
+    try:
+        ip_parts = list(map(int, host.split(".")))
+        if len(ip_parts) == 4 and 224 <= ip_parts[0] <= 239:
+            is_multicast = True
+    except Exception:
+        pass
+    return host, port, is_multicast
+
+
+def open_udp_socket(host: str, port: int, is_multicast: bool, reuse_port: bool = False) -> socket.socket:
+    """创建并绑定 UDP socket，组播地址会加入组播组"""
+    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    try:
+        if is_multicast:
+            udp_socket.bind(("", port))
+            group = socket.inet_aton(host)
+            mreq = struct.pack("4sL", group, socket.INADDR_ANY)
+            udp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        else:
+            udp_socket.bind((host, port))
+    except Exception as e:
+        udp_socket.close()
+        raise Exception(f"UDP 绑定失败: {e}")
+    return udp_socket
+
+
+def close_udp_socket(udp_socket: socket.socket, host: str, is_multicast: bool) -> None:
+    if is_multicast:
+        try:
+            group = socket.inet_aton(host)
+            mreq = struct.pack("4sL", group, socket.INADDR_ANY)
+            udp_socket.setsockopt(socket.IPPROTO_IP, socket.IP_DROP_MEMBERSHIP, mreq)
+        except Exception:
+            pass
+    udp_socket.close()
+
+
+class SessionInbox:
+    """单个会话的数据报队列：接收线程批量写入，会话线程批量取出"""
+
+    def __init__(self, max_datagrams: int = 4096):
+        self._items: deque[Datagram] = deque(maxlen=max_datagrams)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.received = 0
+        self.dropped = 0  # 会话处理跟不上、队列满时丢弃的最旧数据报
+
+    def put_many(self, items: List[Datagram]) -> None:
+        with self._cond:
+            self.dropped += max(0, len(self._items) + len(items) - self._items.maxlen)
+            self._items.extend(items)
+            self.received += len(items)
+            self._cond.notify()
+
+    def get_batch(self, timeout: float | None = None) -> List[Datagram] | None:
+        """取出当前所有数据报；超时返回空列表，关闭后返回 None"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None if self._closed else []
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class UdpIngestServer:
+    """
+    共享 UDP 接收端：一个（或少量 SO_REUSEPORT）socket 为所有会话接收数据。
+
+    数据报按以下顺序路由到会话：
+      1. 分帧包头中的 stream_id 已被某个会话注册；
+      2. 来源地址匹配（先 ip:port，再 ip）；
+      3. 未指定来源的会话（通配）全部收到一份，与各自加入组播组时的行为一致。
+    """
+
+    def __init__(self, udp_address: str = "239.168.123.161:5555", num_sockets: int = 1):
+        self.udp_address = udp_address
+        self._host, self._port, self._is_multicast = parse_udp_address(udp_address)
+        # 组播包会投递给每个 REUSEPORT socket，只有单播才能用多个 socket 分摊负载
+        self._num_sockets = 1 if self._is_multicast else max(1, num_sockets)
+        self._lock = threading.Lock()
+        self._by_stream: Dict[int, SessionInbox] = {}
+        self._by_source: Dict[Tuple[str, int | None], SessionInbox] = {}
+        self._wildcard: Dict[str, SessionInbox] = {}
+        self._routes: Dict[str, tuple] = {}
+        self._sockets: List[socket.socket] = []
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._wakeup: Wakeup | None = None
+        self.datagrams = 0
+        self.batches = 0
+        self.unrouted = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._running:
+                return
+            reuse_port = self._num_sockets > 1
+            self._sockets = [
+                open_udp_socket(self._host, self._port, self._is_multicast, reuse_port=reuse_port)
+                for _ in range(self._num_sockets)
+            ]
+            self._running = True
+            self._wakeup = Wakeup()
+            for sock in self._sockets:
+                sock.setblocking(False)
+                t = threading.Thread(target=self._reader, args=(sock, self._wakeup), daemon=True, name="udp-ingest")
+                t.start()
+                self._threads.append(t)
+            logger.info("UDP ingest listening on %s (%d socket(s))", self.udp_address, len(self._sockets))
+
+    def close(self) -> None:
+        with self._lock:
+            self._running = False
+            sockets, self._sockets = self._sockets, []
+            wakeup, self._wakeup = self._wakeup, None
+        if wakeup is not None:
+            wakeup.wake()
+        for t in self._threads:
+            t.join(timeout=2.0)
+        self._threads = []
+        for sock in sockets:
+            close_udp_socket(sock, self._host, self._is_multicast)
+        if wakeup is not None:
+            wakeup.close()
+
+    def register(
+        self,
+        session_id: str,
+        inbox: SessionInbox,
+        source: str | None = None,
+        stream_id: int | None = None,
+    ) -> None:
+        """注册会话；source 为 "ip" 或 "ip:port"，stream_id 对应分帧包头字段"""
+        key = None
+        with self._lock:
+            if stream_id is not None:
+                if stream_id in self._by_stream:
+                    raise ValueError(f"stream_id {stream_id} 已被其它会话占用")
+                self._by_stream[stream_id] = inbox
+            if source:
+                ip, _, port = source.partition(":")
+                key = (ip, int(port) if port else None)
+                if key in self._by_source:
+                    if stream_id is not None:
+                        del self._by_stream[stream_id]
+                    raise ValueError(f"来源地址 {source} 已被其它会话占用")
+                self._by_source[key] = inbox
+            if stream_id is None and key is None:
+                self._wildcard[session_id] = inbox
+            self._routes[session_id] = (stream_id, key)
+
+    def unregister(self, session_id: str) -> None:
+        with self._lock:
+            stream_id, key = self._routes.pop(session_id, (None, None))
+            if stream_id is not None:
+                self._by_stream.pop(stream_id, None)
+            if key is not None:
+                self._by_source.pop(key, None)
+            self._wildcard.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "address": self.udp_address,
+            "sockets": len(self._sockets),
+            "sessions": len(self._routes),
+            "datagrams": self.datagrams,
+            "batches": self.batches,
+            "unrouted": self.unrouted,
+        }
+
+    def _route(self, data: bytes, addr) -> List[SessionInbox]:
+        if len(data) >= FRAME_HEADER.size and data[:2] == FRAME_MAGIC and self._by_stream:
+            stream_id = FRAME_HEADER.unpack_from(data)[3]
+            inbox = self._by_stream.get(stream_id)
+            if inbox is not None:
+                return [inbox]
+        if self._by_source:
+            inbox = self._by_source.get((addr[0], addr[1])) or self._by_source.get((addr[0], None))
+            if inbox is not None:
+                return [inbox]
+        return list(self._wildcard.values())
+
+    def _reader(self, sock: socket.socket, wakeup: Wakeup) -> None:
+        selector = selectors.DefaultSelector()
+        selector.register(sock, selectors.EVENT_READ)
+        selector.register(wakeup, selectors.EVENT_READ)
+        try:
+            while self._running:
+                # 没有超时轮询：close() 通过 wakeup 立即唤醒
+                selector.select()
+                if not self._running:
+                    break
+                batch: Dict[int, Tuple[SessionInbox, List[Datagram]]] = {}
+                count = 0
+                now = time.monotonic()
+                with self._lock:
+                    while count < RECV_BATCH_SIZE:
+                        try:
+                            data, addr = sock.recvfrom(MAX_DATAGRAM_BYTES)
+                        except (BlockingIOError, InterruptedError):
+                            break
+                        count += 1
+                        targets = self._route(data, addr)
+                        if not targets:
+                            self.unrouted += 1
+                        for inbox in targets:
+                            batch.setdefault(id(inbox), (inbox, []))[1].append((data, now))
+                    self.datagrams += count
+                    self.batches += 1
+                # 每个会话每批只唤醒一次
+                for inbox, items in batch.values():
+                    inbox.put_many(items)
+        except OSError:
+            if self._running:
+                logger.exception("UDP ingest reader failed")
+        finally:
+            selector.close()
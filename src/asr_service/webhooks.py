@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+from .asr_core.config import (
+    WEBHOOK_BATCH_MAX_SENTENCES,
+    WEBHOOK_BATCH_WINDOW_SECONDS,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_QUEUE_DIR,
+    WEBHOOK_QUEUE_MAX_BATCHES,
+    WEBHOOK_RETRY_INITIAL_SECONDS,
+    WEBHOOK_RETRY_MAX_SECONDS,
+    WEBHOOK_TIMEOUT_SECONDS,
+    WEBHOOK_URLS,
+)
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def parse_urls(spec: str) -> List[str]:
+    return [url.strip() for url in spec.split(",") if url.strip()]
+
+
+class DiskQueue:
+    """
+    有界的磁盘批次队列：每个批次一个 JSON 文件，文件名为递增序号，按序号先进先出。
+    超过 max_batches 时丢弃最旧的批次；进程重启后从目录中已有的文件继续。
+    """
+
+    def __init__(self, directory: str, max_batches: int = WEBHOOK_QUEUE_MAX_BATCHES):
+        self.directory = directory
+        self.max_batches = max_batches
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        self._seqs = sorted(int(name[:-5]) for name in os.listdir(directory) if name.endswith(".json") and name[:-5].isdigit())
+        self._next = self._seqs[-1] + 1 if self._seqs else 0
+
+    def __len__(self) -> int:
+        return len(self._seqs)
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}.json")
+
+    def push(self, batch: List[dict]) -> None:
+        seq, self._next = self._next, self._next + 1
+        tmp = self._path(seq) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(batch, f, ensure_ascii=False)
+        os.replace(tmp, self._path(seq))
+        self._seqs.append(seq)
+        while len(self._seqs) > self.max_batches:
+            self._remove(self._seqs[0])
+            self.dropped += 1
+
+    def peek(self) -> List[dict] | None:
+        """最旧的批次；文件损坏时丢弃并继续"""
+        while self._seqs:
+            try:
+                with open(self._path(self._seqs[0]), encoding="utf-8") as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                logger.warning("Dropping unreadable webhook batch %s", self._path(self._seqs[0]))
+                self._remove(self._seqs[0])
+                self.dropped += 1
+        return None
+
+    def pop(self) -> None:
+        if self._seqs:
+            self._remove(self._seqs[0])
+
+    def _remove(self, seq: int) -> None:
+        self._seqs.remove(seq)
+        try:
+            os.remove(self._path(seq))
+        except FileNotFoundError:
+            pass
+
+
+class WebhookSink:
+    """单个 webhook 地址：内存中按时间窗合并句子；发送失败的批次进入磁盘队列，按退避重试"""
+
+    def __init__(self, url: str, queue: DiskQueue):
+        self.url = url
+        self.queue = queue
+        self.pending: List[dict] = []
+        self.wakeup = asyncio.Event()
+        self.delivered = 0  # 已成功送达的句子数
+        self.batches = 0  # 成功的 POST 次数
+        self.failures = 0  # 失败的 POST 次数（含重试）
+        self.rejected = 0  # 因下游 4xx 永久拒绝而丢弃的批次
+        self.last_error: str | None = None
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "pending": len(self.pending),
+            "queued_batches": len(self.queue),
+            "delivered": self.delivered,
+            "batches": self.batches,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "dropped_batches": self.queue.dropped,
+            "last_error": self.last_error,
+        }
+
+
+class WebhookDispatcher:
+    """
+    把定稿的句子推送到 webhook：识别线程只调用 submit（不阻塞），发送在独立线程的事件循环中进行。
+
+    所有地址共用一个 httpx.AsyncClient（keep-alive 连接池）。每个地址的句子在 batch_window 秒内合并为一次
+    POST {"sentences": [...]}，最多 batch_max 句。发送失败（网络错误、5xx、408/429）的批次写入该地址的
+    磁盘队列，以指数退避重试；队列非空时新批次也进入队列，保证同一地址的投递顺序。
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str] = (),
+        queue_dir: str = WEBHOOK_QUEUE_DIR,
+        batch_window: float = WEBHOOK_BATCH_WINDOW_SECONDS,
+        batch_max: int = WEBHOOK_BATCH_MAX_SENTENCES,
+        timeout: float = WEBHOOK_TIMEOUT_SECONDS,
+        max_connections: int = WEBHOOK_MAX_CONNECTIONS,
+        retry_initial: float = WEBHOOK_RETRY_INITIAL_SECONDS,
+        retry_max: float = WEBHOOK_RETRY_MAX_SECONDS,
+        queue_max_batches: int = WEBHOOK_QUEUE_MAX_BATCHES,
+    ):
+        self.default_urls = list(urls)
+        self.queue_dir = queue_dir
+        self.batch_window = batch_window
+        self.batch_max = batch_max
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.queue_max_batches = queue_max_batches
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._sinks: Dict[str, WebhookSink] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+        self.submitted = 0
+
+    def start(self) -> None:
+        """启动发送线程；默认地址的磁盘队列中上次未送达的批次随即开始重发"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True, name="asr-webhooks")
+            self._thread.start()
+            ready.wait()
+        for url in self.default_urls:
+            self._loop.call_soon_threadsafe(self._sink, url)
+
+    def _run(self, ready: threading.Event) -> None:
+        import httpx  # 首次发送时才加载，导入服务不需要它
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        self._loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self._client.aclose())
+            loop.close()
+
+    def submit(self, session_id: str, index: int, result: dict, urls: Iterable[str] | None = None) -> None:
+        """由识别线程调用：把一条定稿结果交给各地址，立即返回"""
+        urls = self.default_urls if urls is None else list(urls)
+        if not urls or self._closing:
+            return
+        if self._loop is None:
+            self.start()
+        sentence = {"session_id": session_id, "index": index, **result}
+        self.submitted += 1
+        self._loop.call_soon_threadsafe(self._enqueue, sentence, urls)
+
+    def _sink(self, url: str) -> WebhookSink:
+        sink = self._sinks.get(url)
+        if sink is None:
+            digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+            sink = WebhookSink(url, DiskQueue(os.path.join(self.queue_dir, digest), self.queue_max_batches))
+            self._sinks[url] = sink
+            self._tasks.append(self._loop.create_task(self._deliver(sink)))
+        return sink
+
+    def _enqueue(self, sentence: dict, urls: List[str]) -> None:
+        for url in urls:
+            sink = self._sink(url)
+            sink.pending.append(sentence)
+            sink.wakeup.set()
+
+    async def _post(self, sink: WebhookSink, batch: List[dict]) -> bool:
+        """发送一个批次；返回 False 表示应稍后重试（永久拒绝的批次计入 rejected 并视为已处理）"""
+        import httpx
+
+        try:
+            resp = await self._client.post(sink.url, json={"sentences": batch})
+        except httpx.HTTPError as e:
+            sink.failures += 1
+            sink.last_error = f"{type(e).__name__}: {e}"
+            return False
+        if resp.is_success:
+            sink.batches += 1
+            sink.delivered += len(batch)
+            sink.last_error = None
+            return True
+        sink.last_error = f"HTTP {resp.status_code}"
+        if 400 <= resp.status_code < 500 and resp.status_code not in (408, 429):
+            sink.rejected += 1
+            logger.warning("Webhook %s rejected a batch of %d sentences: HTTP %d", sink.url, len(batch), resp.status_code)
+            return True
+        sink.failures += 1
+        return False
+
+    def _take(self, sink: WebhookSink) -> List[dict]:
+        batch, sink.pending = sink.pending[:self.batch_max], sink.pending[self.batch_max:]
+        return batch
+
+    async def _deliver(self, sink: WebhookSink) -> None:
+        delay = self.retry_initial
+        while True:
+            if len(sink.queue):
+                # 有积压：新句子先追加到磁盘队列，按顺序从最旧的批次开始重发
+                while sink.pending:
+                    sink.queue.push(self._take(sink))
+                batch = sink.queue.peek()
+                if batch is None:
+                    continue
+                if await self._post(sink, batch):
+                    sink.queue.pop()
+                    delay = self.retry_initial
+                    continue
+                if self._closing:
+                    return
+                await self._sleep(sink, delay * (0.5 + random.random() / 2))
+                delay = min(delay * 2, self.retry_max)
+                continue
+
+            if not sink.pending:
+                if self._closing:
+                    return
+                sink.wakeup.clear()
+                await sink.wakeup.wait()
+                continue
+            if not self._closing and len(sink.pending) < self.batch_max:
+                # 合并时间窗：等待同一时间窗内的后续句子
+                await self._sleep(sink, self.batch_window, until_full=True)
+            batch = self._take(sink)
+            try:
+                delivered = await self._post(sink, batch)
+            except asyncio.CancelledError:
+                sink.queue.push(batch)
+                raise
+            if not delivered:
+                sink.queue.push(batch)
+
+    async def _sleep(self, sink: WebhookSink, seconds: float, until_full: bool = False) -> None:
+        """等待 seconds 秒；关闭时（或 until_full 且凑满一批时）提前返回"""
+        deadline = time.monotonic() + seconds
+        while not self._closing and not (until_full and len(sink.pending) >= self.batch_max):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            sink.wakeup.clear()
+            try:
+                await asyncio.wait_for(sink.wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "default_urls": self.default_urls,
+            "submitted": self.submitted,
+            "sinks": [sink.stats() for sink in list(self._sinks.values())],
+        }
+
+    def close(self, timeout: float = 5.0) -> None:
+        """尽量发出内存中的句子（失败的写入磁盘队列，下次启动后重发），然后停止事件循环"""
+        if self._loop is None:
+            return
+        loop = self._loop
+
+        async def _shutdown():
+            self._closing = True
+            for sink in self._sinks.values():
+                sink.wakeup.set()
+            if self._tasks:
+                _, unfinished = await asyncio.wait(self._tasks, timeout=timeout)
+                for task in unfinished:
+                    task.cancel()
+                await asyncio.gather(*unfinished, return_exceptions=True)
+            for sink in self._sinks.values():
+                while sink.pending:
+                    sink.queue.push(self._take(sink))
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout + 1)
+        except Exception:
+            logger.exception("Webhook shutdown did not complete")
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join(timeout=timeout)
+        # 关闭后可以再次 start（例如应用重新进入 lifespan）
+        self._loop = None
+        self._thread = None
+        self._sinks = {}
+        self._tasks = []
+        self._closing = False
+
+
+def create_dispatcher() -> WebhookDispatcher:
+    return WebhookDispatcher(parse_urls(WEBHOOK_URLS))
@@ -0,0 +1,43 @@
+"""测试共用的音频生成、端口与桩后端辅助函数"""
+import socket
+import time
+
+import numpy as np
+
+STUB = {"vad": "stub", "asr": "stub", "speaker": "stub", "punc": "stub"}
+CHUNK = 3200  # 200ms，与 VAD 块大小一致
+
+
+def make_speech(seconds: float, freq: float = 220.0) -> np.ndarray:
+    """桩 VAD 判为语音的正弦音（int16）"""
+    t = np.arange(int(16000 * seconds)) / 16000
+    return (6000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def make_silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(16000 * seconds), np.int16)
+
+
+def pcm_chunks(audio: np.ndarray, size: int = CHUNK) -> list:
+    return [audio[i:i + size].tobytes() for i in range(0, len(audio), size)]
+
+
+def free_port(kind: int = socket.SOCK_DGRAM) -> int:
+    with socket.socket(socket.AF_INET, kind) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def count_vad_calls(assistant, slow_calls: int = 0, delay: float = 0.0):
+    """包装 assistant 的 VAD 后端，调用次数记在 assistant.vad_calls；前 slow_calls 次调用额外耗时 delay 秒"""
+    detect = assistant.vad_backend.detect
+    assistant.vad_calls = 0
+
+    def counting_detect(*args, **kwargs):
+        assistant.vad_calls += 1
+        if assistant.vad_calls <= slow_calls:
+            time.sleep(delay)
+        return detect(*args, **kwargs)
+
+    assistant.vad_backend.detect = counting_detect
+    return assistant
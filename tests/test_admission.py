@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.admission import AdmissionController, AdmissionRejected
+
+
+def test_rejects_above_max_sessions():
+    controller = AdmissionController(max_sessions=2, cpu_budget=100, retry_after=7)
+    controller.admit([])
+    controller.admit([None])
+    with pytest.raises(AdmissionRejected) as exc:
+        controller.admit([None, None])
+    assert exc.value.retry_after == 7
+    assert controller.load([None, None])["accepting"] is False
+    assert (controller.admitted, controller.rejected) == (2, 1)
+
+
+def test_rejects_when_measured_cost_would_exceed_cpu_budget():
+    controller = AdmissionController(max_sessions=10, cpu_budget=2.0, default_cost=0.5)
+    controller.admit([0.6, 0.6])  # 1.2 + 0.5 <= 2.0
+    with pytest.raises(AdmissionRejected):
+        controller.admit([0.6, 0.6, 0.6])  # 1.8 + 0.5 > 2.0
+    load = controller.load([0.6, 0.6, 0.6])
+    assert load["cpu_load"] == pytest.approx(1.8)
+    assert load["utilization"] == pytest.approx(0.9)
+
+
+def test_estimate_follows_finished_sessions():
+    controller = AdmissionController(max_sessions=10, cpu_budget=1.0, default_cost=0.5, smoothing=0.5)
+    controller.observe(0.1)
+    assert controller.estimated_cost == pytest.approx(0.1)
+    controller.observe(0.3)
+    assert controller.estimated_cost == pytest.approx(0.2)
+    controller.observe(None)
+    # 未实测的活动会话按估计值计入
+    assert controller.load([None, None, 0.4])["cpu_load"] == pytest.approx(0.8)
+    controller.admit([None, None, 0.4])
+
+
+def test_rejects_when_a_serialized_model_stage_is_saturated():
+    # CPU 预算充足，但加锁串行的 asr 模型已接近一次只能执行一个调用的上限
+    controller = AdmissionController(max_sessions=10, cpu_budget=16.0, stage_capacity={"asr": 1})
+    controller.observe(0.35, {"asr": 0.3, "vad": 0.05})
+    controller.admit([0.35, 0.35], [{"asr": 0.3}, {"asr": 0.3}])  # 0.6 + 0.3 <= 1
+    with pytest.raises(AdmissionRejected, match="asr"):
+        controller.admit([0.35, 0.35, None], [{"asr": 0.3}, {"asr": 0.3}, None])  # 0.9 + 0.3 > 1
+    load = controller.load([0.35, 0.35, None], [{"asr": 0.3}, {"asr": 0.3}, None])
+    assert load["stages"]["asr"]["load"] == pytest.approx(0.9)
+    assert load["accepting"] is False
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.audio_format import ALAW_TABLE, MULAW_TABLE, InputDecoder, InputFormat
+
+
+def _tone(freq: float, rate: int, seconds: float = 1.0) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (8000 * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def _peak_hz(pcm: np.ndarray, rate: int = 16000) -> float:
+    spectrum = np.abs(np.fft.rfft(pcm))
+    return np.argmax(spectrum) * rate / len(pcm)
+
+
+def test_g711_tables_match_reference_values():
+    assert MULAW_TABLE[0xFF] == 0
+    assert MULAW_TABLE[0x00] == -32124
+    assert MULAW_TABLE[0x80] == 32124
+    assert ALAW_TABLE[0xD5] == 8
+    assert ALAW_TABLE[0x55] == -8
+    assert ALAW_TABLE[0xAA] == 32256
+
+
+def test_native_format_passes_bytes_through():
+    data = _tone(440, 16000).tobytes()
+    assert InputDecoder(InputFormat()).feed(data) is data
+
+
+def test_stereo_48k_is_downmixed_and_resampled_independently_of_chunking():
+    mono = _tone(440, 48000)
+    stereo = np.stack([mono, mono], axis=1).tobytes()
+
+    whole = InputDecoder(InputFormat(sample_rate=48000, channels=2)).feed(stereo)
+    decoder = InputDecoder(InputFormat(sample_rate=48000, channels=2))
+    # 奇数长度的包会切断采样帧，解码器需要跨包保留
+    pieces = b"".join(decoder.feed(stereo[i:i + 1001]) for i in range(0, len(stereo), 1001))
+
+    assert pieces == whole
+    pcm = np.frombuffer(whole, dtype=np.int16)
+    assert len(pcm) == 16000
+    assert abs(_peak_hz(pcm) - 440) < 2
+
+
+def test_mulaw_8k_is_upsampled_to_16k():
+    # 0xFF 是 μ-law 的零值，构造一个 μ-law 方波
+    encoded = np.where(np.arange(8000) % 80 < 40, 0x9F, 0x1F).astype(np.uint8).tobytes()
+    pcm = np.frombuffer(InputDecoder(InputFormat(encoding="mulaw", sample_rate=8000)).feed(encoded), dtype=np.int16)
+    assert len(pcm) == 16000
+    assert abs(_peak_hz(pcm) - 100) < 2
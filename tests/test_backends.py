@@ -0,0 +1,114 @@
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.backends import (
+    StreamingAsrBackend, TimedLock, available_backends, create_backend, register_backend,
+)
+from helpers import STUB, make_speech, pcm_chunks
+
+
+def test_registry_lists_default_and_stub_backends():
+    for stage in ("vad", "asr", "speaker", "punc"):
+        assert {"funasr", "stub"} <= set(available_backends(stage))
+    with pytest.raises(ValueError):
+        create_backend("asr", "does-not-exist")
+
+
+def test_custom_backend_can_be_registered():
+    @register_backend("asr", "echo-test")
+    class EchoAsr(StreamingAsrBackend):
+        def decode(self, audio, cache, is_final=False, **kwargs):
+            return "回声"
+
+    assert create_backend("asr", "echo-test").decode(np.zeros(10, np.int16), {}) == "回声"
+
+
+def test_stub_vad_reports_speech_boundaries():
+    vad = create_backend("vad", "stub", hangover_ms=400)
+    cache = {}
+    audio = np.concatenate([np.zeros(3200, np.int16), make_speech(0.6), np.zeros(16000, np.int16)])
+    segments = [seg for chunk in pcm_chunks(audio) for seg in vad.detect(np.frombuffer(chunk, np.int16), cache)]
+    assert segments == [[200, -1], [-1, 1200]]
+
+
+def test_stub_backends_are_deterministic():
+    spk = create_backend("speaker", "stub")
+    asr = create_backend("asr", "stub")
+    audio = make_speech(1.0)
+    assert np.array_equal(spk.embed(audio), spk.embed(audio.copy()))
+    assert asr.decode(audio, {}) == asr.decode(audio, {})
+
+
+def test_realtime_assistant_runs_on_stub_backends():
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    assistant = RealtimeAssistant(backends=STUB)
+    audio = np.concatenate([make_speech(2.0), np.zeros(16000, np.int16), make_speech(1.5, 330), np.zeros(16000, np.int16)])
+
+    first = assistant.run_stream(pcm_chunks(audio))
+    second = RealtimeAssistant(models_from=assistant).run_stream(pcm_chunks(audio))
+
+    assert len(first) == 2
+    assert all(r["text"].endswith("。") for r in first)
+    assert [r["raw_text"] for r in first] == [r["raw_text"] for r in second]
+
+
+def test_run_stream_stops_at_the_next_chunk_boundary():
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    assistant = RealtimeAssistant(backends=STUB)
+    stop_event = threading.Event()
+    consumed = []
+
+    def _stream():
+        for i, chunk in enumerate(pcm_chunks(make_speech(3.0))):
+            consumed.append(i)
+            if i == 3:
+                stop_event.set()
+            yield chunk
+
+    assistant.run_stream(_stream(), stop_event=stop_event)
+    assert consumed == [0, 1, 2, 3]
+
+
+def test_model_lock_wait_is_not_counted_as_inference_time():
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    @register_backend("asr", "locked-test")
+    class LockedAsr(StreamingAsrBackend):
+        concurrency = 1
+
+        def __init__(self):
+            self.lock = TimedLock()
+
+        def decode(self, audio, cache, is_final=False, **kwargs):
+            with self.lock:
+                return "锁"
+
+    assistant = RealtimeAssistant(backends={**STUB, "asr": "locked-test"})
+    held, release = threading.Event(), threading.Event()
+
+    def _hold():
+        with assistant.asr_backend.lock:
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=_hold)
+    holder.start()
+    held.wait()
+    threading.Timer(0.3, release.set).start()
+    assert assistant._infer("asr", assistant.asr_backend.decode, np.zeros(10, np.int16), {}) == "锁"
+    holder.join()
+
+    assert assistant.lock_wait_seconds["asr"] >= 0.25
+    assert assistant.stage_seconds["asr"] < 0.1
+    assert assistant.stage_concurrency() == {"asr": 1}
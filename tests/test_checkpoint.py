@@ -0,0 +1,120 @@
+import io
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core import checkpoint
+from asr_service.asr_core.checkpoint import CheckpointError, CheckpointStore
+from helpers import STUB, make_speech, pcm_chunks
+
+
+def test_roundtrip_preserves_structure_and_arrays():
+    obj = {
+        "cache": {0: np.arange(6, dtype=np.float32).reshape(2, 3), (1, 2): "tuple key"},
+        "items": [1, 2.5, None, True, "文本", (3, 4)],
+        "scalar": np.int64(7),
+    }
+    restored = checkpoint.loads(checkpoint.dumps(obj))
+
+    assert restored["cache"][(1, 2)] == "tuple key"
+    np.testing.assert_array_equal(restored["cache"][0], obj["cache"][0])
+    assert restored["cache"][0].dtype == np.float32
+    assert restored["items"] == [1, 2.5, None, True, "文本", (3, 4)]
+    assert restored["scalar"] == 7
+
+
+def _raw_checkpoint(root) -> bytes:
+    buf = io.BytesIO()
+    meta = json.dumps({"version": checkpoint.CHECKPOINT_VERSION, "root": root}).encode("utf-8")
+    np.savez(buf, __meta__=np.frombuffer(meta, dtype=np.uint8))
+    return buf.getvalue()
+
+
+def test_rejects_unknown_types_and_corrupt_data():
+    class Opaque:
+        pass
+
+    with pytest.raises(CheckpointError):
+        checkpoint.dumps({"x": Opaque()})
+    with pytest.raises(CheckpointError):
+        checkpoint.validate(b"not a checkpoint")
+    # 只允许 CHECKPOINT_ALLOWED_CLASSES 中的类，伪造的检查点不能实例化任意类型
+    with pytest.raises(CheckpointError):
+        checkpoint.loads(_raw_checkpoint({"__obj__": "subprocess:Popen", "state": {"__dict__": []}}))
+
+
+def test_forged_class_paths_cannot_reach_callables(monkeypatch, tmp_path):
+    marker = tmp_path / "pwned"
+    forged = [
+        # 经属性链跳到被导入的模块上的函数
+        {"__enum__": "funasr.fake:os.system", "value": f"touch {marker}"},
+        {"__enum__": f"{checkpoint.__name__}:os.system", "value": f"touch {marker}"},
+        {"__obj__": f"{checkpoint.__name__}:importlib.import_module", "state": {"__dict__": []}},
+        # 白名单内但节点类型不符：普通类不能当枚举调用
+        {"__enum__": f"{checkpoint.__name__}:CheckpointStore", "value": str(tmp_path)},
+    ]
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_ALLOWED_CLASSES", frozenset(
+        [f"{checkpoint.__name__}:CheckpointStore"] + [node.get("__enum__") or node["__obj__"] for node in forged]
+    ))
+    for node in forged:
+        with pytest.raises(CheckpointError):
+            checkpoint.loads(_raw_checkpoint(node))
+    assert not marker.exists()
+
+
+def test_store_save_list_delete(tmp_path):
+    store = CheckpointStore(str(tmp_path / "ckpt"))
+    assert store.list() == []
+    with pytest.raises(KeyError):
+        store.load("s1")
+
+    store.save("s1", b"one")
+    store.save("s1", b"two")
+    assert store.load("s1") == b"two"
+    assert [e["session_id"] for e in store.list()] == ["s1"]
+    assert not [n for n in os.listdir(store.directory) if n.endswith(".tmp")]
+
+    with pytest.raises(ValueError):
+        store.path("../escape")
+    store.delete("s1")
+    store.delete("s1")
+    assert store.list() == []
+
+
+def test_resume_mid_sentence_matches_uninterrupted_run():
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    audio = np.concatenate([
+        make_speech(2.0), np.zeros(16000, np.int16), make_speech(3.0, 330), np.zeros(16000, np.int16),
+    ])
+    chunks = pcm_chunks(audio)
+
+    reference = RealtimeAssistant(backends=STUB)
+    saved = []
+    reference.checkpoint_sink = saved.append
+    reference.checkpoint_interval = 0
+    expected = reference.run_stream(iter(chunks))
+    assert len(saved) == len(chunks)
+
+    # 第二句中途（第 22 个音频块之后）中断，在新的实例中恢复
+    cut = 22
+    restored = RealtimeAssistant(backends=STUB, models_from=reference)
+    restored.resume_from(saved[cut - 1])
+    assert restored._resume_state.is_speaking
+    assert restored._resume_state.current_sentence_text or len(restored._resume_state.asr_buffer)
+
+    def _strip(results):
+        # 墙钟时间不同，音频流中的采样点区间应一致
+        wall_clock = ("timestamp", "speech_end_at", "asr_final_at", "punctuated_at")
+        return [{k: v for k, v in r.items() if k not in wall_clock} for r in results]
+
+    assert _strip(restored.run_stream(iter(chunks[cut:]))) == _strip(expected)
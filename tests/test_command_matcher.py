@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.command_matcher import CommandMatcher, build_command_matcher, command_match_dict
+
+
+DEFINITIONS = [
+    {"id": "start_session", "type": "start", "keywords": ["上课", "开始上课"], "roles": ["teacher"]},
+    {"id": "stop_session", "type": "stop", "keywords": ["下课"], "fuzzy_keywords": ["下客"], "roles": ["teacher"]},
+]
+
+
+def _naive_detect(text):
+    for source, field in (("exact", "keywords"), ("fuzzy", "fuzzy_keywords")):
+        for cmd in DEFINITIONS:
+            for kw in cmd.get(field, []):
+                if kw in text:
+                    return {"id": cmd["id"], "type": cmd["type"], "roles": cmd["roles"], "keyword": kw, "source": source}
+    return None
+
+
+def _detect(matcher, text):
+    match = matcher.best(text)
+    return command_match_dict(*match) if match else None
+
+
+def test_best_match_agrees_with_substring_search():
+    matcher = build_command_matcher(DEFINITIONS)
+    for text in ["同学们开始上课", "好了下课", "现在下客了", "上课前先下课", "今天天气不错", ""]:
+        assert _detect(matcher, text) == _naive_detect(text)
+
+
+def test_cursor_matches_across_delta_boundaries():
+    cursor = build_command_matcher(DEFINITIONS).cursor()
+    assert cursor.feed("好了，下") == []
+    matches = cursor.feed("课吧")
+    assert [kw for kw, _ in matches] == ["下课"]
+    assert matches[0][1][0]["id"] == "stop_session"
+
+    cursor.reset()
+    assert cursor.feed("课") == []
+
+
+def test_overlapping_keywords_are_all_reported():
+    matcher = CommandMatcher([("he", 1), ("she", 2), ("hers", 3), ("his", 4)])
+    _, matches = matcher.scan("ushers")
+    assert sorted(kw for _, _, kw, _ in matches) == ["he", "hers", "she"]
+
+
+def test_partial_hypothesis_that_does_not_extend_restarts_matching():
+    from asr_service.asr_core.config import COMMAND_KEYWORDS_STOP
+    from asr_service.asr_core.main import RealtimeAssistant, RecognitionState
+
+    keyword = COMMAND_KEYWORDS_STOP[0]
+    assistant = RealtimeAssistant(backends={"vad": "stub", "asr": "stub", "speaker": "stub", "punc": "stub"})
+    assistant.dialog_mode = True
+    state = RecognitionState(dialog_mode=True)
+    assistant._check_partial_command(state, "好的" + keyword[:-1])
+    # 新的部分结果改写了前文：不能与上一次残留的前缀拼成指令
+    assistant._check_partial_command(state, keyword[-1:] + "生们好", restart=True)
+    assert state.pending_stop_command is None
+
+    assistant._check_partial_command(state, "好的" + keyword, restart=True)
+    assert state.pending_stop_command["type"] == "stop"
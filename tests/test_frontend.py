@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.frontend import Fbank, FbankOptions, StreamingFbank, mel_banks, pcm_to_float
+from helpers import CHUNK, STUB
+
+
+def _pcm(seconds: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(16000 * seconds)) / 16000
+    tone = 4000 * np.sin(2 * np.pi * 440 * t)
+    return (tone + rng.normal(0, 800, len(t))).astype(np.int16)
+
+
+def test_mel_banks_and_tone_peak():
+    opts = FbankOptions()
+    banks = mel_banks(opts)
+    assert banks.shape == (80, 257)
+    assert not banks[:, -1].any() and (banks.max(axis=1) > 0).all()
+
+    t = np.arange(16000) / 16000
+    feats = Fbank(opts)(np.sin(2 * np.pi * 1000 * t).astype(np.float32))
+    assert feats.shape == (98, 80)
+    peak_bin = int(np.argmax(feats.mean(axis=0)))
+    mel_low, mel_high = 1127 * np.log(1 + 20 / 700), 1127 * np.log(1 + 8000 / 700)
+    center_mel = mel_low + (peak_bin + 1) * (mel_high - mel_low) / 81
+    assert abs(700 * (np.exp(center_mel / 1127) - 1) - 1000) < 100
+
+
+def test_fbank_matches_kaldi_fbank_used_by_campplus():
+    # FunASR 的 CAM++ 以 torchaudio.compliance.kaldi.fbank 计算特征；开启 SPEAKER_FBANK_FRONTEND 前须与之一致
+    torch = pytest.importorskip("torch")
+    kaldi = pytest.importorskip("torchaudio.compliance.kaldi")
+    from asr_service.asr_core.backends import FunAsrSpeakerEmbedding
+
+    opts = FunAsrSpeakerEmbedding.CAMPP_FBANK
+    waveform = pcm_to_float(_pcm(1.2))
+    expected = kaldi.fbank(torch.from_numpy(waveform)[None], num_mel_bins=opts.num_mel_bins).numpy()
+    np.testing.assert_allclose(Fbank(opts)(waveform), expected, rtol=1e-4, atol=1e-3)
+
+
+def test_streaming_frames_match_whole_segment_fbank():
+    pcm = _pcm(3.0)
+    stream = StreamingFbank(history_frames=200)
+    for i in range(0, len(pcm), CHUNK):
+        stream.accept(pcm[i:i + CHUNK])
+
+    fbank = Fbank()
+    for seconds in (0.6, 1.2):
+        n = int(16000 * seconds)
+        expected = fbank(pcm_to_float(pcm[-n:]))
+        np.testing.assert_allclose(stream.features(n), expected, rtol=1e-5, atol=1e-4)
+
+    assert stream.features(16000 * 3 - 80) is None  # 起点未与帧移对齐
+    assert stream.features(16000 * 3) is None  # 超出保留的帧数
+
+
+def test_speaker_identification_uses_session_features():
+    from asr_service.asr_core.backends import StubSpeakerEmbedding
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    class FeatureSpeaker(StubSpeakerEmbedding):
+        feature_options = FbankOptions()
+
+        def __init__(self):
+            super().__init__()
+            self.feature_calls = []
+            self.waveform_calls = 0
+
+        def embed(self, audio):
+            self.waveform_calls += 1
+            return super().embed(audio)
+
+        def embed_features(self, features, audio):
+            self.feature_calls.append(features)
+            return features.mean(axis=0) - features.mean()
+
+    assistant = RealtimeAssistant(backends=STUB)
+    speaker = FeatureSpeaker()
+    assistant.spk_backend = speaker
+    pcm = np.concatenate([np.zeros(16000, np.int16), _pcm(2.0), np.zeros(16000, np.int16)])
+    spk_audio = []
+    identify = assistant._identify_speaker
+
+    def capture(state):
+        if not state.is_speaker_identified and len(state.spk_buffer) >= 6 * CHUNK:
+            spk_audio.append(state.spk_buffer.view().copy())
+        identify(state)
+
+    assistant._identify_speaker = capture
+    assistant.run_stream(pcm[i:i + CHUNK].tobytes() for i in range(0, len(pcm), CHUNK))
+
+    assert speaker.waveform_calls == 0 and len(speaker.feature_calls) == 1
+    np.testing.assert_allclose(speaker.feature_calls[0], Fbank()(pcm_to_float(spk_audio[0])), rtol=1e-5, atol=1e-4)
+
+
+def test_backends_without_feature_input_embed_from_the_waveform():
+    from asr_service.asr_core.backends import create_backend
+
+    speaker = create_backend("speaker", "stub")
+    audio = _pcm(1.2)
+    np.testing.assert_array_equal(speaker.embed_features(Fbank()(pcm_to_float(audio)), audio), speaker.embed(audio))
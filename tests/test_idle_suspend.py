@@ -0,0 +1,112 @@
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from helpers import CHUNK, STUB, count_vad_calls, make_silence, make_speech, pcm_chunks
+
+
+def _texts(results):
+    return [(r["speaker"], r["text"]) for r in results]
+
+
+def _assistant(idle_suspend_seconds):
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    assistant = RealtimeAssistant(backends=STUB)
+    assistant.idle_suspend_seconds = idle_suspend_seconds
+    return count_vad_calls(assistant)
+
+
+def test_suspended_session_skips_vad_and_resumes_on_speech():
+    audio = np.concatenate([make_speech(2.0), make_silence(6.0), make_speech(1.6, 330), make_silence(1.0)])
+
+    reference = _assistant(None)
+    expected = reference.run_stream(iter(pcm_chunks(audio)))
+
+    assistant = _assistant(2.0)
+    seen = []
+
+    def stream():
+        for chunk in pcm_chunks(audio):
+            yield chunk
+            seen.append(assistant.memory_stats())
+
+    results = assistant.run_stream(stream())
+
+    assert _texts(results) == _texts(expected) and len(results) == 2
+    assert assistant.suspensions == 1 and assistant.wakeups == 1
+    assert assistant.vad_calls < reference.vad_calls - 15
+    # 每个会话的内存在活动与挂起状态下分别可见；挂起时流式缓存已释放
+    suspended = [m["vad_cache_bytes"] for m in seen if m["suspended"]]
+    active = [m["vad_cache_bytes"] for m in seen if not m["suspended"]]
+    assert suspended and max(suspended) < min(active)
+    assert assistant.idle_stats()["released_cache_bytes"] > 0
+
+
+def test_noise_wakes_briefly_then_resuspends():
+    noise = (np.random.default_rng(0).normal(0, 300, 16000)).astype(np.int16)
+    audio = np.concatenate([make_speech(1.0), make_silence(3.0), noise[:CHUNK], make_silence(4.0)])
+
+    assistant = _assistant(2.0)
+    assistant.run_stream(iter(pcm_chunks(audio)))
+
+    # 噪声唤醒后 VAD 未检测到语音，IDLE_WAKE_GRACE_SECONDS 后重新挂起
+    assert assistant.wakeups == 1
+    assert assistant.suspensions == 2
+    assert assistant.suspended
+
+
+def test_timeout_counts_silence_not_chunks():
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    assistant = RealtimeAssistant(backends=STUB)
+    consumed = []
+
+    def stream():
+        for chunk in pcm_chunks(np.concatenate([make_speech(1.0), make_silence(20.0)])):
+            consumed.append(chunk)
+            time.sleep(0.01)
+            yield chunk
+
+    results = assistant.run_stream(stream(), timeout=0.3)
+
+    assert len(results) == 1
+    assert len(consumed) < 60
+
+
+def test_results_carry_stream_offsets_and_latency_timestamps():
+    audio = np.concatenate([make_speech(2.0), make_silence(6.0), make_speech(1.6, 330), make_silence(1.0)])
+
+    expected = _assistant(None).run_stream(iter(pcm_chunks(audio)))
+    results = _assistant(2.0).run_stream(iter(pcm_chunks(audio)))
+
+    # 采样点区间按会话音频流计算：挂起时重置的 VAD 缓存不影响；终点含 VAD 的 400ms 拖尾
+    spans = [(r["start_sample"], r["end_sample"]) for r in results]
+    assert spans == [(0, 38400), (128000, 160000)]
+    assert spans == [(r["start_sample"], r["end_sample"]) for r in expected]
+    for r in results:
+        assert r["speech_end_at"] <= r["asr_final_at"] <= r["punctuated_at"]
+
+
+def test_cache_size_survives_concurrent_mutation():
+    from asr_service.asr_core.utils import approx_nbytes
+
+    class Mutating(dict):
+        # 模拟会话线程在统计期间改写缓存：第一次遍历时抛出与并发修改相同的错误
+        calls = 0
+
+        def items(self):
+            Mutating.calls += 1
+            if Mutating.calls == 1:
+                raise RuntimeError("dictionary changed size during iteration")
+            return super().items()
+
+    cache = Mutating(feats=np.zeros(100, np.float32))
+    assert approx_nbytes({"cache": cache}) >= 400
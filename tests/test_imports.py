@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+
+# 导入服务包（配置与 HTTP 应用）时不应加载的模块
+HEAVY_MODULES = ("pyaudio", "torch", "funasr", "scipy", "modelscope", "httpx")
+# 本仓库自身模块的导入耗时预算（不含 fastapi/numpy 等第三方库），秒
+OWN_IMPORT_BUDGET_SECONDS = 0.5
+
+_PROBE = """
+import json, sys, threading
+import {module}
+print(json.dumps({{
+    "heavy": sorted(m for m in sys.modules if m.split(".")[0] in {heavy!r}),
+    "threads": [t.name for t in threading.enumerate() if t is not threading.main_thread()],
+}}))
+"""
+
+
+def _import_in_fresh_interpreter(module: str) -> tuple:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=SRC, capture_output=True, text=True, timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    # -X importtime 的每行：import time: self [us] | cumulative | imported package
+    own_us = 0
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[2].strip().startswith("asr_service"):
+            own_us += int(parts[0].split(":")[1])
+    return json.loads(proc.stdout.splitlines()[-1]), own_us / 1e6
+
+
+def test_importing_the_http_app_is_cheap_and_side_effect_free():
+    report, own_seconds = _import_in_fresh_interpreter("asr_service.main")
+    assert report["heavy"] == []
+    assert report["threads"] == []  # 不加载模型、不启动 webhook 发送线程
+    assert own_seconds < OWN_IMPORT_BUDGET_SECONDS
+
+
+def test_importing_config_pulls_in_nothing_heavy():
+    report, _ = _import_in_fresh_interpreter("asr_service.asr_core.config")
+    assert report["heavy"] == [] and report["threads"] == []
@@ -0,0 +1,98 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.load_shedding import LoadShedder
+from helpers import STUB, count_vad_calls, make_speech, pcm_chunks
+
+
+def _conversation(sentences: int) -> np.ndarray:
+    parts = []
+    for i in range(sentences):
+        parts += [make_speech(1.0, 220 + 40 * i), np.zeros(int(16000 * 1.3), np.int16)]
+    return np.concatenate(parts)
+
+
+def _assistant(monkeypatch, slow_vad_calls=0, **shedder_options):
+    from asr_service.asr_core import main
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    monkeypatch.setattr(main, "LoadShedder", lambda: LoadShedder(**shedder_options))
+    assistant = RealtimeAssistant(backends=STUB)
+    assistant.idle_suspend_seconds = None
+    # 每 200ms 音频耗时 350ms：处理逐块落后
+    return count_vad_calls(assistant, slow_calls=slow_vad_calls, delay=0.35)
+
+
+def test_lag_follows_audio_clock_and_levels_have_hysteresis():
+    shedder = LoadShedder(thresholds=(1.0, 2.0, 4.0, 6.0), recover_ratio=0.5, hold_seconds=2.0)
+    # 实时到达、及时处理：没有滞后
+    for k in range(1, 11):
+        shedder.arrived(0.2 * k, 100 + 0.2 * k, waited=0.19)
+        assert shedder.processed(0.2 * k, now=100 + 0.2 * k + 0.05) is None
+    assert shedder.lag < 0.1
+
+    # 发送端暂停 30 秒后继续：读取时阻塞过，重新对齐，不算滞后
+    shedder.arrived(2.2, 132.2, waited=30.0)
+    assert shedder.processed(2.2, now=132.25) is None
+
+    # 处理变慢：积压的块立即可读，滞后按音频时钟累积，直接升到对应级别
+    event = shedder.processed(2.4, now=134.7)
+    assert event["from"] == "normal" and event["to"] == "reuse_speaker" and shedder.lag >= 2.0
+    shedder.processed(2.6, now=139.0)
+    assert shedder.stage == "batch_catchup" and shedder.escalations == 2
+
+    # 追上后逐级撤销，每级至少保持 hold_seconds
+    assert shedder.processed(10.0, now=142.0)["to"] == "large_asr_chunks"
+    assert shedder.processed(12.2, now=142.3) is None
+    assert shedder.processed(13.0, now=144.0)["to"] == "reuse_speaker"
+    assert shedder.processed(15.5, now=146.0)["to"] == "defer_punctuation"
+    assert shedder.processed(17.6, now=148.0)["to"] == "normal"
+    stats = shedder.stats()
+    assert stats["level"] == 0 and stats["max_lag_seconds"] >= 4.0 and len(stats["events"]) == 6
+
+
+def test_batch_catchup_keeps_sentences(monkeypatch):
+    audio = _conversation(4)
+    reference = _assistant(monkeypatch, thresholds=(1e9,) * 4)
+    expected = reference.run_stream(iter(pcm_chunks(audio)))
+
+    # 阈值为 0：第一块之后一直处于第 4 级，积压按批处理
+    assistant = _assistant(monkeypatch, thresholds=(0.0,) * 4)
+    results = assistant.run_stream(iter(pcm_chunks(audio)))
+
+    assert len(results) == len(expected) == 4
+    # 批内按 VAD 边界切分，句子在音频流中的位置与逐块处理一致
+    assert [(r["start_sample"], r["end_sample"]) for r in results] == [
+        (r["start_sample"], r["end_sample"]) for r in expected
+    ]
+    assert assistant.vad_calls * 5 < reference.vad_calls
+    assert all(r["speaker_reused"] for r in results)
+    # 推迟的标点在会话结束前补上
+    assert all(r["text"].endswith("。") and "punctuation_deferred" not in r for r in results)
+    assert assistant.shedding_stats()["stage"] == "batch_catchup"
+    assert assistant.state.asr_chunk_size == [0, 20, 10]
+
+
+def test_sheds_under_lag_and_recovers(monkeypatch):
+    audio = _conversation(6)
+    assistant = _assistant(
+        monkeypatch, slow_vad_calls=8, thresholds=(0.2, 0.4, 0.6, 0.8), hold_seconds=0.0,
+    )
+    results = assistant.run_stream(iter(pcm_chunks(audio)))
+
+    stats = assistant.shedding_stats()
+    stages = [e["to"] for e in stats["events"]]
+    assert "batch_catchup" in stages and stages[-1] == "normal"
+    assert stats["level"] == 0 and stats["max_lag_seconds"] >= 0.8 and stats["deferred_punctuation"] == 0
+    assert len(results) == 6
+    assert any(r.get("speaker_reused") for r in results)
+    assert not all(r.get("speaker_reused") for r in results)
+    assert all("punctuation_deferred" not in r for r in results)
+    assert assistant.state.asr_chunk_size == [0, 10, 5]
@@ -0,0 +1,171 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.local_ingest import SHM_SUPPORTED, LocalAudioProducer, LocalIngest
+from asr_service.udp_ingest import StopEvent
+from helpers import STUB, make_speech
+
+
+@pytest.fixture
+def sock_dir():
+    # Unix socket 路径长度有限（108 字节），不用 pytest 的 tmp_path
+    path = tempfile.mkdtemp(prefix="asr")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _drain(ingest: LocalIngest, expected_bytes: int, timeout: float = 5.0) -> list:
+    items = []
+    deadline = time.monotonic() + timeout
+    while sum(len(d) for d, _ in items) < expected_bytes and time.monotonic() < deadline:
+        items.extend(ingest.next_batch(timeout=0.1) or [])
+    return [data for data, _ in items]
+
+
+def _connect(ingest: LocalIngest) -> LocalAudioProducer:
+    """在另一个线程中连接：握手要等会话线程（这里是测试本身）在 next_batch 中接受连接"""
+    result = {}
+
+    def _run():
+        try:
+            result["producer"] = LocalAudioProducer(ingest.path)
+        except OSError as e:
+            result["error"] = e
+    t = threading.Thread(target=_run)
+    t.start()
+    while t.is_alive():
+        ingest.next_batch(timeout=0.05)
+    if "error" in result:
+        raise result["error"]
+    return result["producer"]
+
+
+def test_seqpacket_keeps_message_boundaries_and_accepts_a_new_producer(sock_dir):
+    ingest = LocalIngest(os.path.join(sock_dir, "s.sock"), transport="unix")
+    try:
+        producer = _connect(ingest)
+        assert producer.transport == "unix"
+        with pytest.raises(ConnectionRefusedError):
+            _connect(ingest)  # 同时只接受一个生产者
+        messages = [bytes([i]) * (100 + i) for i in range(50)]
+        for m in messages:
+            producer.send(m)
+        assert _drain(ingest, sum(map(len, messages))) == messages
+
+        # 采集进程重启：断开后可以重新连接
+        producer.close()
+        assert ingest.next_batch(timeout=0.2) == []
+        restarted = _connect(ingest)
+        restarted.send(b"again")
+        assert _drain(ingest, 5) == [b"again"]
+        restarted.close()
+        stats = ingest.stats()
+        assert stats["connections"] == 2 and stats["rejected"] == 1 and stats["messages"] == 51
+    finally:
+        ingest.close()
+    assert not os.path.exists(ingest.path)
+
+
+@pytest.mark.skipif(not SHM_SUPPORTED, reason="需要 memfd/eventfd")
+def test_shared_memory_ring_applies_backpressure_without_loss(sock_dir):
+    stop = StopEvent()
+    ingest = LocalIngest(os.path.join(sock_dir, "s.sock"), transport="shm", ring_bytes=4096, stop_event=stop)
+    payload = np.random.default_rng(0).integers(0, 256, 200_000, dtype=np.uint8).tobytes()
+    try:
+        producer = _connect(ingest)
+        assert producer.transport == "shm"
+
+        def _produce():
+            # 远大于环形缓冲：生产者在环满时等待读出，而不是丢弃
+            for i in range(0, len(payload), 3000):
+                producer.send(payload[i:i + 3000], timeout=5.0)
+
+        writer = threading.Thread(target=_produce)
+        writer.start()
+        received = b"".join(_drain(ingest, len(payload)))
+        writer.join(timeout=5.0)
+        assert received == payload
+
+        stop.set()
+        assert ingest.next_batch(timeout=5.0) is None  # stop_event 立即唤醒
+        producer.close()
+    finally:
+        ingest.close()
+        stop.close()
+
+
+def test_local_session_recognizes_audio_from_a_colocated_producer(monkeypatch, sock_dir):
+    from asr_service.asr_core import config
+
+    for stage, name in STUB.items():
+        monkeypatch.setitem(config.INFERENCE_BACKENDS, stage, name)
+    from asr_service import asr_engine
+    from asr_service.asr_core.main import RealtimeAssistant
+    from asr_service.speaker_audio import SpeakerAudio
+
+    monkeypatch.setattr(asr_engine, "_GLOBAL_SPEAKER_AUDIO", SpeakerAudio(RealtimeAssistant(backends=STUB)))
+    monkeypatch.setattr(asr_engine, "LOCAL_INGEST_DIR", sock_dir)
+    manager = asr_engine.AsrSessionManager()
+    speech = make_speech(1.0)
+    audio = np.concatenate([speech, np.zeros(16000, np.int16), speech, np.zeros(16000, np.int16)]).tobytes()
+    try:
+        with pytest.raises(ValueError):
+            manager.start(transport="unix", framing="framed")
+        session_id = manager.start(transport="unix")
+        session = manager.get(session_id)
+        assert session.local.path == os.path.join(os.path.realpath(sock_dir), f"{session_id}.sock")
+
+        producer = LocalAudioProducer(session.local.path)
+        # 不按 200ms 对齐的消息：服务端自行拼接
+        for i in range(0, len(audio), 1000):
+            producer.send(audio[i:i + 1000])
+        deadline = time.monotonic() + 10
+        while len(session.current_results()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        producer.close()
+
+        manager.stop(session_id)
+        final = manager.wait(session_id, timeout=10)
+        summary = session.summary()
+    finally:
+        manager.close()
+
+    assert len(final) == 2
+    assert summary["transport"] == "unix" and summary["local"]["bytes"] == len(audio)
+    assert manager.ingest_stats()["sessions"] == 0 and not os.path.exists(session.local.path)
+
+
+def test_session_ids_cannot_unlink_sockets_outside_the_ingest_dir(monkeypatch, sock_dir):
+    from asr_service import asr_engine
+
+    ingest_dir = os.path.join(sock_dir, "ingest")
+    victim = LocalIngest(os.path.join(sock_dir, "victim.sock"))
+    monkeypatch.setattr(asr_engine, "LOCAL_INGEST_DIR", ingest_dir)
+    manager = asr_engine.AsrSessionManager()
+    try:
+        for session_id in ("../victim", "a/b", ".."):
+            with pytest.raises(ValueError):
+                manager.start(transport="unix", session_id=session_id)
+        # 目录内的同名普通文件不是遗留的 socket，不删除
+        os.makedirs(ingest_dir)
+        Path(ingest_dir, "regular.sock").write_bytes(b"keep")
+        with pytest.raises(ValueError):
+            LocalIngest(os.path.join(ingest_dir, "regular.sock"))
+        assert Path(ingest_dir, "regular.sock").read_bytes() == b"keep"
+    finally:
+        manager.close()
+    assert os.path.exists(victim.path)
+    victim.close()
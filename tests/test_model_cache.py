@@ -0,0 +1,79 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.model_cache import cache_path, mmap_weights, weights_fingerprint
+from helpers import STUB
+
+
+def test_weights_point_into_the_mapped_cache_file(tmp_path):
+    torch = pytest.importorskip("torch")
+    model = torch.nn.Sequential(torch.nn.Linear(64, 32), torch.nn.Linear(32, 4))
+    x = torch.randn(3, 64)
+    expected = model(x)
+    path = cache_path("asr", {"model": "tiny", "model_revision": "v1"}, str(tmp_path))
+    assert path != cache_path("asr", {"model": "tiny", "model_revision": "v2"}, str(tmp_path))
+
+    mapped = mmap_weights(model, path)
+    assert mapped == sum(p.numel() * 4 for p in model.parameters())
+    assert torch.allclose(model(x), expected)
+
+    # 第二个进程（这里是同结构的新模型）直接映射已有的缓存，得到同样的权重
+    other = torch.nn.Sequential(torch.nn.Linear(64, 32), torch.nn.Linear(32, 4))
+    mmap_weights(other, path)
+    assert torch.allclose(other(x), expected)
+
+    # 结构不符的缓存被重新生成，而不是加载失败
+    changed = torch.nn.Sequential(torch.nn.Linear(64, 16), torch.nn.Linear(16, 4))
+    reference = changed(x)
+    mmap_weights(changed, path)
+    assert torch.allclose(changed(x), reference)
+
+
+def test_replaced_source_weights_get_a_new_cache_file(tmp_path):
+    spec = {"model": "tiny", "model_revision": "v1"}
+    checkpoint = tmp_path / "model.pt"
+    checkpoint.write_bytes(b"old weights")
+    before = cache_path("asr", spec, str(tmp_path), weights_fingerprint(str(checkpoint)))
+    assert before == cache_path("asr", spec, str(tmp_path), weights_fingerprint(str(checkpoint)))
+
+    # 同名同版本的权重被原地替换
+    checkpoint.write_bytes(b"new weights!")
+    os.utime(checkpoint, ns=(1, 1))
+    assert cache_path("asr", spec, str(tmp_path), weights_fingerprint(str(checkpoint))) != before
+    assert weights_fingerprint(str(tmp_path / "missing.pt")) is None
+
+
+def test_fingerprint_falls_back_to_parameter_contents():
+    torch = pytest.importorskip("torch")
+    model = torch.nn.Linear(4, 2)
+    fingerprint = weights_fingerprint(None, model)
+    assert fingerprint == weights_fingerprint(None, model)
+    with torch.no_grad():
+        model.weight.add_(1.0)
+    assert weights_fingerprint(None, model) != fingerprint
+
+
+def test_model_loading_is_reported_per_stage():
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    stats = RealtimeAssistant(backends=STUB).model_stats()
+    assert set(stats["stages"]) == set(STUB)
+    assert all(s["backend"] == "stub" and s["load_seconds"] >= 0 for s in stats["stages"].values())
+    assert stats["mapped_bytes"] == 0  # 桩后端没有权重
+
+
+@pytest.mark.skipif(not Path("/proc/self/smaps_rollup").exists(), reason="需要 /proc/<pid>/smaps_rollup")
+def test_process_memory_splits_shared_and_private_pages():
+    from asr_service.profiling import process_memory
+
+    memory = process_memory()
+    assert memory["rss"] > 0 and 0 < memory["pss"] <= memory["rss"]
+    assert memory["private"] + memory["shared"] == memory["rss"]
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.pcm_buffer import PcmBuffer, PcmRing
+
+
+def _ramp(start: int, n: int) -> np.ndarray:
+    return np.arange(start, start + n, dtype=np.int16)
+
+
+def test_buffer_consumes_from_the_front_without_reallocating():
+    buf = PcmBuffer(100)
+    storage = buf.view(0).base
+    buf.extend(_ramp(0, 60))
+    buf.extend(_ramp(60, 30))
+    assert np.array_equal(buf.view(50), _ramp(0, 50))
+    buf.consume(50)
+    assert np.array_equal(buf.view(), _ramp(50, 40))
+    assert buf.view(0).base is storage
+
+    buf.extend(_ramp(90, 150))  # 超出容量时扩容，内容保持连续
+    assert buf.capacity >= 190
+    assert np.array_equal(buf.view(), _ramp(50, 190))
+    buf.clear()
+    assert len(buf) == 0
+
+
+@pytest.mark.parametrize("chunk", [7, 32, 50, 130])
+def test_ring_keeps_the_most_recent_samples_in_order(chunk):
+    ring = PcmRing(96)
+    written = np.zeros(0, dtype=np.int16)
+    for i in range(10):
+        samples = _ramp(i * chunk, chunk)
+        ring.append(samples)
+        written = np.concatenate([written, samples])
+        assert np.array_equal(np.concatenate(ring.segments()), written[-96:])
+
+    asr, spk = PcmBuffer(16), PcmBuffer(16)
+    ring.copy_into(asr, spk)
+    assert np.array_equal(asr.view(), written[-96:])
+    assert np.array_equal(spk.view(), written[-96:])
+
+
+def test_recognition_state_uses_slots():
+    from asr_service.asr_core.main import RecognitionState
+
+    state = RecognitionState()
+    assert not hasattr(state, "__dict__")
+    with pytest.raises(AttributeError):
+        state.unexpected = 1
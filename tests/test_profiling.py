@@ -0,0 +1,57 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.profiling import MemoryProfiler, SamplingProfiler
+
+
+def _spin_in_decode(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_collapses_recognition_thread_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_spin_in_decode, args=(stop,), name="asr-session-test")
+    other = threading.Thread(target=stop.wait, name="unrelated")
+    worker.start()
+    other.start()
+    profiler = SamplingProfiler(interval=0.002)
+    try:
+        profiler.start()
+        time.sleep(0.2)
+        collapsed = profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+        other.join()
+
+    lines = collapsed.splitlines()
+    assert profiler.samples > 10
+    assert lines and all(line.startswith("asr-session-test;") for line in lines)
+    assert any("_spin_in_decode (test_profiling.py:" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+
+
+def test_memory_diff_points_at_the_growing_allocation():
+    profiler = MemoryProfiler()
+    profiler.start()
+    try:
+        base = profiler.snapshot()
+        growing = [bytearray(1024) for _ in range(2000)]
+        target = profiler.snapshot()
+        diff = profiler.diff(base, target, limit=5)
+    finally:
+        profiler.stop()
+
+    assert len(growing) == 2000
+    assert diff[0]["size_diff"] >= 2000 * 1024
+    assert any("test_profiling.py" in where for where in diff[0]["where"])
+    assert not profiler.tracing
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.router import RouterError, SessionRouter, WorkerNode, create_router_app, parse_nodes
+from helpers import free_port, make_speech
+
+
+def _start_worker(http_port: int, udp_port: int) -> subprocess.Popen:
+    """以独立进程运行的 ASR 节点（桩推理后端），代替不同主机上的节点"""
+    env = {
+        **os.environ,
+        "ASR_INFERENCE_BACKEND": "stub",
+        "ASR_UDP_ADDRESS": f"127.0.0.1:{udp_port}",
+        "ASR_MAX_SESSIONS": "1",
+        "ASR_CPU_BUDGET": "4",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.asr_service.main:app", "--port", str(http_port), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"ASR worker exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/asr/status", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise TimeoutError(url)
+
+
+@pytest.fixture
+def workers():
+    procs, urls = [], []
+    try:
+        for _ in range(2):
+            http_port = free_port(socket.SOCK_STREAM)
+            proc = _start_worker(http_port, free_port())
+            procs.append(proc)
+            urls.append(f"http://127.0.0.1:{http_port}")
+        for url, proc in zip(urls, procs):
+            _wait_ready(url, proc)
+        yield urls, procs
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+
+def test_parse_nodes_and_target_address():
+    a, b = parse_nodes("http://10.0.0.2:8014/, http://asr-3:8014=10.0.0.3:6000")
+    assert (a.url, a.udp_address) == ("http://10.0.0.2:8014", None)
+    assert b.target_udp_address() == "10.0.0.3:6000"
+
+    # 节点监听组播或通配地址时，告知机器人节点自身的主机名
+    a.ingest_address = "239.168.123.161:5555"
+    assert a.target_udp_address() == "10.0.0.2:5555"
+    a.ingest_address = "0.0.0.0:5555"
+    assert a.target_udp_address() == "10.0.0.2:5555"
+
+
+def test_health_checks_reconcile_sessions_that_ended_on_the_node():
+    node_sessions = {}  # 节点上的会话 ID -> 是否仍在监听
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/asr/start":
+            session_id = json.loads(request.content)["session_id"]
+            node_sessions[session_id] = True
+            return httpx.Response(200, json={"session_id": session_id})
+        sessions = [{"session_id": sid, "listening": listening} for sid, listening in node_sessions.items()]
+        return httpx.Response(200, json={"sessions": sessions, "load": {"accepting": True}, "ingest": {}})
+
+    async def scenario():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        router = SessionRouter([WorkerNode("http://node")], client=client)
+        node = router.nodes[0]
+        await router.check_all()
+        await router.start({"session_id": "s1"})
+        with pytest.raises(RouterError):
+            await router.start({"session_id": "s1"})
+
+        # 会话由对话内的停止口令结束，未经路由器的 /asr/stop
+        node_sessions["s1"] = False
+        await router.check_all()
+        assert node.sessions == 0
+        assert router.node_for("s1") is node  # 仍可经路由器取结果
+        with pytest.raises(RouterError, match="not active"):
+            await router.stop({})
+
+        # 节点上已清理该会话：解除固定，同一 ID 可以重新开始
+        del node_sessions["s1"]
+        await router.check_all()
+        with pytest.raises(RouterError, match="not found"):
+            router.node_for("s1")
+        await router.start({"session_id": "s1"})
+        assert node.sessions == 1
+        await router.close()
+
+    asyncio.run(scenario())
+
+
+def test_sessions_spread_by_load_and_pin_to_their_node(workers):
+    urls, procs = workers
+    router = SessionRouter([WorkerNode(url) for url in urls], health_interval=0.2, max_failures=2)
+    with TestClient(create_router_app(router)) as client:
+        first = client.post("/asr/start", json={}).json()
+        second = client.post("/asr/start", json={}).json()
+        assert {first["node"], second["node"]} == set(urls)
+
+        # 两个节点都已满（ASR_MAX_SESSIONS=1）
+        full = client.post("/asr/start", json={})
+        assert full.status_code == 429 and "Retry-After" in full.headers
+
+        host, port = first["udp_address"].split(":")
+        audio = np.concatenate([make_speech(2.0), np.zeros(16000, np.int16)]).tobytes()
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            for i in range(0, len(audio), 3200):
+                sender.sendto(audio[i:i + 3200], (host, int(port)))
+                time.sleep(0.002)
+        time.sleep(0.5)
+
+        stopped = client.post("/asr/stop", json={"session_id": first["session_id"], "wait": 10}).json()
+        assert stopped["final"] and stopped["text"]
+        result = client.get(f"/asr/sessions/{first['session_id']}/result")
+        assert result.status_code == 200 and result.json()["text"] == stopped["text"]
+
+        status = client.get("/asr/status").json()
+        assert {s["session_id"]: s["node"] for s in status["sessions"] if s["listening"]} == {
+            second["session_id"]: second["node"],
+        }
+
+        # 第二个节点下线后，新会话只分配给仍健康的节点
+        procs[urls.index(second["node"])].terminate()
+        deadline = time.monotonic() + 10
+        while any(n["healthy"] for n in client.get("/router/nodes").json()["nodes"] if n["url"] == second["node"]):
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+        assert client.post("/asr/start", json={}).json()["node"] == first["node"]
+        # 下线节点上的会话解除固定，不再占用 ID 与会话计数
+        assert client.get(f"/asr/sessions/{second['session_id']}/result").status_code == 404
+        assert next(n for n in router.nodes if n.url == second["node"]).sessions == 0
@@ -0,0 +1,237 @@
+import socket
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from helpers import STUB, free_port, make_speech
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """使用桩推理后端的 asr_engine；标点阶段模拟 300ms 的推理耗时"""
+    from asr_service.asr_core import config
+
+    for stage, name in STUB.items():
+        monkeypatch.setitem(config.INFERENCE_BACKENDS, stage, name)
+    from asr_service import asr_engine
+    from asr_service.asr_core.backends import create_backend
+    from asr_service.asr_core.main import RealtimeAssistant
+    from asr_service.speaker_audio import SpeakerAudio
+
+    assistant = RealtimeAssistant(backends=STUB)
+    assistant.punc_backend = create_backend("punc", "stub", cpu_ms=300)
+    monkeypatch.setattr(asr_engine, "_GLOBAL_SPEAKER_AUDIO", SpeakerAudio(assistant))
+    return asr_engine
+
+
+def test_stop_returns_before_finalization_completes(engine, tmp_path):
+    from asr_service.webhooks import WebhookDispatcher
+
+    class RecordingDispatcher(WebhookDispatcher):
+        def submit(self, session_id, index, result, urls=None):
+            self.submitted.append((session_id, index, result["text"]))
+
+    webhooks = RecordingDispatcher(["http://127.0.0.1:9/hook"], queue_dir=str(tmp_path))
+    webhooks.submitted = []
+    port = free_port()
+    manager = engine.AsrSessionManager(udp_address=f"127.0.0.1:{port}", webhooks=webhooks)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        session_id = manager.start()
+        session = manager.get(session_id)
+        audio = np.concatenate([make_speech(2.0), np.zeros(16000, np.int16), make_speech(1.5, 330)]).tobytes()
+        for i in range(0, len(audio), 3200):
+            sender.sendto(audio[i:i + 3200], ("127.0.0.1", port))
+            time.sleep(0.001)
+
+        deadline = time.monotonic() + 10
+        while not session.current_results() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.5)
+
+        t0 = time.perf_counter()
+        stopped = manager.stop(session_id)
+        elapsed = time.perf_counter() - t0
+
+        assert elapsed < 0.1
+        assert stopped is session and not session.final
+        assert session.state == "finalizing" and not manager.status(session_id)
+        assert len(session.current_results()) == 1
+
+        final = manager.wait(session_id, timeout=10)
+        assert len(final) == 2
+        assert session.state == "finished"
+        assert manager.get(session_id).current_results() == final
+        # 收尾时定稿的最后一句同样推送给 webhook
+        assert webhooks.submitted == [(session_id, i, r["text"]) for i, r in enumerate(final)]
+    finally:
+        sender.close()
+        manager.close()
+
+
+def test_start_is_rejected_once_the_session_limit_is_reached(engine):
+    from asr_service.admission import AdmissionController, AdmissionRejected
+
+    manager = engine.AsrSessionManager(
+        udp_address=f"127.0.0.1:{free_port()}",
+        admission=AdmissionController(max_sessions=1, cpu_budget=4.0),
+    )
+    try:
+        first = manager.start()
+        with pytest.raises(AdmissionRejected):
+            manager.start()
+        assert manager.load_stats()["accepting"] is False
+
+        manager.wait(manager.stop(first).session_id, timeout=5)
+        assert manager.load_stats()["sessions"] == 0
+        manager.stop(manager.start())
+    finally:
+        manager.close()
+
+
+def test_checkpointed_session_resumes_with_earlier_results(engine, tmp_path):
+    port = free_port()
+    manager = engine.AsrSessionManager(udp_address=f"127.0.0.1:{port}", checkpoint_dir=str(tmp_path))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        with pytest.raises(ValueError):
+            manager.start(session_id="missing", resume=True)
+
+        session_id = manager.start(session_id="lesson", checkpoint=True)
+        session = manager.get(session_id)
+        session.audio.assistant.checkpoint_interval = 0
+        audio = np.concatenate([make_speech(2.0), np.zeros(16000, np.int16)]).tobytes()
+        for i in range(0, len(audio), 3200):
+            sender.sendto(audio[i:i + 3200], ("127.0.0.1", port))
+            time.sleep(0.001)
+
+        deadline = time.monotonic() + 10
+        while not session.current_results() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        # 模拟进程重启：保留运行中写入的检查点，原会话结束后检查点被删除
+        saved = manager.checkpoints.load(session_id)
+        manager.wait(manager.stop(session_id).session_id, timeout=10)
+        assert manager.checkpoints.list() == []
+
+        manager.checkpoints.save(session_id, saved)
+        resumed = manager.get(manager.start(session_id=session_id, resume=True))
+        assert resumed.resumed and len(resumed.current_results()) == 1
+        tail = np.concatenate([make_speech(1.5, 330), np.zeros(16000, np.int16)]).tobytes()
+        for i in range(0, len(tail), 3200):
+            sender.sendto(tail[i:i + 3200], ("127.0.0.1", port))
+            time.sleep(0.001)
+        time.sleep(0.5)
+
+        final = manager.wait(manager.stop(session_id).session_id, timeout=10)
+        assert len(final) == 2
+        assert manager.checkpoints.list() == []
+    finally:
+        sender.close()
+        manager.close()
+
+
+def test_sessions_on_the_same_source_share_one_pipeline(engine):
+    from asr_service.admission import AdmissionController
+
+    port = free_port()
+    manager = engine.AsrSessionManager(
+        udp_address=f"127.0.0.1:{port}",
+        admission=AdmissionController(max_sessions=1, cpu_budget=4.0),
+    )
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.bind(("127.0.0.1", 0))
+
+    def _send(audio):
+        for i in range(0, len(audio), 3200):
+            sender.sendto(audio[i:i + 3200], ("127.0.0.1", port))
+            time.sleep(0.001)
+
+    def _wait_results(session, count):
+        deadline = time.monotonic() + 10
+        while len(session.current_results()) < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    try:
+        recorder = manager.get(manager.start(source="127.0.0.1"))
+        _send(np.concatenate([make_speech(1.0), np.zeros(16000, np.int16)]).tobytes())
+        _wait_results(recorder, 1)
+
+        # 同一来源的第二个会话只是订阅者：不占准入额度，只看到订阅之后的句子
+        dashboard = manager.get(manager.start(source="127.0.0.1"))
+        assert dashboard.pipeline is recorder.pipeline
+        assert manager.load_stats()["sessions"] == 1 and len(manager.memory_stats()) == 1
+        with pytest.raises(ValueError):
+            manager.start(source="127.0.0.1", framing="framed")
+        _send(np.concatenate([make_speech(1.0, 330), np.zeros(16000, np.int16)]).tobytes())
+        _wait_results(recorder, 2)
+        _wait_results(dashboard, 1)
+
+        # 先停止的订阅者立即结束，流水线继续为其它订阅者运行
+        manager.stop(recorder.session_id)
+        assert manager.wait(recorder.session_id, timeout=1) == recorder.pipeline.current_results()[:2]
+        assert dashboard.listening and recorder.pipeline.listening
+        summary = {s["session_id"]: s for s in manager.sessions()}[dashboard.session_id]
+        assert summary["pipeline"] == recorder.session_id and summary["subscribers"] == 1
+
+        # 流水线仍按第一个订阅者的 ID 运行（接收注册、检查点与抓取文件），该 ID 在此期间不能复用
+        for source in ("127.0.0.1", "10.0.0.9"):
+            with pytest.raises(RuntimeError):
+                manager.start(source=source, session_id=recorder.session_id)
+        assert manager.get(recorder.session_id) is recorder
+
+        manager.stop(dashboard.session_id)
+        final = manager.wait(dashboard.session_id, timeout=10)
+        assert [r["text"] for r in final] == [recorder.current_results()[1]["text"]]
+        assert recorder.pipeline.state == "finished"
+        # 流水线结束后该 ID 可以重新使用
+        assert manager.start(source="10.0.0.9", session_id=recorder.session_id) == recorder.session_id
+    finally:
+        sender.close()
+        manager.close()
+
+
+def test_dialog_subscribers_filter_the_shared_results():
+    from asr_service.fanout import ResultCursor
+
+    def _r(text, role="student"):
+        return {"speaker": "Student_1", "text": text, "raw_text": text, "role": role}
+
+    results = [_r("课前闲聊"), _r("请问可以开始了吗"), _r("今天讲分数"), _r("老师好", role="unknown"), _r("老师"), _r("之后的句子")]
+    plain, dialog = ResultCursor(0, "plain"), ResultCursor(0, "dialog")
+    assert len(plain.view(results)) == 6
+
+    # 流水线逐句产出时按顺序推进；停止指令所在的句子是对话订阅者的最后一句
+    for end in range(1, len(results) + 1):
+        dialog.advance(results, end)
+    assert [r["text"] for r in dialog.view(results)] == ["请问可以开始了吗", "今天讲分数", "老师好", "老师"]
+    assert dialog.closed and dialog.position(2) == 1 and dialog.position(0) is None
+
+
+def test_session_ids_cannot_steer_session_files_out_of_their_directory(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "TAP_DIR", str(tmp_path / "taps"))
+    victim = tmp_path / "victim.tap"
+    victim.write_bytes(b"keep")
+    manager = engine.AsrSessionManager(udp_address=f"127.0.0.1:{free_port()}")
+    try:
+        for bad in ("../victim", "a/b", "..", "", "x" * 65):
+            with pytest.raises(ValueError):
+                manager.start(session_id=bad, tap=True)
+        assert manager.sessions() == [] and victim.read_bytes() == b"keep"
+    finally:
+        manager.close()
+
+    # 目录内的符号链接指向外部时同样拒绝
+    (tmp_path / "taps").mkdir()
+    (tmp_path / "taps" / "link.tap").symlink_to(victim)
+    with pytest.raises(ValueError):
+        engine.session_file(str(tmp_path / "taps"), "link", ".tap")
+    assert engine.session_file(str(tmp_path / "taps"), "ok_1-2", ".tap") == str((tmp_path / "taps" / "ok_1-2.tap").resolve())
@@ -0,0 +1,59 @@
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.session_tap import RECORD, SessionTap, read_tap
+
+
+def _frame(i: int, size: int = 320) -> bytes:
+    return bytes([i % 256]) * size
+
+
+def test_records_round_trip_with_arrival_times(tmp_path):
+    path = str(tmp_path / "s.tap")
+    tap = SessionTap(path, capacity_bytes=1 << 16)
+    t0 = time.monotonic()
+    for i in range(10):
+        tap.write(_frame(i), t0 + i * 0.01)
+    tap.close()
+
+    records = read_tap(path)
+    assert [pcm for _, pcm in records] == [_frame(i) for i in range(10)]
+    arrivals = [a for a, _ in records]
+    assert arrivals == sorted(arrivals)
+    assert abs((arrivals[-1] - arrivals[0]) - 0.09) < 1e-6
+
+
+def test_ring_keeps_only_the_newest_records(tmp_path):
+    path = str(tmp_path / "ring.tap")
+    record_size = RECORD.size + 320
+    tap = SessionTap(path, capacity_bytes=record_size * 5 + 100)
+    for i in range(23):
+        tap.write(_frame(i))
+    stats = tap.stats()
+    tap.close()
+
+    records = read_tap(path)
+    assert [pcm for _, pcm in records] == [_frame(i) for i in range(23 - len(records), 23)]
+    assert stats["written"] == 23
+    assert stats["evicted"] == 23 - len(records)
+    assert 4 <= len(records) <= 5
+
+
+def test_variable_sized_records_wrap_correctly(tmp_path):
+    path = str(tmp_path / "var.tap")
+    tap = SessionTap(path, capacity_bytes=4000)
+    sizes = [100, 700, 33, 1200, 64, 900, 5, 1500, 320, 640] * 5
+    for i, size in enumerate(sizes):
+        tap.write(_frame(i, size))
+    tap.close()
+
+    records = read_tap(path)
+    expected = [_frame(i, size) for i, size in enumerate(sizes)]
+    assert [pcm for _, pcm in records] == expected[len(expected) - len(records):]
+    assert sum(RECORD.size + len(pcm) for _, pcm in records) <= 4000
@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# asr_core 内部使用扁平导入
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.speaker_manager import SpeakerManager
+
+
+def _manager(**kwargs) -> SpeakerManager:
+    mgr = SpeakerManager(threshold=0.45, **kwargs)
+    mgr.teacher_embeddings = []  # 只测试学生声纹库
+    return mgr
+
+
+def _voice(seed: int, dim: int = 192) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(dim)
+
+
+def test_new_student_requires_minimum_evidence():
+    mgr = _manager(min_evidence=2)
+    voice = _voice(1)
+
+    assert mgr.identify(voice).startswith("[Unknown")
+    assert mgr.gallery_stats()["students"] == 0
+
+    assert mgr.identify(voice + 0.01).startswith("[Student_1")
+    assert mgr.identify(voice).startswith("[Student_1")
+    assert mgr.gallery_stats()["students"] == 1
+
+
+def test_gallery_is_capped_with_lru_eviction():
+    mgr = _manager(max_students=3, min_evidence=1)
+    for seed in range(3):
+        mgr.identify(_voice(seed))
+    # 访问 Student_1 使其成为最近匹配
+    assert mgr.identify(_voice(0)).startswith("[Student_1")
+
+    mgr.identify(_voice(10))
+    ids = [s["id"] for s in mgr.students]
+    stats = mgr.gallery_stats()
+    assert stats["students"] == 3
+    assert stats["evicted"] == 1
+    assert "Student_1" in ids and "Student_2" not in ids
+
+
+def test_near_duplicate_clusters_are_merged():
+    mgr = _manager(min_evidence=1, merge_threshold=0.75)
+    base = _voice(5)
+    mgr.identify(base)
+    # 人为放入一个与 Student_1 非常接近的簇
+    mgr.students.append({"id": "Student_9", "embedding": base * 1.01, "count": 1, "last_matched": 0})
+
+    mgr.identify(base)
+    stats = mgr.gallery_stats()
+    assert stats["students"] == 1
+    assert stats["merged"] == 1
+
+
+def test_merge_compares_later_clusters_with_the_merged_embedding():
+    mgr = _manager(min_evidence=1, merge_threshold=0.6)
+    u, v = np.eye(2)
+    student = {"id": "Student_1", "embedding": u, "count": 1, "last_matched": 0}
+    heavy = {"id": "Student_2", "embedding": u + v, "count": 100, "last_matched": 0}
+    # 与原 student 相似（0.89），但与合并后以 heavy 为主的声纹不相似（约 0.32）
+    other = {"id": "Student_3", "embedding": u - 0.5 * v, "count": 1, "last_matched": 0}
+    mgr.students = [student, heavy, other]
+
+    kept = mgr._merge_near_duplicates(student)
+    assert kept is heavy and kept["count"] == 101
+    assert [s["id"] for s in mgr.students] == ["Student_2", "Student_3"]
@@ -0,0 +1,45 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.asr_core.tracing import SessionTracer
+from helpers import STUB, make_speech
+
+
+def test_ring_buffer_keeps_newest_events_and_exports_chrome_json():
+    tracer = SessionTracer(capacity=3, name="s1")
+    for i in range(5):
+        with tracer.span(f"step{i}", args={"i": i}):
+            time.sleep(0.001)
+    tracer.instant("mark")
+
+    trace = json.loads(json.dumps(tracer.to_chrome_trace()))
+    spans = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert [e["name"] for e in spans] == ["step3", "step4"]
+    assert all(e["dur"] >= 1000 for e in spans)
+    assert spans[0]["ts"] < spans[1]["ts"]
+    assert any(e["ph"] == "M" and e["name"] == "thread_name" for e in trace["traceEvents"])
+    assert trace["otherData"]["dropped"] == 3
+
+
+def test_assistant_records_pipeline_stage_spans():
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    assistant = RealtimeAssistant(backends=STUB)
+    assistant.tracer = SessionTracer()
+    audio = np.concatenate([make_speech(2.0), np.zeros(16000, np.int16), make_speech(1.0, 330)])
+    assistant.run_stream(audio[i:i + 3200].tobytes() for i in range(0, len(audio), 3200))
+
+    names = {e["name"] for e in assistant.tracer.to_chrome_trace()["traceEvents"] if e["ph"] == "X"}
+    assert {
+        "chunk", "vad", "asr_chunk", "speaker_embedding", "speech_end", "final_decode", "punctuation",
+        "vad_inference", "asr_inference", "speaker_inference", "punc_inference",
+    } <= names
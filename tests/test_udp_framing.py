@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.udp_framing import JitterBuffer, pack_frame, parse_frame
+
+SAMPLES = 160  # 每包 10ms
+
+
+def _frame(seq: int, value: int = None):
+    value = seq % 250 + 1 if value is None else value
+    payload = bytes([value, 0]) * SAMPLES
+    return parse_frame(pack_frame(seq, seq * SAMPLES, payload, stream_id=7))
+
+
+def _run(buffer: JitterBuffer, seqs):
+    out = []
+    for i, seq in enumerate(seqs):
+        buffer.push(_frame(seq), i * 0.01)
+        out.extend(buffer.pop_ready())
+    out.extend(buffer.flush())
+    return b"".join(out)
+
+
+def test_frame_round_trip():
+    frame = parse_frame(pack_frame(2**32 + 5, 123456, b"abc", stream_id=9))
+    assert (frame.stream_id, frame.seq, frame.sample_ts, frame.payload) == (9, 5, 123456, b"abc")
+    assert parse_frame(b"\x00" * 40) is None
+
+
+def test_reordered_packets_are_restored_in_order():
+    buffer = JitterBuffer()
+    data = _run(buffer, [0, 1, 3, 2, 4, 6, 5, 7])
+    expected = b"".join(_frame(s).payload for s in range(8))
+    assert data == expected
+    stats = buffer.stats()
+    assert stats["reordered"] == 2
+    assert stats["lost"] == 0
+    assert stats["target_depth"] >= 2
+
+
+def test_lost_packet_is_concealed_with_silence():
+    buffer = JitterBuffer(min_depth=1)
+    data = _run(buffer, [0, 1, 3, 4, 5])
+    assert len(data) == 6 * SAMPLES * 2
+    assert data[2 * SAMPLES * 2:3 * SAMPLES * 2] == b"\x00" * SAMPLES * 2
+    assert buffer.stats()["lost"] == 1
+    assert buffer.stats()["concealed_samples"] == SAMPLES
+
+
+def test_repeat_concealment_and_late_packets():
+    buffer = JitterBuffer(min_depth=1, concealment="repeat")
+    data = _run(buffer, [0, 2, 3, 1, 4])
+    gap = data[SAMPLES * 2:2 * SAMPLES * 2]
+    assert gap == _frame(0).payload
+    stats = buffer.stats()
+    assert stats["late"] == 1
+    assert stats["lost"] == 1
+
+
+def test_sequence_wraparound():
+    buffer = JitterBuffer()
+    seqs = [2**32 - 2, 2**32 - 1, 0, 1]
+    data = _run(buffer, seqs)
+    assert len(data) == 4 * SAMPLES * 2
+    assert buffer.stats()["lost"] == 0
+
+
+def test_sender_restart_resyncs_instead_of_dropping_everything_as_late():
+    buffer = JitterBuffer()
+    data = _run(buffer, list(range(1000)) + list(range(500)))
+    # 重启前后的数据都输出，重启后的包没有被当作迟到包丢弃
+    assert len(data) == 1500 * SAMPLES * 2
+    stats = buffer.stats()
+    assert stats["resyncs"] == 1 and stats["late"] == 0
+
+    # 小幅向回跳：连续的迟到包达到阈值后同样重新同步
+    buffer = JitterBuffer(max_depth=4)
+    data = _run(buffer, list(range(100)) + list(range(90, 200)))
+    stats = buffer.stats()
+    assert stats["resyncs"] == 1 and stats["late"] == 7
+    assert len(data) == (100 + 110 - 7) * SAMPLES * 2
@@ -0,0 +1,114 @@
+import selectors
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.udp_framing import pack_frame
+from asr_service.udp_ingest import SessionInbox, StopEvent, UdpIngestServer
+from helpers import free_port
+
+
+def _collect(inbox: SessionInbox, expected: int, timeout: float = 2.0) -> list:
+    items = []
+    deadline = time.monotonic() + timeout
+    while len(items) < expected and time.monotonic() < deadline:
+        items.extend(inbox.get_batch(timeout=0.1) or [])
+    return [data for data, _ in items]
+
+
+def test_datagrams_are_routed_by_stream_id_and_source_address():
+    port = free_port()
+    server = UdpIngestServer(f"127.0.0.1:{port}")
+    server.start()
+
+    robot_a = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    robot_a.bind(("127.0.0.1", 0))
+    robot_b = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    robot_b.bind(("127.0.0.1", 0))
+
+    by_source, by_stream, wildcard = SessionInbox(), SessionInbox(), SessionInbox()
+    try:
+        server.register("a", by_source, source=f"127.0.0.1:{robot_a.getsockname()[1]}")
+        server.register("b", by_stream, stream_id=42)
+        server.register("c", wildcard)
+
+        framed = pack_frame(0, 0, b"\x01\x00" * 160, stream_id=42)
+        for i in range(5):
+            robot_a.sendto(b"A%d" % i, ("127.0.0.1", port))
+            robot_b.sendto(framed, ("127.0.0.1", port))
+            robot_b.sendto(b"other", ("127.0.0.1", port))
+
+        assert _collect(by_source, 5) == [b"A%d" % i for i in range(5)]
+        assert _collect(by_stream, 5) == [framed] * 5
+        assert _collect(wildcard, 5) == [b"other"] * 5
+        assert server.stats()["datagrams"] == 15
+    finally:
+        robot_a.close()
+        robot_b.close()
+        server.close()
+
+
+def test_unregistered_session_stops_receiving():
+    port = free_port()
+    server = UdpIngestServer(f"127.0.0.1:{port}")
+    server.start()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    inbox = SessionInbox()
+    try:
+        server.register("only", inbox)
+        sender.sendto(b"x", ("127.0.0.1", port))
+        assert _collect(inbox, 1) == [b"x"]
+
+        server.unregister("only")
+        sender.sendto(b"y", ("127.0.0.1", port))
+        time.sleep(0.2)
+        assert inbox.get_batch(timeout=0) == []
+        assert server.stats()["unrouted"] == 1
+    finally:
+        sender.close()
+        server.close()
+
+
+def test_inbox_close_wakes_reader():
+    inbox = SessionInbox()
+    inbox.close()
+    assert inbox.get_batch(timeout=5.0) is None
+
+
+def test_stop_event_wakes_a_blocked_selector():
+    stop_event = StopEvent()
+    selector = selectors.DefaultSelector()
+    selector.register(stop_event, selectors.EVENT_READ)
+    woke = []
+
+    def _wait():
+        selector.select(timeout=5.0)
+        woke.append(time.perf_counter())
+
+    waiter = threading.Thread(target=_wait)
+    waiter.start()
+    time.sleep(0.1)
+    t0 = time.perf_counter()
+    stop_event.set()
+    waiter.join(timeout=5.0)
+    selector.close()
+    stop_event.close()
+
+    assert stop_event.is_set()
+    assert woke and woke[0] - t0 < 0.05
+
+
+def test_server_close_does_not_wait_for_a_poll_timeout():
+    server = UdpIngestServer(f"127.0.0.1:{free_port()}")
+    server.start()
+    time.sleep(0.1)
+    t0 = time.perf_counter()
+    server.close()
+    assert time.perf_counter() - t0 < 0.1
@@ -90,7 +90,12 @@ def test_udp_stream_recognition():
     assert stop_resp.status_code == 200
     data = stop_resp.json()
     assert data.get("success") is True
-    print("ASR text:\n", data.get("text", ""))
+
+    # 停止立即返回，最终结果在后台收尾完成后获取
+    result_resp = client.get(f"/asr/sessions/{data['session_id']}/result", params={"wait": 30})
+    assert result_resp.status_code == 200
+    assert result_resp.json().get("final") is True
+    print("ASR text:\n", result_resp.json().get("text", ""))
 
     sender.join(timeout=2.0)
 
@@ -0,0 +1,192 @@
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from asr_service.webhooks import DiskQueue, WebhookDispatcher
+from helpers import STUB, free_port, make_speech, pcm_chunks
+
+
+class StubWebhookServer:
+    """本地 webhook 桩：记录每次 POST 的句子与客户端端口；fail 次之前返回 503，delay 为每次响应前的延迟"""
+
+    def __init__(self, fail=0, delay=0.0):
+        self.requests = []
+        self.fail = fail
+        self.delay = delay
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                time.sleep(server.delay)
+                if server.fail > 0:
+                    server.fail -= 1
+                    status = 503
+                else:
+                    server.requests.append((self.client_address[1], body["sentences"]))
+                    status = 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/hook"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def sentences(self):
+        return [s for _, batch in self.requests for s in batch]
+
+    def wait_for(self, count, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while len(self.sentences) < count and time.monotonic() < deadline:
+            time.sleep(0.02)
+        return self.sentences
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def make(**kwargs):
+        servers.append(StubWebhookServer(**kwargs))
+        return servers[-1]
+    yield make
+    for s in servers:
+        s.close()
+
+
+def _result(i):
+    return {"speaker": "Student_1", "text": f"第{i}句。", "raw_text": f"第{i}句", "timestamp": 0.0}
+
+
+def test_sentences_are_batched_over_a_pooled_connection(server, tmp_path):
+    hook = server()
+    dispatcher = WebhookDispatcher([hook.url], queue_dir=str(tmp_path), batch_window=0.2)
+    try:
+        for i in range(5):
+            dispatcher.submit("s1", i, _result(i))
+        assert [s["index"] for s in hook.wait_for(5)] == list(range(5))
+        time.sleep(0.3)
+        dispatcher.submit("s1", 5, _result(5))
+        sentences = hook.wait_for(6)
+        sink = dispatcher.stats()["sinks"][0]
+    finally:
+        dispatcher.close()
+
+    assert len(hook.requests) == 2 and len(hook.requests[0][1]) == 5
+    assert hook.requests[0][0] == hook.requests[1][0]  # 同一个 keep-alive 连接
+    assert sentences[5] == {"session_id": "s1", "index": 5, **_result(5)}
+    assert sink["delivered"] == 6 and sink["batches"] == 2
+
+
+def test_failed_batches_retry_in_order_from_disk(server, tmp_path):
+    hook = server(fail=3)
+    dispatcher = WebhookDispatcher([hook.url], queue_dir=str(tmp_path), batch_window=0.05, retry_initial=0.05)
+    try:
+        for i in range(4):
+            dispatcher.submit("s1", i, _result(i))
+            time.sleep(0.1)
+        sentences = hook.wait_for(4)
+        sink = dispatcher.stats()["sinks"][0]
+    finally:
+        dispatcher.close()
+
+    assert [s["index"] for s in sentences] == [0, 1, 2, 3]
+    assert sink["failures"] == 3 and sink["queued_batches"] == 0
+
+
+def test_undelivered_batches_survive_restart(server, tmp_path):
+    hook = server(fail=10**6)
+    dispatcher = WebhookDispatcher([hook.url], queue_dir=str(tmp_path), batch_window=0.01, retry_initial=10)
+    dispatcher.submit("s1", 0, _result(0))
+    time.sleep(0.3)
+    dispatcher.close()
+    (queue_dir,) = os.listdir(tmp_path)
+    assert len(DiskQueue(str(tmp_path / queue_dir))) == 1
+
+    # 下游恢复后重启：默认地址磁盘队列中的批次在启动时重发
+    hook.fail = 0
+    restarted = WebhookDispatcher([hook.url], queue_dir=str(tmp_path), batch_window=0.01)
+    restarted.start()
+    try:
+        assert [s["index"] for s in hook.wait_for(1)] == [0]
+    finally:
+        restarted.close()
+    assert not os.listdir(tmp_path / queue_dir)
+
+
+def test_recognition_loop_does_not_wait_for_delivery(server, tmp_path):
+    from asr_service.asr_core.main import RealtimeAssistant
+
+    hook = server(delay=0.5)
+    dispatcher = WebhookDispatcher([hook.url], queue_dir=str(tmp_path), batch_window=0.05)
+    assistant = RealtimeAssistant(backends=STUB)
+    assistant.result_sink = lambda index, result: dispatcher.submit("s1", index, result)
+    speech = make_speech(1.0)
+    audio = np.concatenate([speech, np.zeros(16000, np.int16)] * 4)
+    try:
+        start = time.monotonic()
+        results = assistant.run_stream(iter(audio[i:i + 3200].tobytes() for i in range(0, len(audio), 3200)))
+        elapsed = time.monotonic() - start
+        sentences = hook.wait_for(len(results))
+    finally:
+        dispatcher.close()
+
+    assert len(results) == 4 and elapsed < 0.5
+    assert [(s["index"], s["text"]) for s in sentences] == [(i, r["text"]) for i, r in enumerate(results)]
+
+
+def test_service_shutdown_finalizes_running_sessions_and_delivers_their_sentences(server, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from asr_service import asr_engine
+    from asr_service import main as service
+    from asr_service.asr_core import config
+    from asr_service.asr_core.main import RealtimeAssistant
+    from asr_service.speaker_audio import SpeakerAudio
+
+    for stage, name in STUB.items():
+        monkeypatch.setitem(config.INFERENCE_BACKENDS, stage, name)
+    monkeypatch.setattr(asr_engine, "_GLOBAL_SPEAKER_AUDIO", SpeakerAudio(RealtimeAssistant(backends=STUB)))
+    hook = server()
+    port = free_port()
+    manager = asr_engine.AsrSessionManager(
+        udp_address=f"127.0.0.1:{port}",
+        webhooks=WebhookDispatcher([hook.url], queue_dir=str(tmp_path), batch_window=0.01),
+    )
+    monkeypatch.setattr(service, "manager", manager)
+
+    with TestClient(service.app) as client:
+        session_id = client.post("/asr/start", json={}).json()["session_id"]
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+            for chunk in pcm_chunks(make_speech(1.0)):
+                sender.sendto(chunk, ("127.0.0.1", port))
+        time.sleep(0.5)
+        assert hook.sentences == []  # 句子尚未结束
+
+    # 关闭服务时会话被停止并收尾，最后一句在 webhook 关闭前送达
+    assert manager.get(session_id).final
+    assert [s["session_id"] for s in hook.sentences] == [session_id]